@@ -106,6 +106,101 @@ function clearError(containerId = 'error-container') {
     }
 }
 
+// Precomputed dashboard snapshots (written by `python3 -m rillation.snapshots`)
+const SNAPSHOT_VERSION = 1;
+const SNAPSHOT_BASE = `snapshots/v${SNAPSHOT_VERSION}`;
+const SNAPSHOT_MAX_AGE_MS = 2 * 60 * 60 * 1000;   // older snapshots are ignored
+const SNAPSHOT_INDEX_TTL_MS = 5 * 60 * 1000;      // how long a loaded index is reused
+let snapshotIndex = null;
+let snapshotIndexLoadedAt = 0;
+const snapshotFiles = {};
+
+// Load the snapshot index; null when there is no usable snapshot
+async function loadSnapshotIndex() {
+    if (snapshotIndexLoadedAt && Date.now() - snapshotIndexLoadedAt < SNAPSHOT_INDEX_TTL_MS) {
+        return snapshotIndex;
+    }
+    snapshotIndexLoadedAt = Date.now();
+    snapshotIndex = null;
+    try {
+        const response = await fetch(`${SNAPSHOT_BASE}/index.json`, { cache: 'no-cache' });
+        if (!response.ok) return null;
+        const index = await response.json();
+        const age = Date.now() - new Date(index.generatedAt).getTime();
+        if (index.version !== SNAPSHOT_VERSION || !index.meetingsAvailable || !(age < SNAPSHOT_MAX_AGE_MS)) {
+            console.log('ℹ️ Dashboard snapshot not usable (version, meetings or age); using live queries');
+            return null;
+        }
+        snapshotIndex = index;
+    } catch (err) {
+        console.log('ℹ️ No dashboard snapshot available; using live queries');
+    }
+    return snapshotIndex;
+}
+
+// Load one snapshot file; the content hash in the URL keeps HTTP caches honest
+async function loadSnapshotFile(entry) {
+    const url = `${SNAPSHOT_BASE}/${entry.file}?v=${entry.hash}`;
+    if (!snapshotFiles[url]) {
+        snapshotFiles[url] = fetch(url)
+            .then(response => response.ok ? response.json() : null)
+            .catch(() => null);
+    }
+    const payload = await snapshotFiles[url];
+    return payload && payload.version === SNAPSHOT_VERSION ? payload : null;
+}
+
+// Preset whose range is exactly dateStart..dateEnd, or null
+function snapshotPresetFor(index, dateStart, dateEnd) {
+    if (!index || !dateStart || !dateEnd) return null;
+    for (const [preset, range] of Object.entries(index.presets || {})) {
+        if (range.start === dateStart && range.end === dateEnd) return preset;
+    }
+    return null;
+}
+
+// Per-client totals ({clientName: {emailsSent, prospects, bounces, interested, replies, totalReplies, meetings}})
+// for a preset date range, or null when no snapshot covers it
+async function getSnapshotTotals(dateStart, dateEnd) {
+    const index = await loadSnapshotIndex();
+    const preset = snapshotPresetFor(index, dateStart, dateEnd);
+    if (!preset) return null;
+    const overview = await loadSnapshotFile(index.overview);
+    return overview && overview.presets ? overview.presets[preset] || {} : null;
+}
+
+// One client's snapshot: totals for the range when it is a preset, and the daily rows
+// ({date, emailsSent, ...}) inside the range when the snapshot's daily series covers it
+async function getClientSnapshot(clientName, dateStart, dateEnd) {
+    const index = await loadSnapshotIndex();
+    const entry = index && index.clients ? index.clients[clientName] : null;
+    if (!entry || !dateStart || !dateEnd) return null;
+    const payload = await loadSnapshotFile(entry);
+    if (!payload) return null;
+
+    const preset = snapshotPresetFor(index, dateStart, dateEnd);
+    const daily = payload.daily || { dates: [] };
+    const covered = daily.dates.length > 0 && daily.dates[0] <= dateStart && dateEnd <= daily.dates[daily.dates.length - 1];
+    const days = covered
+        ? daily.dates
+            .map((date, i) => ({
+                date,
+                emailsSent: daily.emailsSent[i],
+                prospects: daily.prospects[i],
+                bounces: daily.bounces[i],
+                interested: daily.interested[i],
+                replies: daily.replies[i],
+                totalReplies: daily.totalReplies[i],
+                meetings: daily.meetings[i]
+            }))
+            .filter(day => day.date >= dateStart && day.date <= dateEnd)
+        : null;
+    return {
+        totals: preset ? payload.presets[preset] : null,
+        daily: days
+    };
+}
+
 // Initialize on load
 if (typeof window !== 'undefined') {
     window.initAnalytics = function() {
@@ -126,6 +221,8 @@ if (typeof window !== 'undefined') {
     window.showError = showError;
     window.clearError = clearError;
     window.parseLocalDate = parseLocalDate;
+    window.getSnapshotTotals = getSnapshotTotals;
+    window.getClientSnapshot = getClientSnapshot;
     
     // Auto-initialize if DOM is ready
     if (document.readyState === 'loading') {
@@ -270,7 +270,43 @@ async function loadQuickViewData() {
         if (!dateStart || !dateEnd) {
             console.log('📅 No date range selected - loading all cumulative data');
         }
-        
+
+        // Preset ranges across all campaigns come from the precomputed snapshot when there is one
+        if (!selectedCampaign && window.getSnapshotTotals) {
+            const snapshotTotals = await window.getSnapshotTotals(dateStart, dateEnd);
+            if (snapshotTotals) {
+                const clients = Object.entries(snapshotTotals)
+                    .map(([name, totals]) => ({
+                        name: name,
+                        emailsSent: totals.emailsSent,
+                        prospects: totals.prospects,
+                        replies: totals.replies,
+                        totalReplies: totals.totalReplies,
+                        bounces: totals.bounces,
+                        meetings: totals.meetings
+                    }))
+                    .sort((a, b) => a.name.localeCompare(b.name));
+                console.log(`⚡ Loaded ${clients.length} clients from the dashboard snapshot`);
+
+                if (clients.length === 0) {
+                    if (bubblesContainer) {
+                        bubblesContainer.innerHTML = '<div class="empty-state">No data found for selected date range</div>';
+                    }
+                    return;
+                }
+
+                const start = new Date(dateStart);
+                const end = new Date(dateEnd);
+                quickViewData = {
+                    clients: clients,
+                    dateRangeDays: Math.ceil((end - start) / (1000 * 60 * 60 * 24)) + 1
+                };
+                currentPage = 1;
+                renderQuickView();
+                return;
+            }
+        }
+
         // Build query
         console.log('🔍 Building query for campaign_reporting...');
         let query = client.from('campaign_reporting').select('*');
@@ -831,8 +867,22 @@ function initClientBubbleClicks() {
 async function loadClientDataForPopup(clientName, dateStart, dateEnd) {
     const client = getSupabaseClient();
     if (!client) return null;
-    
+
     try {
+        // Preset ranges come from the client's precomputed snapshot when there is one
+        const snapshot = window.getClientSnapshot ? await window.getClientSnapshot(clientName, dateStart, dateEnd) : null;
+        if (snapshot && snapshot.totals) {
+            const start = new Date(dateStart);
+            const end = new Date(dateEnd);
+            return {
+                emailsSent: snapshot.totals.emailsSent,
+                prospects: snapshot.totals.prospects,
+                replies: snapshot.totals.replies,
+                meetings: snapshot.totals.meetings,
+                dateRangeDays: Math.ceil((end - start) / (1000 * 60 * 60 * 24)) + 1
+            };
+        }
+
         // Load campaign_reporting data
         let query = client.from('campaign_reporting').select('*');
         query = query.gte('date', dateStart);
@@ -888,7 +938,30 @@ async function loadHistoricalClientData(clientName, dateStart, dateEnd) {
     
     try {
         console.log('📊 Loading historical data for', clientName, 'from', dateStart, 'to', dateEnd);
-        
+
+        // Ranges inside the snapshot's daily series come from the client's precomputed snapshot
+        const snapshot = window.getClientSnapshot ? await window.getClientSnapshot(clientName, dateStart, dateEnd) : null;
+        if (snapshot && snapshot.daily) {
+            const targets = window.getTargets && typeof window.getTargets === 'function'
+                ? await window.getTargets()
+                : {};
+            const clientTargets = targets[clientName] || {};
+            // Same rows as the live path: only days with activity
+            return snapshot.daily
+                .filter(day => day.emailsSent || day.prospects || day.bounces || day.replies || day.meetings)
+                .map(day => ({
+                    date: day.date,
+                    emailsSent: day.emailsSent,
+                    emailsTarget: clientTargets.emails_per_day || 0,
+                    prospects: day.prospects,
+                    prospectsTarget: clientTargets.prospects_per_day || 0,
+                    replies: day.replies,
+                    repliesTarget: clientTargets.replies_per_day || 0,
+                    meetings: day.meetings,
+                    meetingsTarget: clientTargets.meetings_per_day || 0
+                }));
+        }
+
         // Load campaign_reporting data grouped by date
         let query = client.from('campaign_reporting')
             .select('date, emails_sent, total_leads_contacted, total_leads, bounced')
@@ -1,35 +1,53 @@
 #!/usr/bin/env python3
-import os
+"""
+Show the engaged_leads table's columns and one sample row.
+Columns come from the PostgREST OpenAPI document; credentials from
+rillation.config (environment overrides included) rather than config.js.
+"""
+
 import json
-import re
-from supabase import create_client, Client
-
-# Load config
-with open('config.js', 'r') as f:
-    content = f.read()
-    # Extract SUPABASE_URL and SUPABASE_KEY from config.js
-    url_match = re.search(r'SUPABASE_URL\s*[:=]\s*["\']([^"\']+)["\']', content)
-    key_match = re.search(r'SUPABASE_KEY\s*[:=]\s*["\']([^"\']+)["\']', content)
-    
-    if url_match and key_match:
-        SUPABASE_URL = url_match.group(1)
-        SUPABASE_KEY = key_match.group(1)
-        
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        
-        # Query engaged_leads table structure
-        try:
-            result = supabase.table('engaged_leads').select('*').limit(1).execute()
-            if result.data and len(result.data) > 0:
-                print('Table: engaged_leads')
-                print('Columns:', list(result.data[0].keys()))
-                print('\nSample row:')
-                print(json.dumps(result.data[0], indent=2, default=str))
-            else:
-                print('Table exists but is empty')
-        except Exception as e:
-            print(f'Error querying table: {e}')
+
+from rillation.config import SUPABASE_HEADERS, SUPABASE_URL
+from rillation.inventory import fetch_openapi, table_definitions
+from rillation.metrics import Metrics, instrumented_session
+
+TABLE = 'engaged_leads'
+
+# Request/latency instrumentation, exported when the run finishes
+metrics = Metrics('query-engaged-leads')
+http = instrumented_session(metrics)
+
+
+def main():
+    try:
+        definitions = table_definitions(fetch_openapi(http))
+    except Exception as e:
+        print(f'⚠️  OpenAPI document unavailable ({e}); reading a sample row only')
+        definitions = None
+
+    if definitions is not None and TABLE not in definitions:
+        print(f'Table {TABLE} not found')
+        return
+
+    # The sample row is the point of this script, so it reads every column
+    response = http.get(f'{SUPABASE_URL}/rest/v1/{TABLE}?select=*&limit=1', headers=SUPABASE_HEADERS, timeout=10)
+    if not response.ok:
+        print(f'Error querying table: HTTP {response.status_code} - {response.text[:200]}')
+        return
+    rows = response.json()
+
+    print(f'Table: {TABLE}')
+    if definitions is not None:
+        print('Columns:', definitions[TABLE]['columns'])
+    elif rows:
+        print('Columns:', list(rows[0].keys()))
+    if rows:
+        print('\nSample row:')
+        print(json.dumps(rows[0], indent=2, default=str))
     else:
-        print('Could not extract Supabase credentials from config.js')
+        print('Table exists but is empty')
 
 
+if __name__ == '__main__':
+    main()
+    metrics.export()
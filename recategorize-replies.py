@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Re-categorize Stored Replies
+Streams the replies table with keyset pagination (reply_id > last seen), runs
+categorize_reply over each page in a worker pool (on the new reply text, with
+quoted history and signatures stripped), and writes back only the rows
+whose category changed, one bulk PATCH per (page, new category).
+Failed PATCHes are retried with the shared RetryPolicy. Progress is
+checkpointed after every page whose writes all succeeded, so an interrupted
+run resumes where it stopped; after a page with a failed write the checkpoint
+stays before it, and the next run re-reads from there.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from rillation.config import SUPABASE_HEADERS, SUPABASE_URL
+from rillation.errors import ErrorSummary, print_error_summary
+from rillation.metrics import Metrics, ProgressReporter, instrumented_session, print_endpoint_summary
+from rillation.quoting import split_reply
+from rillation.replies import categorize_reply, categorizer_version
+from rillation.retry import request_with_retry
+
+# Request/latency instrumentation, exported when the run finishes
+metrics = Metrics('recategorize-replies')
+http = instrumented_session(metrics)
+
+CHECKPOINT_FILE = 'recategorize-replies.checkpoint.json'
+
+# Stored rows don't keep Bison's 'interested' and 'automated_reply' flags, so
+# keyword rules can't reproduce the 'Interested' and 'Out Of Office' that
+# map_bison_reply_to_supabase sets from them; by default such rows are left alone
+DEFAULT_PRESERVE = ['Interested', 'Out Of Office']
+
+# Statistics tracking
+stats = {
+    'rows_scanned': 0,
+    'rows_changed': 0,
+    'rows_preserved': 0,
+    'rows_updated': 0,
+    'pages': 0,
+    'errors': ErrorSummary(metrics)
+}
+
+
+def fetch_page(after_id: int, page_size: int, client: Optional[str]) -> List[Dict]:
+    """One keyset page of replies ordered by reply_id"""
+    params = [
+        'select=reply_id,subject,text_body,category',
+        f'reply_id=gt.{after_id}',
+        'order=reply_id.asc',
+        f'limit={page_size}'
+    ]
+    if client:
+        params.append(f'client=eq.{quote(client)}')
+    url = f'{SUPABASE_URL}/rest/v1/replies?{"&".join(params)}'
+
+    response = http.get(url, headers=SUPABASE_HEADERS, timeout=60)
+    if not response.ok:
+        raise Exception(f'Failed to fetch replies after {after_id}: HTTP {response.status_code} - {response.text[:200]}')
+    return response.json()
+
+
+def classify_chunk(rows: List[Tuple[int, str, str, Optional[str]]]) -> List[Tuple[int, str]]:
+    """Worker: returns (reply_id, new_category) for rows whose category would change"""
+    changed = []
+    for reply_id, subject, text_body, current in rows:
+        # Rows stored before quoted-thread stripping still carry the whole chain
+        category = categorize_reply(subject, split_reply(text_body or '')[0])
+        if category != current:
+            changed.append((reply_id, category))
+    return changed
+
+
+def classify_page(pool: ProcessPoolExecutor, rows: List[Dict], workers: int,
+                  preserve: List[str]) -> Dict[str, List[int]]:
+    """Classify a page across the pool; returns {new_category: [reply_id, ...]} for changed rows"""
+    candidates = []
+    for row in rows:
+        if row.get('category') in preserve:
+            stats['rows_preserved'] += 1
+            continue
+        candidates.append((row['reply_id'], row.get('subject'), row.get('text_body'), row.get('category')))
+
+    chunk_size = max(1, -(-len(candidates) // max(1, workers)))
+    chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+
+    by_category: Dict[str, List[int]] = {}
+    for changed in pool.map(classify_chunk, chunks):
+        for reply_id, category in changed:
+            by_category.setdefault(category, []).append(reply_id)
+    return by_category
+
+
+def update_categories(category: str, reply_ids: List[int], batch_size: int) -> Tuple[int, int]:
+    """Set one category on many rows with reply_id=in.(...) PATCHes; returns (rows updated, rows failed)"""
+    updated = failed = 0
+    url = f'{SUPABASE_URL}/rest/v1/replies'
+    headers = {**SUPABASE_HEADERS, 'Prefer': 'return=minimal'}
+
+    for i in range(0, len(reply_ids), batch_size):
+        batch = reply_ids[i:i + batch_size]
+        id_list = ','.join(str(reply_id) for reply_id in batch)
+        try:
+            response = request_with_retry(
+                http, 'PATCH', f'{url}?reply_id=in.({id_list})',
+                headers=headers,
+                json={'category': category},
+                timeout=60
+            )
+            if response.ok:
+                updated += len(batch)
+            else:
+                failed += len(batch)
+                stats['errors'].append(
+                    f"Failed to set '{category}' on {len(batch)} rows from reply_id {batch[0]}: "
+                    f"HTTP {response.status_code} - {response.text[:200]}"
+                )
+        except Exception as e:
+            failed += len(batch)
+            stats['errors'].append(f"Error setting '{category}' on {len(batch)} rows from reply_id {batch[0]}: {e}")
+    return updated, failed
+
+
+def load_checkpoint(path: str, client: Optional[str], version: str) -> int:
+    """Last reply_id completed by a previous run with the same scope and rules, or 0"""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('client') != client or checkpoint.get('categorizer_version') != version:
+        print("ℹ️  Checkpoint is for a different client filter or keyword rules; starting over")
+        return 0
+    return checkpoint.get('last_reply_id', 0)
+
+
+def save_checkpoint(path: str, client: Optional[str], version: str, last_reply_id: int):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'client': client,
+            'categorizer_version': version,
+            'last_reply_id': last_reply_id,
+            'stats': {key: value for key, value in stats.items() if key != 'errors'},
+            'saved_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-categorize stored replies with the current keyword rules')
+    parser.add_argument('--client', help='Only replies for this client')
+    parser.add_argument('--page-size', type=int, default=1000, help='Rows per keyset page')
+    parser.add_argument('--update-batch', type=int, default=500, help='reply_ids per bulk PATCH')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Classification processes')
+    parser.add_argument('--preserve', action='append',
+                        help=f"Never change rows currently in this category (default: {', '.join(DEFAULT_PRESERVE)}; "
+                             "pass --preserve none to allow all)")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, help='Checkpoint file path')
+    parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+    parser.add_argument('--dry-run', action='store_true', help='Classify and count, but write nothing')
+    args = parser.parse_args()
+
+    preserve = DEFAULT_PRESERVE if args.preserve is None else [p for p in args.preserve if p.lower() != 'none']
+    version = categorizer_version()
+
+    print("=" * 60)
+    print("Re-categorize Stored Replies")
+    print("=" * 60)
+    print(f"Scope: {args.client or 'all clients'}")
+    print(f"Keyword rules version: {version}")
+    print(f"Preserved categories: {', '.join(preserve) or 'none'}")
+    if args.dry_run:
+        print("Dry run: no rows will be written")
+    print()
+
+    last_id = 0 if args.restart else load_checkpoint(args.checkpoint, args.client, version)
+    if last_id:
+        print(f"↩️  Resuming after reply_id {last_id}")
+
+    progress = ProgressReporter('replies', interval=10.0)
+    started = time.perf_counter()
+    # Set by the first page with a failed write; the checkpoint never moves past that page
+    held = False
+    saved_id = last_id
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool, ThreadPoolExecutor(max_workers=1) as fetcher:
+        # Prefetch the next page while the current one is classified and written
+        pending: Future = fetcher.submit(fetch_page, last_id, args.page_size, args.client)
+        while True:
+            with metrics.stage('fetch_page') as stage:
+                try:
+                    rows = pending.result()
+                except Exception as e:
+                    stats['errors'].append(str(e))
+                    print(f"❌ {e}")
+                    break
+                stage.add_rows(len(rows))
+            if not rows:
+                break
+
+            page_last_id = rows[-1]['reply_id']
+            if len(rows) == args.page_size:
+                pending = fetcher.submit(fetch_page, page_last_id, args.page_size, args.client)
+
+            with metrics.stage('classify') as stage:
+                by_category = classify_page(pool, rows, args.workers, preserve)
+                stage.add_rows(len(rows))
+            changed = sum(len(ids) for ids in by_category.values())
+
+            if not args.dry_run:
+                failed = 0
+                with metrics.stage('write_back') as stage:
+                    for category, reply_ids in by_category.items():
+                        updated, category_failed = update_categories(category, reply_ids, args.update_batch)
+                        stats['rows_updated'] += updated
+                        failed += category_failed
+                    stage.add_rows(changed)
+                if failed and not held:
+                    held = True
+                    print(f"⚠️  {failed} rows not updated; checkpoint held at reply_id {saved_id}")
+                if not held:
+                    save_checkpoint(args.checkpoint, args.client, version, page_last_id)
+                    saved_id = page_last_id
+
+            stats['rows_scanned'] += len(rows)
+            stats['rows_changed'] += changed
+            stats['pages'] += 1
+            progress.update(len(rows), changed=changed)
+
+            if len(rows) < args.page_size:
+                break
+
+    progress.close()
+    elapsed = time.perf_counter() - started
+
+    # Print summary
+    print("\n" + "=" * 60)
+    print("RE-CATEGORIZATION SUMMARY")
+    print("=" * 60)
+    print(f"Pages: {stats['pages']}")
+    print(f"Rows scanned: {stats['rows_scanned']}")
+    print(f"Rows preserved: {stats['rows_preserved']}")
+    print(f"Rows with a new category: {stats['rows_changed']}")
+    print(f"Rows updated: {stats['rows_updated']}")
+    if held:
+        print(f"Checkpoint held after a failed write; the next run resumes after reply_id {saved_id}")
+    print(f"Throughput: {stats['rows_scanned'] / elapsed if elapsed > 0 else 0:.0f} rows/s over {elapsed:.1f}s")
+    for name, values in metrics.stage_summary().items():
+        print(f"  {name}: {values['seconds']:.1f}s ({values['rows_per_second']:.0f} rows/s)")
+    print(f"Errors: {len(stats['errors'])}")
+    print_endpoint_summary(metrics)
+
+    print_error_summary(stats['errors'])
+
+    prom_path, jsonl_path = metrics.export()
+    print(f"\n📈 Metrics written to {prom_path} and {jsonl_path}")
+
+    print("\n✅ Re-categorization completed!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Recompute Campaign Metrics
+One pass over campaign_reporting that fetches /campaigns/{id}/stats once per
+(campaign, date) and derives every metric column from that single payload,
+instead of sync-campaign-stats.py, fix-total-leads-contacted.py and
+update-unique-contacts-rr.py each calling the endpoint for the same pairs.
+
+Rows are streamed by client; duplicate rows for the same (campaign, date) share
+one call. total_leads_contacted is the sequence_step_stats count by default
+(as fix-total-leads-contacted stores it) or the API's own count with
+--leads-contacted api. Rows whose metric fingerprint changed are upserted on id
+through one buffered writer (or COPY with --direct). Pairs outside a campaign's
+activity window (rillation.activity) are skipped without a call unless
+--no-skip-dormant is given. Rows that fail are dead-lettered
+(rillation.deadletter) and --redrive retries only those.
+"""
+
+import argparse
+import itertools
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+from rillation.activity import load_activity_index
+from rillation.clients import load_clients
+from rillation.config import BISON_API_BASE
+from rillation.deadletter import DeadLetterQueue, print_deadletter_summary, redrive_items, write_failure_recorder
+from rillation.errors import ErrorSummary, StatsFetchError, print_error_summary
+from rillation.metrics import Metrics, ProgressReporter, instrumented_session, print_endpoint_summary
+from rillation.profiling import RunProfiler, add_profile_arguments
+from rillation.retry import CircuitBreakers, CircuitOpenError, print_breaker_summary, request_with_retry
+from rillation.rows import group_rows, stream_rows
+from rillation.stats import (METRIC_COLUMNS, map_api_response_to_campaign_reporting, row_fingerprint,
+                             sequence_leads_contacted)
+from rillation.writer import BufferedWriter
+
+# Request/latency instrumentation, exported when the run finishes
+metrics = Metrics('recompute-campaign-metrics')
+http = instrumented_session(metrics)
+
+# One breaker per client: a revoked token stops after a few calls instead of one per pair
+breakers = CircuitBreakers(metrics)
+
+# Rows that could not be recomputed (and rows that could not be written), for --redrive
+deadletter = DeadLetterQueue('recompute-campaign-metrics')
+
+NO_SEQUENCE_MESSAGE = 'can only be viewed for campaigns with a sequence'
+
+# Statistics tracking
+stats = {
+    'rows_read': 0,
+    'pairs_fetched': 0,
+    'duplicate_rows': 0,
+    'rows_changed': 0,
+    'rows_unchanged': 0,
+    'rows_written': 0,
+    'rows_skipped': 0,
+    'rows_dormant': 0,
+    'leads_contacted_disagree': 0,
+    'errors': ErrorSummary(metrics)
+}
+
+
+def campaign_rows_query(client: Optional[str], since: Optional[str], until: Optional[str]) -> str:
+    """Stored rows ordered so each client's duplicate (campaign, date) rows are adjacent"""
+    select = ','.join(['id', 'campaign_id', 'client', 'date'] + METRIC_COLUMNS)
+    query = f'select={select}&order=client.asc,date.desc,campaign_id.asc,id.asc'
+    if client:
+        query += f'&client=eq.{quote(client)}'
+    if since:
+        query += f'&date=gte.{since}'
+    if until:
+        query += f'&date=lte.{until}'
+    return query
+
+
+def pairs_by_client(rows: Iterator[Dict]) -> Iterator[Tuple[str, Iterator[Tuple[Tuple, List[Dict]]]]]:
+    """client -> lazy ((campaign_id, date), rows) groups, one per distinct pair"""
+    for client, client_rows in group_rows(rows, key=lambda row: row.get('client') or 'Unknown'):
+        pairs = itertools.groupby(client_rows, key=lambda row: (row.get('campaign_id'), row.get('date')))
+        yield client, ((pair, list(pair_rows)) for pair, pair_rows in pairs)
+
+
+def redrive_rows(writer) -> Iterator[Dict]:
+    """Dead-lettered rows in the streamed order (client, date desc, campaign, id)"""
+    rows = [item['row'] for item in redrive_items(deadletter, writer)]
+    rows.sort(key=lambda row: (row.get('campaign_id') or 0, row.get('id') or ''))
+    rows.sort(key=lambda row: row.get('date') or '', reverse=True)
+    rows.sort(key=lambda row: row.get('client') or 'Unknown')
+    return iter(rows)
+
+
+def dead_letter(rows: List[Dict], error, error_class: Optional[str] = None):
+    for row in rows:
+        deadletter.add(row.get('id'), {'row': row}, error, error_class)
+
+
+def fetch_stats(api_token: str, campaign_id: int, date: str, client_name: str) -> Optional[Dict]:
+    """
+    One day's stats payload for a campaign, retrying transient failures; None when
+    the campaign has no sequence. Raises StatsFetchError when the call fails and
+    CircuitOpenError once the client's breaker has tripped.
+    """
+    headers = {
+        'Authorization': f'Bearer {api_token}',
+        'Content-Type': 'application/json'
+    }
+    try:
+        response = request_with_retry(http, 'POST', f'{BISON_API_BASE}/campaigns/{campaign_id}/stats',
+                                      breaker=breakers.get(client_name), headers=headers,
+                                      json={'start_date': date, 'end_date': date}, timeout=30)
+        if response.status_code == 400 and NO_SEQUENCE_MESSAGE in response.text:
+            return None
+        if not response.ok:
+            raise StatsFetchError(f"API error for campaign_id {campaign_id} on {date}: "
+                                  f"HTTP {response.status_code} - {response.text[:200]}")
+        with metrics.stage('decode_json'):
+            data = response.json()
+        return (data.get('data') or data) if isinstance(data, dict) else data
+    except requests.exceptions.RequestException as e:
+        raise StatsFetchError(f"Request error for campaign_id {campaign_id} on {date}: {e}") from e
+
+
+def derive_row(api_data: Dict, stored: Dict, leads_contacted: str) -> Dict:
+    """Every metric column for a stored row from one stats payload"""
+    row = map_api_response_to_campaign_reporting(api_data, stored['campaign_id'],
+                                                 stored.get('campaign_name'), stored.get('client'),
+                                                 stored['date'], row_id=stored['id'])
+    from_steps = sequence_leads_contacted(api_data)
+    if from_steps != int(row['total_leads_contacted'] or 0):
+        stats['leads_contacted_disagree'] += 1
+    if leads_contacted == 'sequence':
+        row['total_leads_contacted'] = from_steps
+    # The stored name is kept; the stats payload doesn't carry one
+    row['campaign_name'] = stored.get('campaign_name')
+    return row
+
+
+def recompute_client(client_name: str, api_token: str, pairs, writer, leads_contacted: str, delay: float,
+                     activity=None):
+    progress = ProgressReporter(client_name)
+    for (campaign_id, date), rows in pairs:
+        stats['rows_read'] += len(rows)
+        stats['duplicate_rows'] += len(rows) - 1
+        if not campaign_id or not date:
+            stats['rows_skipped'] += len(rows)
+            progress.update(len(rows), skipped=len(rows))
+            continue
+        # Outside the campaign's activity window the stored zeros stand
+        if activity is not None and not activity.should_fetch(campaign_id, date):
+            stats['rows_dormant'] += len(rows)
+            progress.update(len(rows), dormant=len(rows))
+            continue
+
+        try:
+            with metrics.stage('fetch_stats') as stage:
+                api_data = fetch_stats(api_token, campaign_id, date, client_name)
+                stage.add_rows()
+        except CircuitOpenError as e:
+            # This pair plus the rest of the client's pairs, drained without API calls
+            dead_letter(rows, e, 'circuit_open')
+            remaining = len(rows)
+            for _, rest in pairs:
+                dead_letter(rest, e, 'circuit_open')
+                remaining += len(rest)
+            stats['rows_read'] += remaining - len(rows)
+            print(f"  🔌 {e}; skipping {remaining} remaining rows")
+            stats['rows_skipped'] += remaining
+            stats['errors'].append(f"{e}; skipped {remaining} remaining rows")
+            progress.update(remaining, skipped=remaining)
+            break
+        except (StatsFetchError, ValueError) as e:
+            stats['pairs_fetched'] += 1
+            stats['errors'].append(e)
+            dead_letter(rows, e)
+            stats['rows_skipped'] += len(rows)
+            progress.update(len(rows), failed=len(rows))
+            continue
+        stats['pairs_fetched'] += 1
+
+        if not api_data:
+            stats['rows_skipped'] += len(rows)
+            progress.update(len(rows), skipped=len(rows))
+            continue
+
+        with metrics.stage('map') as stage:
+            changed = []
+            for stored in rows:
+                row = derive_row(api_data, stored, leads_contacted)
+                if row_fingerprint(row) == row_fingerprint(stored):
+                    stats['rows_unchanged'] += 1
+                else:
+                    changed.append(row)
+            stage.add_rows(len(rows))
+        if changed:
+            stats['rows_changed'] += len(changed)
+            with metrics.stage('update_rows') as stage:
+                writer.upsert('campaign_reporting', changed, on_conflict=('id',))
+                stage.add_rows(len(changed))
+        progress.update(len(rows), changed=len(changed), unchanged=len(rows) - len(changed))
+
+        # Small delay to avoid rate limiting
+        with metrics.stage('sleep'):
+            time.sleep(delay)
+    progress.close()
+
+
+def main(args: argparse.Namespace):
+    """Main recompute function"""
+    print("=" * 60)
+    print("Recompute Campaign Metrics")
+    print("=" * 60)
+    print(f"total_leads_contacted from: {'sequence_step_stats' if args.leads_contacted == 'sequence' else 'API count'}")
+    print()
+
+    on_failed = write_failure_recorder(deadletter, 'upsert')
+    if args.direct:
+        from rillation.pgcopy import CopyWriter
+        writer = CopyWriter(metrics, on_failed=on_failed)
+    else:
+        writer = BufferedWriter(http, metrics, on_failed=on_failed)
+
+    try:
+        clients = load_clients(http)
+    except Exception as e:
+        print(f"❌ Could not load clients: {e}")
+        return
+    tokens = {client['name']: client['api_token'] for client in clients}
+    activity = None if args.no_skip_dormant else load_activity_index(http, metrics, clients, args.client)
+
+    if args.redrive:
+        rows = redrive_rows(writer)
+    else:
+        query = campaign_rows_query(args.client, args.since, args.until)
+        rows = stream_rows(http, 'campaign_reporting', query, metrics=metrics)
+    try:
+        for client_name, pairs in pairs_by_client(rows):
+            api_token = tokens.get(client_name)
+            print(f"📋 Processing client: {client_name}")
+            if not api_token:
+                skipped = 0
+                for _, pair_rows in pairs:
+                    dead_letter(pair_rows, f"No API key for client: {client_name}", 'no_api_key')
+                    skipped += len(pair_rows)
+                print(f"  ⏭️  Skipped {skipped} rows (no API token)")
+                stats['rows_read'] += skipped
+                stats['rows_skipped'] += skipped
+                stats['errors'].append(f"No API key for client: {client_name}", 'no_api_key', count=skipped)
+                continue
+            recompute_client(client_name, api_token, pairs, writer, args.leads_contacted, args.delay, activity)
+    except Exception as e:
+        print(f"❌ Error reading campaign rows: {e}")
+        stats['errors'].append(f"Error reading campaign rows: {e}")
+
+    # Every changed row goes out through the same writer, batched across clients
+    with metrics.stage('flush_writes'):
+        writer.close()
+    stats['rows_written'] = writer.rows_written('campaign_reporting')
+    stats['rows_skipped'] += writer.rows_failed('campaign_reporting')
+    stats['errors'].extend(writer.errors)
+    if args.redrive:
+        deadletter.finish()
+    else:
+        deadletter.close()
+
+    # Print summary
+    print("\n" + "=" * 60)
+    print("RECOMPUTE SUMMARY")
+    print("=" * 60)
+    print(f"Rows read: {stats['rows_read']} ({stats['duplicate_rows']} duplicate campaign/date rows)")
+    print(f"Stats calls: {stats['pairs_fetched']}")
+    print(f"Rows changed: {stats['rows_changed']}")
+    print(f"Rows unchanged: {stats['rows_unchanged']}")
+    print(f"Rows written: {stats['rows_written']}")
+    print(f"Rows skipped: {stats['rows_skipped']}")
+    print(f"Dormant rows not fetched: {stats['rows_dormant']}")
+    if activity is not None:
+        print(activity.summary(args.delay))
+    print(f"Sequence vs API leads contacted differ: {stats['leads_contacted_disagree']}")
+    print(f"Errors: {len(stats['errors'])}")
+    print_breaker_summary(breakers)
+    print_endpoint_summary(metrics)
+
+    print_error_summary(stats['errors'])
+    print_deadletter_summary(deadletter)
+
+    prom_path, jsonl_path = metrics.export()
+    print(f"\n📈 Metrics written to {prom_path} and {jsonl_path}")
+
+    print("\n✅ Recompute completed!")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute every campaign_reporting metric from one stats call per campaign/date')
+    parser.add_argument('--client', help='Only this client')
+    parser.add_argument('--since', help='First date to recompute (YYYY-MM-DD)')
+    parser.add_argument('--until', help='Last date to recompute (YYYY-MM-DD)')
+    parser.add_argument('--leads-contacted', choices=('sequence', 'api'), default='sequence',
+                        help='Store the sequence_step_stats count (default, as fix-total-leads-contacted) '
+                             'or the API total_leads_contacted (as sync-campaign-stats)')
+    parser.add_argument('--delay', type=float, default=0.3, help='Seconds between stats calls')
+    parser.add_argument('--direct', action='store_true',
+                        help='Write straight to Postgres with COPY (needs psycopg and RILLATION_DATABASE_URL)')
+    parser.add_argument('--no-skip-dormant', action='store_true',
+                        help='Fetch every pair, including those outside the campaigns\' activity windows')
+    parser.add_argument('--redrive', action='store_true',
+                        help='Retry only the rows dead-lettered by earlier runs')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    with RunProfiler.from_args(args, metrics):
+        main(args)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Replay Bison Webhook Events
+Sends a stream of reply webhook events to the receiver (rillation.webhook) and
+reports acknowledgement latency, batching and ingest lag.
+
+By default it starts the mock Supabase server and an in-process receiver that
+writes to it, replays every synthetic reply as an event (with some redeliveries
+and malformed events mixed in), and then checks that every reply landed in the
+mock replies table exactly as map_bison_reply_to_supabase maps it.
+With --url it only sends events to an already running receiver.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+from rillation.metrics import Metrics
+from rillation.mock_server import MockServer, add_server_arguments, state_from_args
+from rillation.quoting import add_policy_argument, set_policy
+from rillation.replies import map_bison_reply_to_supabase
+from rillation.synthetic import dataset_from_args
+from rillation.webhook import (ReplyBatcher, WebhookReceiver, add_batcher_arguments, extract_reply,
+                               print_receiver_summary)
+
+
+def load_events(path: str) -> Iterator[Tuple[Optional[str], Dict]]:
+    """Recorded events, one per line: either {"client": ..., "event": {...}} or a bare event"""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if 'event' in record and 'client' in record and isinstance(record['event'], dict) \
+                        and 'data' in record['event']:
+                    yield record['client'], record['event']
+                else:
+                    yield None, record
+
+
+def with_faults(events: Iterator[Tuple[Optional[str], Dict]], duplicate_rate: float, invalid_rate: float,
+                seed: int) -> Iterator[Tuple[Optional[str], Dict, str]]:
+    """Interleave redeliveries of recent events and malformed events into the stream"""
+    rng = random.Random(seed)
+    recent: List[Tuple[Optional[str], Dict]] = []
+    for client, event in events:
+        yield client, event, 'event'
+        recent = (recent + [(client, event)])[-50:]
+        if rng.random() < duplicate_rate:
+            yield (*rng.choice(recent), 'duplicate')
+        if rng.random() < invalid_rate:
+            yield client, {'event': {'type': 'LEAD_REPLIED'}, 'data': {'reply': 'not an object'}}, 'invalid'
+
+
+def send_event(http: requests.Session, url: str, client: Optional[str], event: Dict, secret: str,
+               retries: int = 0) -> Tuple[int, float]:
+    body = json.dumps(event).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if secret:
+        headers['X-Bison-Signature'] = 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    target = f'{url}/{quote(client, safe="")}' if client else url
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        try:
+            response = http.post(target, data=body, headers=headers, timeout=30)
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            status = 0
+        # Redeliver after a 503 like Bison does, on a compressed schedule
+        if status != 503 or attempt == retries:
+            break
+        time.sleep(0.1 * 2 ** attempt)
+    return status, time.perf_counter() - start
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def replay(url: str, events: Iterator[Tuple[Optional[str], Dict, str]], concurrency: int, rate: float,
+           secret: str, retries: int = 5) -> Dict:
+    """Send every event, at most `rate` per second when rate > 0; returns status counts and latencies"""
+    local = threading.local()
+    statuses: Dict[str, int] = {}
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker(item):
+        if not hasattr(local, 'http'):
+            local.http = requests.Session()
+        client, event, kind = item
+        status, elapsed = send_event(local.http, url, client, event, secret, retries)
+        with lock:
+            key = f'{kind} {status}'
+            statuses[key] = statuses.get(key, 0) + 1
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    sent = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for item in events:
+            if rate > 0:
+                delay = start + sent / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(worker, item)
+            sent += 1
+    wall = time.perf_counter() - start
+    return {'sent': sent, 'wall_seconds': wall, 'statuses': statuses, 'latencies': latencies}
+
+
+def verify(server: MockServer, expected: Dict[int, Dict]) -> List[str]:
+    """Compare the mock replies table with the rows the events should have produced"""
+    problems = []
+    table = server.state.tables['replies']
+    for reply_id, row in expected.items():
+        stored = table.rows.get(reply_id)
+        if stored is None:
+            problems.append(f'reply_id {reply_id} missing')
+            continue
+        different = [column for column, value in row.items() if stored.get(column) != value]
+        if different:
+            problems.append(f"reply_id {reply_id} differs in {', '.join(different)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay Bison reply webhook events against the receiver')
+    parser.add_argument('--url', help='Receiver base URL (…/webhooks/bison); default starts a local receiver and mock')
+    parser.add_argument('--events', help='JSON-lines file of recorded events instead of the synthetic stream')
+    parser.add_argument('--concurrency', type=int, default=8, help='Events in flight at once')
+    parser.add_argument('--rate', type=float, default=0.0, help='Events per second (0 = as fast as possible)')
+    parser.add_argument('--duplicate-rate', type=float, default=0.05, help='Share of events redelivered')
+    parser.add_argument('--invalid-rate', type=float, default=0.01, help='Share of malformed events mixed in')
+    parser.add_argument('--secret', default='', help='Sign events with this BISON_WEBHOOK_SECRET')
+    parser.add_argument('--retries', type=int, default=5, help='Redeliveries of an event answered with 503')
+    add_batcher_arguments(parser)
+    add_policy_argument(parser)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    if args.quoted_body:
+        set_policy(args.quoted_body)
+
+    dataset = dataset_from_args(args)
+    source = (lambda: load_events(args.events)) if args.events else dataset.webhook_events
+
+    print("=" * 60)
+    print("Bison Webhook Replay")
+    print("=" * 60)
+    print(f"Events: {args.events or f'{args.replies} synthetic replies across {args.clients} clients'}")
+    print(f"Concurrency: {args.concurrency}, rate: {args.rate or 'unlimited'}/s, "
+          f"duplicates: {args.duplicate_rate:.0%}, invalid: {args.invalid_rate:.0%}")
+    print()
+
+    events = with_faults(source(), args.duplicate_rate, args.invalid_rate, args.seed)
+    if args.url:
+        result = replay(args.url.rstrip('/'), events, args.concurrency, args.rate, args.secret, args.retries)
+        receiver = server = None
+    else:
+        server = MockServer(state_from_args(args)).start()
+        metrics = Metrics('bison-webhook-replay')
+        batcher = ReplyBatcher(metrics, supabase_url=server.url, max_rows=args.batch_rows,
+                               max_wait=args.max_wait, max_pending=args.max_pending)
+        receiver = WebhookReceiver(batcher, secret=args.secret, insecure=not args.secret).start()
+        print(f"📬 Receiver on {receiver.url} writing to mock Supabase on {server.url}")
+        result = replay(receiver.url, events, args.concurrency, args.rate, args.secret, args.retries)
+        receiver.stop()
+
+    latencies = result['latencies']
+    print("\n" + "=" * 60)
+    print("REPLAY SUMMARY")
+    print("=" * 60)
+    print(f"Events sent: {result['sent']} in {result['wall_seconds']:.1f}s "
+          f"({result['sent'] / result['wall_seconds'] if result['wall_seconds'] else 0:.0f}/s)")
+    for key, count in sorted(result['statuses'].items()):
+        print(f"  {key}: {count}")
+    print(f"Ack latency (including redeliveries): p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, max {max(latencies or [0]) * 1000:.1f} ms")
+
+    problems: List[str] = []
+    if receiver:
+        print_receiver_summary(receiver)
+        lag = receiver.metrics.snapshot()['histograms'].get('rillation_write_buffer_wait_seconds', [])
+        if lag:
+            total = sum(series['sum'] for series in lag)
+            count = sum(series['count'] for series in lag)
+            print(f"Average ingest lag: {total / count:.2f}s")
+
+        expected: Dict[int, Dict] = {}
+        for client, event in source():
+            client, reply = extract_reply(event, client)
+            if reply is not None:
+                row = map_bison_reply_to_supabase(reply, client)
+                expected[row['reply_id']] = row
+        problems = verify(server, expected)
+        server.stop()
+        print(f"\nVerified {len(expected)} replies: {len(problems)} problems")
+        for problem in problems[:10]:
+            print(f"  - {problem}")
+
+    failed = sum(count for key, count in result['statuses'].items()
+                 if not key.startswith('invalid') and not key.endswith(' 202'))
+    print("\n✅ Replay completed!" if not problems and not failed else f"\n⚠️  {failed} events not accepted")
+    sys.exit(1 if problems or failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+"""
+Shared helpers for the Rillation Revenue sync and maintenance scripts.
+The top-level scripts import from here; nothing in this package runs on import.
+"""
@@ -0,0 +1,7 @@
+"""python3 -m rillation: see rillation.cli"""
+
+import sys
+
+from rillation.cli import main
+
+sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Campaign activity windows, so the recompute jobs skip dormant campaign days.
+
+Many campaign_reporting rows are all zeros: days before a campaign started
+sending, after it finished, or for drafts that never sent. The fixers used to
+spend a /campaigns/{id}/stats call and a rate-limit sleep on each of them.
+ActivityIndex builds one window per campaign from
+
+  - the campaign's Bison status and creation date (GET /campaigns per client)
+  - the first and last stored day with emails_sent > 0 (one streamed read of
+    campaign_reporting's non-zero rows, campaign_id/date only)
+
+and answers should_fetch(campaign_id, day):
+
+  - days in the last RECENT_DAYS are always fetched (stats are still arriving)
+  - days before the campaign was created in Bison are skipped, and every day
+    of a draft (it has never been launched)
+  - completed/stopped/archived campaigns are skipped TRAILING_DAYS after the
+    last stored send (replies and bounces trail the final step)
+
+The stored rows are what the fixers repair, so they only bound a window where
+Bison confirms the campaign is over: a finished campaign without a creation
+date is skipped before its first stored send, and entirely when it has none.
+Running, paused and unknown-status campaigns without a creation date stay
+open from their first stored row, so stale zero rows are still re-checked.
+
+Skipped pairs are counted by reason (rillation_activity_skipped_total). A
+campaign whose status could not be read is treated as still running, and jobs
+run with --no-skip-dormant when a full re-check is wanted.
+
+Run (prints the windows):
+    python3 -m rillation.activity [--client NAME]
+"""
+
+import argparse
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+import requests
+
+from rillation.clients import load_clients
+from rillation.config import BISON_API_BASE
+from rillation.metrics import Metrics, instrumented_session, print_endpoint_summary
+from rillation.rows import stream_rows
+
+# Statuses after which a campaign sends nothing more (Bison spells them capitalized)
+FINISHED_STATUSES = {'completed', 'stopped', 'archived', 'failed', 'pending deletion'}
+
+# Statuses of campaigns that have never been launched
+UNLAUNCHED_STATUSES = {'draft'}
+
+# Days before today that are always fetched
+RECENT_DAYS = 3
+
+# Days after a finished campaign's last send that are still fetched
+TRAILING_DAYS = 14
+
+SEND_DAYS_QUERY = 'select=campaign_id,date&emails_sent=gt.0&order=campaign_id.asc,date.asc,id.asc'
+
+
+class ActivityIndex:
+    """campaign_id -> {'status', 'created', 'first_send', 'last_send'}; see the module docstring"""
+
+    def __init__(self, windows: Dict[int, Dict], metrics: Optional[Metrics] = None,
+                 today: Optional[date] = None, recent_days: int = RECENT_DAYS):
+        self.windows = windows
+        self.metrics = metrics
+        self.recent_from = ((today or date.today()) - timedelta(days=recent_days)).isoformat()
+        self.skipped: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, http: requests.Session, clients: Iterable[Dict], metrics: Optional[Metrics] = None,
+              client: Optional[str] = None) -> 'ActivityIndex':
+        """
+        Windows for every campaign with a stored send (optionally one client's)
+        plus the status and creation date of each client's campaigns. Raises if
+        campaign_reporting can't be read; a client whose campaign list fails is
+        left without statuses.
+        """
+        windows: Dict[int, Dict] = {}
+        query = SEND_DAYS_QUERY + (f'&client=eq.{quote(client)}' if client else '')
+        for row in stream_rows(http, 'campaign_reporting', query, metrics=metrics, stage='activity_index'):
+            window = windows.setdefault(int(row['campaign_id']), {'status': None, 'created': None,
+                                                                  'first_send': row['date']})
+            window['last_send'] = row['date']
+
+        for entry in clients:
+            if (client and entry['name'] != client) or not entry.get('api_token'):
+                continue
+            try:
+                campaigns = fetch_campaign_statuses(http, entry['api_token'])
+            except requests.exceptions.RequestException as e:
+                print(f"  ⚠️  Campaign statuses unavailable for {entry['name']} ({e}); treating them as running")
+                continue
+            for campaign_id, campaign in campaigns.items():
+                windows.setdefault(campaign_id, {'first_send': None, 'last_send': None}).update(campaign)
+        return cls(windows, metrics)
+
+    def skip_reason(self, campaign_id: int, day: str) -> Optional[str]:
+        """Why the (campaign, day) pair can be skipped, or None if it must be fetched"""
+        if day >= self.recent_from:
+            return None
+        window = self.windows.get(int(campaign_id)) or {}
+        status = window.get('status')
+        if status in UNLAUNCHED_STATUSES:
+            return 'never_sent'
+        finished = status in FINISHED_STATUSES
+        if window.get('created'):
+            if day < window['created']:
+                return 'before_first_send'
+        elif finished:
+            if window.get('first_send') is None:
+                return 'never_sent'
+            if day < window['first_send']:
+                return 'before_first_send'
+        if finished and window.get('last_send'):
+            trailing_end = (date.fromisoformat(window['last_send']) + timedelta(days=TRAILING_DAYS)).isoformat()
+            if day > trailing_end:
+                return 'finished'
+        return None
+
+    def should_fetch(self, campaign_id: int, day: str, rows: int = 1) -> bool:
+        """skip_reason, counting `rows` skipped rows under the reason"""
+        reason = self.skip_reason(campaign_id, day)
+        if reason is None:
+            return True
+        self.skipped[reason] = self.skipped.get(reason, 0) + rows
+        if self.metrics is not None:
+            self.metrics.inc('rillation_activity_skipped_total', rows, reason=reason)
+        return False
+
+    @property
+    def total_skipped(self) -> int:
+        return sum(self.skipped.values())
+
+    def summary(self, delay: float = 0.0) -> str:
+        """One line for a job's summary: calls saved, by reason, and the sleep avoided"""
+        if not self.skipped:
+            return 'Stats calls saved by the activity index: 0'
+        reasons = ', '.join(f"{reason} {count}" for reason, count in sorted(self.skipped.items()))
+        line = f"Stats calls saved by the activity index: {self.total_skipped} ({reasons})"
+        if delay:
+            line += f", ~{self.total_skipped * delay:.0f}s of rate-limit delay"
+        return line
+
+
+def fetch_campaign_statuses(http: requests.Session, api_token: str) -> Dict[int, Dict]:
+    """
+    campaign id -> {'status' (lower-cased), 'created' (YYYY-MM-DD or None)} for
+    one client, following the list's pages
+    """
+    headers = {
+        'Authorization': f'Bearer {api_token}',
+        'Content-Type': 'application/json'
+    }
+    statuses: Dict[int, str] = {}
+    page = 1
+    while True:
+        response = http.get(f'{BISON_API_BASE}/campaigns', headers=headers, params={'page': page}, timeout=30)
+        response.raise_for_status()
+        body = response.json()
+        for campaign in body.get('data') or []:
+            if campaign.get('id') is not None and campaign.get('status'):
+                created = campaign.get('created_at')
+                statuses[int(campaign['id'])] = {'status': str(campaign['status']).strip().lower(),
+                                                 'created': str(created)[:10] if created else None}
+        meta = body.get('meta') or {}
+        if not body.get('data') or page >= int(meta.get('last_page') or page):
+            return statuses
+        page += 1
+
+
+def load_activity_index(http: requests.Session, metrics: Metrics, clients: List[Dict],
+                        client: Optional[str] = None) -> Optional[ActivityIndex]:
+    """ActivityIndex.build for a job; None (skip nothing) if the index can't be built"""
+    try:
+        index = ActivityIndex.build(http, clients, metrics=metrics, client=client)
+    except Exception as e:
+        print(f"⚠️  Activity index unavailable ({e}); every pair will be fetched")
+        return None
+    print(f"🗂️  Activity index: {len(index.windows)} campaigns")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the campaign activity windows the recompute jobs skip by')
+    parser.add_argument('--client', help='Only this client')
+    args = parser.parse_args()
+
+    metrics = Metrics('activity-index')
+    http = instrumented_session(metrics)
+
+    index = ActivityIndex.build(http, load_clients(http), metrics=metrics, client=args.client)
+    print(f"{'campaign':>10}  {'status':<12} {'created':<11} {'first send':<11} {'last send':<11}")
+    for campaign_id, window in sorted(index.windows.items()):
+        print(f"{campaign_id:>10}  {window.get('status') or '?':<12} {window.get('created') or '-':<11} "
+              f"{window.get('first_send') or '-':<11} {window.get('last_send') or '-':<11}")
+    print(f"\nAlways fetched from {index.recent_from}; finished campaigns {TRAILING_DAYS} days past their last send")
+    print_endpoint_summary(metrics)
+    metrics.export()
+
+
+if __name__ == '__main__':
+    main()
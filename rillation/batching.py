@@ -0,0 +1,161 @@
+"""
+Adaptive write batch sizes, remembered per table between runs.
+
+BufferedWriter cut every batch at the same max_rows / max_bytes whatever the
+table: a batch of replies with long text bodies could run into the request
+size limit (413) or time out, while narrow campaign_reporting rows went out
+in many small requests. A BatchTuner keeps a row and serialized-byte limit
+per table instead, and the writer reports every insert/upsert request back:
+
+  - a success answered within FAST_SECONDS grows whichever limit the batch
+    filled by GROW_FACTOR (a half-empty batch says nothing about the limit)
+  - a success slower than SLOW_SECONDS shrinks both limits to SHRINK_FACTOR
+    of that batch
+  - a 413, a 504 or a timeout halves both limits; the writer splits that
+    batch and sends the halves instead of resending it as-is
+
+Limits stay within MIN_BYTES..MAX_BYTES and 1..MAX_ROWS. They are saved to
+metrics/write-batch-sizes.json when the writer closes and are the starting
+point of the next run, for any job writing the same table. Tables without a
+saved size start from the writer's own max_rows / max_bytes. PATCH updates
+are not tuned: their keys go in the URL, which max_rows already bounds.
+
+Run (prints the saved sizes):
+    python3 -m rillation.batching [--reset]
+"""
+
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from rillation.metrics import METRICS_DIR, Metrics
+
+STATE_FILE = os.path.join(METRICS_DIR, 'write-batch-sizes.json')
+
+MIN_BYTES = 16_000
+MAX_BYTES = 4_000_000
+MAX_ROWS = 5000
+
+# Request latency (s) under which a full batch grows, and over which batches shrink
+FAST_SECONDS = 1.0
+SLOW_SECONDS = 5.0
+
+GROW_FACTOR = 1.25
+SHRINK_FACTOR = 0.75
+
+# Answers meaning the batch itself was too big (0 = client-side timeout)
+TOO_LARGE_STATUSES = frozenset({0, 413, 504})
+
+
+class BatchTuner:
+    """Per-table batch limits for BufferedWriter; see the module docstring"""
+
+    def __init__(self, metrics: Optional[Metrics] = None, state_file: Optional[str] = None,
+                 default_rows: int = 500, default_bytes: int = 1_000_000):
+        self.metrics = metrics
+        self.state_file = state_file or STATE_FILE
+        self.default_rows = default_rows
+        self.default_bytes = default_bytes
+        self.saved = _load(self.state_file)
+        # table -> {'max_rows', 'max_bytes'}
+        self.limits: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def limit(self, table: str) -> Tuple[int, int]:
+        """(max_rows, max_bytes) for the next batch of `table`"""
+        with self._lock:
+            limits = self._limits(table)
+            return limits['max_rows'], limits['max_bytes']
+
+    def _limits(self, table: str) -> Dict[str, int]:
+        limits = self.limits.get(table)
+        if limits is None:
+            saved = self.saved.get(table) or {}
+            limits = self.limits[table] = {
+                'max_rows': _clamp(int(saved.get('max_rows') or self.default_rows), 1, MAX_ROWS),
+                'max_bytes': _clamp(int(saved.get('max_bytes') or self.default_bytes), MIN_BYTES, MAX_BYTES),
+            }
+        return limits
+
+    def record(self, table: str, rows: int, size: int, seconds: float, status: int, ok: bool) -> bool:
+        """
+        Adjust the table's limits after one request of `rows` rows and `size`
+        bytes. Returns True when the failure means the batch was too big, so
+        the caller should split it rather than resend it.
+        """
+        with self._lock:
+            limits = self._limits(table)
+            before = dict(limits)
+            too_large = not ok and status in TOO_LARGE_STATUSES
+            if too_large:
+                limits['max_rows'] = _clamp(min(limits['max_rows'], rows) // 2, 1, MAX_ROWS)
+                limits['max_bytes'] = _clamp(min(limits['max_bytes'], size) // 2, MIN_BYTES, MAX_BYTES)
+            elif ok and seconds > SLOW_SECONDS:
+                limits['max_rows'] = _clamp(int(min(limits['max_rows'], rows) * SHRINK_FACTOR), 1, MAX_ROWS)
+                limits['max_bytes'] = _clamp(int(min(limits['max_bytes'], size) * SHRINK_FACTOR), MIN_BYTES, MAX_BYTES)
+            elif ok and seconds < FAST_SECONDS:
+                if rows >= limits['max_rows']:
+                    limits['max_rows'] = _clamp(int(limits['max_rows'] * GROW_FACTOR) + 1, 1, MAX_ROWS)
+                if size >= limits['max_bytes'] * 0.8:
+                    limits['max_bytes'] = _clamp(int(limits['max_bytes'] * GROW_FACTOR), MIN_BYTES, MAX_BYTES)
+            changed = limits != before
+            if changed and self.metrics is not None:
+                direction = 'grow' if limits['max_bytes'] + limits['max_rows'] > before['max_bytes'] + before['max_rows'] else 'shrink'
+                self.metrics.inc('rillation_write_batch_resizes_total', table=table, direction=direction)
+        return too_large
+
+    def save(self):
+        """Merge this run's limits into the state file (other tables are kept)"""
+        with self._lock:
+            if not self.limits:
+                return
+            tables = _load(self.state_file)
+            now = datetime.now(timezone.utc).isoformat()
+            for table, limits in self.limits.items():
+                tables[table] = dict(limits, updated_at=now)
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        tmp_path = f'{self.state_file}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'saved_at': now, 'tables': tables}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_file)
+
+
+def _clamp(value: int, low: int, high: int) -> int:
+    return max(low, min(high, value))
+
+
+def _load(path: str) -> Dict[str, Dict]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f).get('tables', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the write batch sizes tuned per table')
+    parser.add_argument('--state-file', default=STATE_FILE, help='Tuned sizes file')
+    parser.add_argument('--reset', action='store_true', help='Forget the tuned sizes')
+    args = parser.parse_args()
+
+    if args.reset:
+        if os.path.exists(args.state_file):
+            os.remove(args.state_file)
+        print(f"🧹 Removed {args.state_file}")
+        return
+    tables = _load(args.state_file)
+    if not tables:
+        print(f"No tuned batch sizes in {args.state_file}")
+        return
+    print(f"{'table':<24} {'max rows':>9} {'max bytes':>11}  updated")
+    for table, limits in sorted(tables.items()):
+        print(f"{table:<24} {limits.get('max_rows', 0):>9} {limits.get('max_bytes', 0):>11,}  {limits.get('updated_at', '')}")
+
+
+if __name__ == '__main__':
+    main()
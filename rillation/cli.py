@@ -0,0 +1,156 @@
+"""
+Single entry point for the sync, fixer and inventory jobs.
+
+    python3 -m rillation <command> [args] [+ <command> [args] ...]
+
+Each command runs an existing script or rillation module with its own
+arguments, exactly as if it had been launched on its own. Jobs joined with
+`+` run one after another in the same process, so they share the warm HTTP
+connection pool (rillation.metrics.shared_adapter) and the client registry
+(rillation.clients.load_clients) instead of reconnecting and re-reading
+Clients per script:
+
+    python3 -m rillation sync-replies --pages 2 + sync-stats + rollups + snapshots
+
+Nothing heavier than the standard library is imported until a job starts,
+so `--help` and `list` return immediately. A failing job stops the chain
+unless --keep-going is given; the exit code is non-zero if any job failed.
+"""
+
+import argparse
+import importlib
+import os
+import runpy
+import sys
+import time
+import traceback
+from typing import List, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAIN_SEPARATOR = '+'
+
+# Command -> (top-level script or rillation module, description)
+COMMANDS = {
+    'sync-replies': ('sync-bison-replies.py', 'Sync Email Bison replies to Supabase'),
+    'sync-stats': ('sync-campaign-stats.py', 'Sync campaign stats to campaign_reporting'),
+    'fix-leads-contacted': ('fix-total-leads-contacted.py', 'Recompute total_leads_contacted from sequence steps'),
+    'update-unique-contacts': ('update-unique-contacts-rr.py', 'Update unique contacts for Rillation Revenue'),
+    'recompute': ('recompute-campaign-metrics.py', 'Recompute every campaign metric from one stats call per campaign/date'),
+    'recategorize': ('recategorize-replies.py', 'Re-run reply categorization over stored replies'),
+    'rollups': ('rillation.rollups', 'Update client day/week/month rollups'),
+    'snapshots': ('rillation.snapshots', 'Build the dashboard snapshot files'),
+    'activity': ('rillation.activity', 'Show the campaign activity windows used to skip dormant days'),
+    'inventory': ('query-supabase-tables.py', 'Inventory Supabase tables and schemas'),
+    'discover-tables': ('discover-all-tables.py', 'Check candidate table names'),
+    'replies-schema': ('query-replies-schema.py', 'Show the replies table schema'),
+    'engaged-leads': ('query-engaged-leads.py', 'Show the engaged_leads columns and a sample row'),
+    'daemon': ('rillation.daemon', 'Run the adaptive sync daemon'),
+    'webhook': ('rillation.webhook', 'Run the Bison webhook receiver'),
+    'replay-webhooks': ('replay-webhook-events.py', 'Replay webhook events against the receiver'),
+    'mock-server': ('rillation.mock_server', 'Serve the local Supabase/Bison mock'),
+    'synthetic': ('rillation.synthetic', 'Generate synthetic fixtures'),
+    'pgcopy-check': ('rillation.pgcopy', 'Check the COPY loader against a local Postgres'),
+    'fanout': ('rillation.fanout', 'Run an edge function in concurrent date or campaign chunks'),
+    'batch-sizes': ('rillation.batching', 'Show the write batch sizes tuned per table'),
+    'redrive': ('rillation.deadletter', 'List dead-lettered work items, or retry one job\'s items'),
+    'codec-bench': ('rillation.codec', 'Compare the JSON codecs on reply and stats payloads'),
+    'quoting': ('rillation.quoting', 'Measure quoted-thread stripping on synthetic replies'),
+    'localdb': ('rillation.localdb', 'Sync reporting tables to local Parquet and query them with DuckDB'),
+    'benchmarks': ('run-benchmarks.py', 'Benchmark the sync scripts against the mock'),
+}
+
+
+def split_chain(argv: List[str]) -> List[List[str]]:
+    """['a', '-x', '+', 'b'] -> [['a', '-x'], ['b']]"""
+    chain, current = [], []
+    for token in argv:
+        if token == CHAIN_SEPARATOR:
+            chain.append(current)
+            current = []
+        else:
+            current.append(token)
+    chain.append(current)
+    return chain
+
+
+def run_job(command: str, args: List[str]) -> int:
+    """Run one command in this process; returns its exit code"""
+    target, _ = COMMANDS[command]
+    saved_argv = sys.argv
+    sys.argv = [f'rillation {command}', *args]
+    try:
+        if target.endswith('.py'):
+            runpy.run_path(os.path.join(REPO_DIR, target), run_name='__main__')
+        else:
+            importlib.import_module(target).main()
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv = saved_argv
+
+
+def print_commands():
+    width = max(len(name) for name in COMMANDS)
+    for name, (target, description) in COMMANDS.items():
+        print(f"  {name.ljust(width)}  {description} ({target})")
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    parser = argparse.ArgumentParser(
+        prog='rillation',
+        description='Run sync, fixer and inventory jobs; chain several with "+" to share connections and clients',
+        usage='python3 -m rillation [--keep-going] <command> [args] [+ <command> [args] ...]')
+    parser.add_argument('--keep-going', action='store_true', help='Run the rest of the chain after a job fails')
+    parser.add_argument('command', nargs='?', help="Command to run, or 'list'")
+
+    # Options before the first command belong to the CLI; everything after it to the jobs
+    first = next((index for index, token in enumerate(argv) if not token.startswith('-')), len(argv))
+    options = parser.parse_args(argv[:first])
+    chain = split_chain(argv[first:])
+
+    if not chain[0] or chain[0][0] == 'list':
+        print("Commands:")
+        print_commands()
+        return 0
+    unknown = [job[0] if job else '(empty)' for job in chain if not job or job[0] not in COMMANDS]
+    if unknown:
+        parser.error(f"Unknown command(s): {', '.join(unknown)}. Run 'python3 -m rillation list'.")
+
+    results: List[Tuple[str, int, float]] = []
+    for command, *args in chain:
+        if len(chain) > 1:
+            print(f"\n▶️  rillation {' '.join([command, *args])}")
+        start = time.perf_counter()
+        code = run_job(command, args)
+        results.append((command, code, time.perf_counter() - start))
+        if code and not options.keep_going:
+            break
+
+    if len(chain) > 1:
+        print("\n" + "=" * 60)
+        print("CHAIN SUMMARY")
+        print("=" * 60)
+        for command, code, seconds in results:
+            print(f"  {'✅' if code == 0 else '❌'} {command}: {seconds:.1f}s" + (f" (exit {code})" if code else ""))
+        skipped = len(chain) - len(results)
+        if skipped:
+            print(f"  ⏭️  {skipped} job(s) not run")
+    failed = [code for _, code, _ in results if code]
+    return failed[0] if failed else (1 if len(results) < len(chain) else 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Client registry: Clients rows reduced to (name, Bison API token).
+
+The Clients table has used several column names for the business name and the
+Bison token over time; client_name() and api_token() accept all of them.
+Reads ask for just the two current columns (CLIENT_COLUMNS) and only fall back
+to select=* when PostgREST rejects them because the table uses older names.
+
+load_clients keeps the registry for CLIENT_CACHE_SECONDS, so per-client token
+lookups and jobs chained in one process (rillation.cli) read Clients once.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import requests
+
+from rillation.config import SUPABASE_HEADERS, SUPABASE_URL
+
+
+# Business name and Bison token columns in the current Clients schema
+CLIENT_COLUMNS = ('Business', 'Api Key - Bison')
+
+CLIENT_SELECT = quote(','.join(f'"{column}"' for column in CLIENT_COLUMNS), safe=',')
+
+# How long load_clients reuses the registry it last read
+CLIENT_CACHE_SECONDS = 300.0
+
+_registry: Dict = {'clients': None, 'loaded_at': 0.0}
+_registry_lock = threading.Lock()
+
+
+def client_name(row: Dict) -> Optional[str]:
+    return row.get('Business') or row.get('business') or row.get('name') or row.get('client_name')
+
+
+def api_token(row: Dict) -> Optional[str]:
+    return (
+        row.get('Api Key - Bison') or
+        row.get('api_key_bison') or
+        row.get('api_token') or
+        row.get('api_secret') or
+        row.get('token') or
+        row.get('secret')
+    )
+
+
+def fetch_client_rows(http: requests.Session, supabase_url: str = SUPABASE_URL,
+                      headers: Optional[Dict] = None) -> List[Dict]:
+    """Clients rows (Clients, else clients), projected to CLIENT_COLUMNS where the table has them"""
+    for table in ('Clients', 'clients'):
+        for select in (CLIENT_SELECT, '*'):
+            response = http.get(f'{supabase_url}/rest/v1/{table}?select={select}', headers=headers or SUPABASE_HEADERS,
+                                timeout=10)
+            # 400 = a projected column doesn't exist in this table
+            if response.status_code != 400:
+                break
+        if response.ok:
+            return response.json()
+    raise Exception(f'Failed to fetch clients: HTTP {response.status_code} - {response.text[:200]}')
+
+
+def load_clients(http: requests.Session, max_age: float = CLIENT_CACHE_SECONDS) -> List[Dict]:
+    """
+    All clients as {'name', 'api_token'} dicts; clients without a token are
+    returned with api_token None so callers can report them. A registry read
+    less than `max_age` seconds ago is reused (max_age=0 always re-reads).
+    """
+    with _registry_lock:
+        if _registry['clients'] is not None and time.monotonic() - _registry['loaded_at'] < max_age:
+            return [dict(client) for client in _registry['clients']]
+
+        clients = []
+        for row in fetch_client_rows(http):
+            name = client_name(row)
+            if name:
+                clients.append({'name': name, 'api_token': api_token(row)})
+        _registry['clients'] = clients
+        _registry['loaded_at'] = time.monotonic()
+        return [dict(client) for client in clients]
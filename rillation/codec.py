@@ -0,0 +1,163 @@
+"""
+JSON codec for request and response bodies.
+
+Every body the jobs send or read goes through here: InstrumentedSession
+encodes json= arguments with dumps() and its responses' .json() decode with
+loads(), and BufferedWriter serializes each row once, straight to bytes, and
+joins those bytes into batch bodies (join_array) instead of re-encoding the
+batch. orjson is used when it is installed (pip install orjson, several times
+faster on reply pages and large batches); otherwise the standard library.
+RILLATION_JSON=stdlib forces the fallback, e.g. to rule the codec out.
+
+Both encoders write compact UTF-8 JSON and agree on everything the jobs
+send: values JSON has no type for (datetimes, dates, UUIDs, Decimals) become
+str(value), e.g. "2025-01-02 03:04:05+00:00"; NaN and +-Infinity become null
+(the standard library would write NaN, which PostgREST rejects); integers
+beyond 64 bits, which orjson refuses, are encoded by the standard library.
+The one difference left is how floats that need an exponent are spelled:
+1e+20 and 1.5e-05 from the standard library, 1e20 and 0.000015 from orjson,
+the same numbers once decoded. Nothing hashes codec output across runs (row
+fingerprints use json directly). `python3 -m rillation.codec` compares the
+two on synthetic reply and stats payloads.
+
+Run:
+    python3 -m rillation.codec [--rows 2000] [--repeat 5]
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # optional dependency; the stdlib codec is used without it
+    orjson = None
+
+
+def _stdlib_dumps(value: Any, sort_keys: bool = False) -> bytes:
+    try:
+        text = json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str,
+                          sort_keys=sort_keys, allow_nan=False)
+    except ValueError:
+        # NaN / Infinity somewhere: write null, as orjson does
+        text = json.dumps(_finite(value), separators=(',', ':'), ensure_ascii=False, default=str,
+                          sort_keys=sort_keys)
+    return text.encode('utf-8')
+
+
+def _finite(value: Any) -> Any:
+    """`value` with non-finite floats replaced by None"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _stdlib_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+if orjson is not None:
+    def _orjson_dumps(value: Any, sort_keys: bool = False) -> bytes:
+        # Datetimes go through default=str like the standard library's, not orjson's RFC 3339
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(value, default=str, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits
+            return _stdlib_dumps(value, sort_keys)
+
+    _orjson_loads = orjson.loads
+
+# Codec name -> (dumps, loads)
+CODECS: Dict[str, tuple] = {'stdlib': (_stdlib_dumps, _stdlib_loads)}
+if orjson is not None:
+    CODECS['orjson'] = (_orjson_dumps, _orjson_loads)
+
+CODEC = os.environ.get('RILLATION_JSON') or ('orjson' if orjson is not None else 'stdlib')
+if CODEC not in CODECS:
+    CODEC = 'stdlib'
+
+dumps: Callable[..., bytes]
+loads: Callable[[Union[bytes, str]], Any]
+dumps, loads = CODECS[CODEC]
+
+
+def join_array(encoded: Iterable[bytes]) -> bytes:
+    """A JSON array body from already-encoded elements"""
+    return b'[' + b','.join(encoded) + b']'
+
+
+def _payloads(rows: int) -> Dict[str, Any]:
+    """Reply pages and stats bodies shaped like the Bison responses, plus a replies write batch"""
+    from rillation.synthetic import SyntheticDataset
+
+    dataset = SyntheticDataset(clients=2, replies=rows, campaign_rows=max(1, rows // 4))
+    mock = dataset.mock_dataset()
+    token = next(iter(mock['bison_replies']))
+    replies = list(mock['bison_replies'][token][:rows])
+    campaign_rows = mock['tables']['campaign_reporting'][:max(1, rows // 4)]
+    stats = []
+    for row in campaign_rows:
+        payload = mock['stats_provider'](token, int(row['campaign_id']), row['date'], row['date'])
+        if payload is not None:
+            stats.append({'data': payload})
+    return {
+        'reply pages': {'data': replies, 'meta': {'current_page': 1, 'total': len(replies)}},
+        'stats bodies': stats,
+        'replies batch': mock['tables']['replies'][:rows],
+        'campaign_reporting batch': campaign_rows,
+    }
+
+
+def _time(function: Callable, argument: Any, repeat: int) -> float:
+    best: Optional[float] = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best or 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the JSON codecs on realistic payloads')
+    parser.add_argument('--rows', type=int, default=2000, help='Replies per payload (stats bodies: a quarter)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (the best is kept)')
+    args = parser.parse_args()
+
+    payloads = _payloads(args.rows)
+    print(f"JSON codec in use: {CODEC} (available: {', '.join(CODECS)})\n")
+    print(f"{'payload':<26} {'codec':<7} {'bytes':>10} {'encode ms':>10} {'decode ms':>10}")
+    for name, payload in payloads.items():
+        baseline = None
+        for codec, (encode, decode) in CODECS.items():
+            body = encode(payload)
+            encode_ms = _time(encode, payload, args.repeat) * 1000
+            decode_ms = _time(decode, body, args.repeat) * 1000
+            line = f"{name:<26} {codec:<7} {len(body):>10,} {encode_ms:>10.2f} {decode_ms:>10.2f}"
+            if baseline is None:
+                baseline = (encode_ms, decode_ms)
+            elif encode_ms and decode_ms:
+                line += f"   {baseline[0] / encode_ms:.1f}x / {baseline[1] / decode_ms:.1f}x"
+            print(line)
+    # The writer path: old = stdlib size per row, then the batch encoded again
+    batch = payloads['replies batch']
+    before = _time(lambda rows: (
+        [len(json.dumps(row, default=str)) for row in rows], json.dumps(rows, default=str).encode('utf-8')
+    ), batch, args.repeat) * 1000
+    after = _time(lambda rows: join_array([dumps(row) for row in rows]), batch, args.repeat) * 1000
+    print(f"\nBufferedWriter, {len(batch)} replies: {before:.2f} ms encoding twice with stdlib, "
+          f"{after:.2f} ms encoding once with {CODEC}" + (f" ({before / after:.1f}x)" if after else ""))
+    if orjson is None:
+        print("\norjson is not installed (pip install orjson); only the stdlib codec was measured")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,499 @@
+"""
+Long-running sync daemon with adaptive per-client polling.
+
+Instead of cron cold-starting each script and polling every client at the same
+rate, the daemon keeps one HTTP session, the client list, each client's recent
+reply_ids and each campaign's last stored metrics in memory, and schedules two
+kinds of poll per client:
+
+  replies   page 1 of Bison /replies (more pages only while every reply on the
+            page is new); new replies go to the replies table
+  stats     today's /campaigns/{id}/stats for the client's recent campaigns;
+            only rows whose metrics changed are written to campaign_reporting
+
+Each poll's interval adapts to what it finds: halved when it found new data,
+stretched by half when it found nothing, kept within --min-interval and
+--max-interval. Busy clients converge on polling every few minutes, dormant
+ones on hourly.
+
+All Bison calls, retries included, draw from one token bucket (--budget requests
+per minute). When the bucket is empty, polls wait; since busy clients are due
+more often they keep most of the budget. Supabase reads and writes are not counted.
+
+Bison calls are retried with the shared RetryPolicy, and each client has a
+circuit breaker (rillation.retry): after repeated 401/403/5xx responses that
+client's polls are skipped until one probe succeeds --breaker-reset seconds later.
+
+Schedules (intervals and next due times) are saved to the state file on exit
+and every --export-interval, so a restart resumes the learned rates.
+
+Run:
+    python3 -m rillation.daemon --budget 120
+"""
+
+import argparse
+import heapq
+import json
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+from rillation.clients import load_clients
+from rillation.config import BISON_API_BASE, SUPABASE_HEADERS, SUPABASE_URL
+from rillation.metrics import METRICS_DIR, Metrics, instrumented_session, print_endpoint_summary
+from rillation.quoting import BodySummary, add_policy_argument, print_body_summary, set_policy
+from rillation.replies import map_bison_reply_to_supabase, reply_text_body
+from rillation.retry import CircuitBreakers, CircuitOpenError, print_breaker_summary, request_with_retry
+from rillation.stats import METRIC_COLUMNS, map_api_response_to_campaign_reporting, row_fingerprint
+from rillation.writer import BufferedWriter
+
+STATE_FILE = os.path.join(METRICS_DIR, 'sync-daemon-state.json')
+
+POLL_KINDS = ('replies', 'stats')
+
+# reply_ids remembered per client to recognise replies already stored
+SEEN_REPLIES_PER_CLIENT = 5000
+
+# How far back campaign_reporting is read to find a client's current campaigns
+CAMPAIGN_LOOKBACK_DAYS = 7
+
+
+class RequestBudget:
+    """Token bucket shared by every Bison call: `per_minute` requests, bursts up to one minute's worth"""
+
+    def __init__(self, per_minute: float, metrics: Metrics):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute)
+        self.tokens = self.capacity
+        self.metrics = metrics
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, stop: threading.Event) -> bool:
+        """Take one request; waits for a token. False if the daemon is stopping."""
+        waited = 0.0
+        while not stop.is_set():
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    if waited:
+                        self.metrics.inc('rillation_daemon_budget_wait_seconds_total', waited)
+                    return True
+                delay = (1 - self.tokens) / self.rate
+            stop.wait(delay)
+            waited += delay
+        return False
+
+
+class ClientState:
+    """Warm per-client state: schedule and caches"""
+
+    def __init__(self, name: str, api_token: str, intervals: Dict[str, float]):
+        self.name = name
+        self.api_token = api_token
+        self.interval = dict(intervals)
+        self.last_new: Dict[str, Optional[str]] = {kind: None for kind in POLL_KINDS}
+        self.seen = deque(maxlen=SEEN_REPLIES_PER_CLIENT)
+        self.seen_set = set()
+        self.seen_loaded = False
+        # /replies page a failed poll stopped at; the next poll reads at least that far
+        self.resume_page = 1
+        # campaign_id -> {'campaign_name', 'id' (today's row, if any), 'fingerprint', 'no_sequence'}
+        self.campaigns: Dict[int, Dict] = {}
+        self.campaigns_loaded_at = 0.0
+        self.campaigns_date: Optional[str] = None
+
+    def remember(self, reply_id: int):
+        if reply_id in self.seen_set:
+            return
+        if len(self.seen) == self.seen.maxlen:
+            self.seen_set.discard(self.seen[0])
+        self.seen.append(reply_id)
+        self.seen_set.add(reply_id)
+
+
+class SyncDaemon:
+    """Scheduler plus the reply and stats polls; see the module docstring"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.metrics = Metrics('sync-daemon')
+        self.http = instrumented_session(self.metrics)
+        self.writer = BufferedWriter(self.http, self.metrics, max_wait=args.write_wait)
+        self.budget = RequestBudget(args.budget, self.metrics)
+        self.breakers = CircuitBreakers(self.metrics, reset_after=args.breaker_reset)
+        self.bodies = BodySummary(self.metrics)
+        self.stop = threading.Event()
+        self.lock = threading.Condition()
+        self.clients: Dict[str, ClientState] = {}
+        self.queue: List[Tuple[float, int, str, str]] = []  # (due, seq, kind, client)
+        self._seq = 0
+        self.in_flight = 0
+        self.lag_seconds: List[float] = []
+        self.saved_state = self._load_state()
+
+    # ---- scheduling -----------------------------------------------------
+
+    def _load_state(self) -> Dict:
+        if not os.path.exists(self.args.state_file):
+            return {}
+        try:
+            with open(self.args.state_file) as f:
+                return json.load(f).get('clients', {})
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        with self.lock:
+            now, wall = time.monotonic(), time.time()
+            due = {(kind, name): when for when, _, kind, name in self.queue}
+            clients = {
+                name: {
+                    'interval': client.interval,
+                    'last_new': client.last_new,
+                    'next_due': {kind: wall + max(0.0, due[(kind, name)] - now)
+                                 for kind in POLL_KINDS if (kind, name) in due}
+                }
+                for name, client in self.clients.items()
+            }
+        os.makedirs(os.path.dirname(self.args.state_file) or '.', exist_ok=True)
+        tmp_path = f'{self.args.state_file}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'saved_at': datetime.now(timezone.utc).isoformat(), 'clients': clients}, f, indent=2)
+        os.replace(tmp_path, self.args.state_file)
+
+    def _schedule(self, kind: str, name: str, delay: float):
+        self._seq += 1
+        heapq.heappush(self.queue, (time.monotonic() + delay, self._seq, kind, name))
+        self.lock.notify_all()
+
+    def refresh_clients(self):
+        """(Re)load the client list; new clients are scheduled, removed ones dropped"""
+        try:
+            rows = load_clients(self.http, max_age=0)
+        except Exception as e:
+            self.metrics.inc('rillation_daemon_polls_total', kind='clients', result='error')
+            print(f"⚠️  Could not refresh clients: {e}")
+            return
+        with self.lock:
+            current = {row['name']: row['api_token'] for row in rows if row['api_token']}
+            for name in list(self.clients):
+                if name not in current:
+                    del self.clients[name]
+            wall = time.time()
+            for index, (name, token) in enumerate(sorted(current.items())):
+                if name in self.clients:
+                    self.clients[name].api_token = token
+                    continue
+                saved = self.saved_state.get(name, {})
+                intervals = {kind: self.args.initial_interval for kind in POLL_KINDS}
+                intervals.update({kind: value for kind, value in (saved.get('interval') or {}).items()
+                                  if kind in POLL_KINDS})
+                client = self.clients[name] = ClientState(name, token, intervals)
+                client.last_new.update(saved.get('last_new') or {})
+                for kind in POLL_KINDS:
+                    if kind in (saved.get('next_due') or {}):
+                        delay = max(0.0, saved['next_due'][kind] - wall)
+                    else:
+                        # Spread first polls so a restart doesn't burst every client at once
+                        delay = (index * 0.37) % max(1.0, self.args.min_interval)
+                    self._schedule(kind, name, delay)
+        self.metrics.inc('rillation_daemon_polls_total', kind='clients', result='ok')
+
+    def _adapt(self, client: ClientState, kind: str, found_new: bool):
+        interval = client.interval[kind] * (0.5 if found_new else 1.5)
+        client.interval[kind] = min(self.args.max_interval, max(self.args.min_interval, interval))
+        if found_new:
+            client.last_new[kind] = datetime.now(timezone.utc).isoformat()
+
+    def _run_poll(self, kind: str, name: str):
+        client = self.clients.get(name)
+        found_new = False
+        if client is not None:
+            try:
+                with self.metrics.stage(f'poll_{kind}'):
+                    found_new = self.poll_replies(client) if kind == 'replies' else self.poll_stats(client)
+                self.metrics.inc('rillation_daemon_polls_total', kind=kind, result='new' if found_new else 'idle')
+            except CircuitOpenError:
+                self.metrics.inc('rillation_daemon_polls_total', kind=kind, result='breaker_open')
+            except Exception as e:
+                self.metrics.inc('rillation_daemon_polls_total', kind=kind, result='error')
+                print(f"⚠️  {kind} poll for {name} failed: {e}")
+        with self.lock:
+            self.in_flight -= 1
+            if client is not None and name in self.clients:
+                self._adapt(client, kind, found_new)
+                self._schedule(kind, name, client.interval[kind])
+            self.lock.notify_all()
+
+    def run(self):
+        self.refresh_clients()
+        if not self.clients:
+            print("❌ No clients found with API tokens. Exiting.")
+            return
+        print(f"🔄 Polling {len(self.clients)} clients, budget {self.args.budget:g} Bison requests/minute")
+
+        started = time.monotonic()
+        next_refresh = started + self.args.clients_refresh
+        next_export = started + self.args.export_interval
+        with ThreadPoolExecutor(max_workers=self.args.workers, thread_name_prefix='poll') as pool:
+            while not self.stop.is_set():
+                now = time.monotonic()
+                if self.args.duration and now - started >= self.args.duration:
+                    break
+                if now >= next_refresh:
+                    self.refresh_clients()
+                    next_refresh = now + self.args.clients_refresh
+                if now >= next_export:
+                    self.report()
+                    next_export = now + self.args.export_interval
+
+                with self.lock:
+                    if self.queue and self.queue[0][0] <= now and self.in_flight < self.args.workers:
+                        _, _, kind, name = heapq.heappop(self.queue)
+                        self.in_flight += 1
+                        pool.submit(self._run_poll, kind, name)
+                        continue
+                    wake = min(next_refresh, next_export, self.queue[0][0] if self.queue else next_refresh)
+                    if self.args.duration:
+                        wake = min(wake, started + self.args.duration)
+                    self.lock.wait(max(0.01, min(1.0, wake - now)))
+            self.stop.set()
+
+        with self.metrics.stage('flush_writes'):
+            self.writer.close()
+        self.report(final=True)
+
+    # ---- polls ----------------------------------------------------------
+
+    def _bison_headers(self, client: ClientState) -> Dict:
+        return {'Authorization': f'Bearer {client.api_token}', 'Content-Type': 'application/json'}
+
+    def _load_seen(self, client: ClientState):
+        """Seed the reply_id cache with the newest stored replies (once per client)"""
+        url = (f'{SUPABASE_URL}/rest/v1/replies?select=reply_id&client=eq.{quote(client.name)}'
+               f'&order=reply_id.desc&limit={SEEN_REPLIES_PER_CLIENT}')
+        response = self.http.get(url, headers=SUPABASE_HEADERS, timeout=30)
+        if response.ok:
+            for row in reversed(response.json()):
+                client.remember(row['reply_id'])
+        client.seen_loaded = True
+
+    def _take_budget(self) -> bool:
+        """Wait for a budget token before each Bison request, retries included. False if stopping."""
+        return self.budget.acquire(self.stop)
+
+    def poll_replies(self, client: ClientState) -> bool:
+        if not client.seen_loaded:
+            self._load_seen(client)
+
+        stored = 0
+        for page in range(1, self.args.max_pages + 1):
+            if not self._take_budget():
+                break
+            try:
+                response = request_with_retry(self.http, 'GET', f'{BISON_API_BASE}/replies?page={page}',
+                                              breaker=self.breakers.get(client.name), before_retry=self._take_budget,
+                                              headers=self._bison_headers(client), timeout=30)
+                if not response.ok:
+                    raise Exception(f'Bison /replies page {page}: HTTP {response.status_code} - {response.text[:200]}')
+                data = response.json()
+            except Exception:
+                # Earlier pages are already buffered; the next poll must not stop short of this one
+                client.resume_page = max(client.resume_page, page)
+                raise
+            replies = data if isinstance(data, list) else (data.get('data') or [])
+            fresh = []
+            for reply in replies:
+                row = map_bison_reply_to_supabase(reply, client.name)
+                if row and row['reply_id'] not in client.seen_set:
+                    fresh.append((row, reply))
+            # Buffered before the next page is read, so a failure further back doesn't lose them
+            self._store_replies(client, fresh)
+            stored += len(fresh)
+            # Stop as soon as a page contains a reply we already have (past the page a failed poll stopped at)
+            if not replies or (len(fresh) < len(replies) and page >= client.resume_page):
+                break
+        if page >= client.resume_page:
+            client.resume_page = 1
+        return stored > 0
+
+    def _store_replies(self, client: ClientState, new_rows: List[Tuple[Dict, Dict]]):
+        """Remember and buffer one page's new (row, Bison reply) pairs"""
+        if not new_rows:
+            return
+        now = datetime.now(timezone.utc)
+        for row, reply in new_rows:
+            client.remember(row['reply_id'])
+            self.bodies.record_row(reply_text_body(reply), row)
+            received = reply.get('date_received')
+            if isinstance(received, str) and 'T' in received:
+                try:
+                    lag = (now - datetime.fromisoformat(received.replace('Z', '+00:00'))).total_seconds()
+                    self.metrics.inc('rillation_daemon_reply_lag_seconds_total', max(0.0, lag))
+                    with self.lock:
+                        self.lag_seconds.append(max(0.0, lag))
+                except ValueError:
+                    pass
+        self.writer.insert('replies', [row for row, _ in new_rows], on_conflict=('reply_id',), ignore_duplicates=True)
+        self.metrics.inc('rillation_daemon_new_rows_total', len(new_rows), kind='replies')
+
+    def _stats_date(self) -> str:
+        return self.args.date or datetime.now(timezone.utc).date().isoformat()
+
+    def _load_campaigns(self, client: ClientState, today: str):
+        """Current campaigns from recent campaign_reporting rows, with today's row id and metrics"""
+        since = (datetime.fromisoformat(today) - timedelta(days=CAMPAIGN_LOOKBACK_DAYS)).date().isoformat()
+        select = ','.join(['id', 'campaign_id', 'date'] + METRIC_COLUMNS)
+        url = (f'{SUPABASE_URL}/rest/v1/campaign_reporting?select={select}&client=eq.{quote(client.name)}'
+               f'&date=gte.{since}&date=lte.{today}&order=date.desc')
+        response = self.http.get(url, headers=SUPABASE_HEADERS, timeout=30)
+        if not response.ok:
+            raise Exception(f'campaign_reporting for {client.name}: HTTP {response.status_code} - {response.text[:200]}')
+
+        campaigns: Dict[int, Dict] = {}
+        for row in response.json():
+            campaign = campaigns.setdefault(row['campaign_id'], {
+                'campaign_name': row.get('campaign_name'), 'id': None, 'fingerprint': None,
+                'no_sequence': client.campaigns.get(row['campaign_id'], {}).get('no_sequence', False)
+            })
+            if row.get('date') == today and campaign['id'] is None:
+                campaign['id'] = row['id']
+                campaign['fingerprint'] = row_fingerprint(row)
+        client.campaigns = campaigns
+        client.campaigns_loaded_at = time.monotonic()
+        client.campaigns_date = today
+
+    def poll_stats(self, client: ClientState) -> bool:
+        today = self._stats_date()
+        stale = time.monotonic() - client.campaigns_loaded_at > self.args.clients_refresh
+        # Re-read when the day rolled over, the list is old, or rows inserted last poll need their ids
+        if stale or client.campaigns_date != today or any(
+                campaign['id'] is None and campaign['fingerprint'] for campaign in client.campaigns.values()):
+            self._load_campaigns(client, today)
+
+        changed = 0
+        for campaign_id, campaign in client.campaigns.items():
+            if campaign['no_sequence'] or not self._take_budget():
+                continue
+            response = request_with_retry(self.http, 'POST', f'{BISON_API_BASE}/campaigns/{campaign_id}/stats',
+                                          breaker=self.breakers.get(client.name), before_retry=self._take_budget,
+                                          headers=self._bison_headers(client),
+                                          json={'start_date': today, 'end_date': today}, timeout=30)
+            if response.status_code == 400 and 'can only be viewed for campaigns with a sequence' in response.text:
+                campaign['no_sequence'] = True
+                continue
+            if not response.ok:
+                raise Exception(f'stats for campaign {campaign_id}: HTTP {response.status_code} - {response.text[:200]}')
+            data = response.json()
+            payload = data.get('data') or data if isinstance(data, dict) else data
+
+            row = map_api_response_to_campaign_reporting(payload, campaign_id, campaign['campaign_name'],
+                                                         client.name, today, campaign['id'])
+            fingerprint = row_fingerprint(row)
+            if fingerprint == campaign['fingerprint']:
+                continue
+            campaign['fingerprint'] = fingerprint
+            if campaign['id']:
+                self.writer.upsert('campaign_reporting', [row], on_conflict=('id',))
+            else:
+                self.writer.insert('campaign_reporting', [row])
+            changed += 1
+
+        if changed:
+            self.metrics.inc('rillation_daemon_new_rows_total', changed, kind='stats')
+        return changed > 0
+
+    # ---- reporting ------------------------------------------------------
+
+    def report(self, final: bool = False):
+        metrics = self.metrics
+        elapsed = max(1e-9, time.time() - metrics.started_at)
+        bison_calls = sum(
+            row['requests'] for row in metrics.endpoint_summary()
+            if BISON_API_BASE.split('://', 1)[-1] in row['endpoint']
+        )
+        with self.lock:
+            intervals = {kind: sorted(client.interval[kind] for client in self.clients.values()) for kind in POLL_KINDS}
+            lags = list(self.lag_seconds)
+        line = (f"📡 {elapsed / 60:.1f} min: {bison_calls} Bison calls ({bison_calls / elapsed * 60:.1f}/min), "
+                f"{int(metrics.counter_value('rillation_daemon_new_rows_total', kind='replies'))} new replies, "
+                f"{int(metrics.counter_value('rillation_daemon_new_rows_total', kind='stats'))} stats rows changed")
+        for kind, values in intervals.items():
+            if values:
+                line += f", {kind} interval {values[0]:.0f}-{values[-1]:.0f}s (median {values[len(values) // 2]:.0f}s)"
+        print(line)
+
+        if final:
+            print("\n" + "=" * 60)
+            print("SYNC DAEMON SUMMARY")
+            print("=" * 60)
+            for kind in POLL_KINDS:
+                polls = {result: int(metrics.counter_value('rillation_daemon_polls_total', kind=kind, result=result))
+                         for result in ('new', 'idle', 'error', 'breaker_open')}
+                print(f"{kind} polls: {sum(polls.values())} ({polls['new']} found new data, {polls['error']} errors, "
+                      f"{polls['breaker_open']} skipped by an open breaker)")
+            if lags:
+                lags.sort()
+                print(f"Reply freshness lag: median {lags[len(lags) // 2]:.0f}s, max {lags[-1]:.0f}s")
+            print(f"Budget wait: {metrics.counter_value('rillation_daemon_budget_wait_seconds_total'):.1f}s")
+            print(f"Rows written: {sum(self.writer.written.values())}, write errors: {len(self.writer.errors)}")
+            print_body_summary(self.bodies)
+            print_breaker_summary(self.breakers)
+            print_endpoint_summary(metrics)
+
+        self.save_state()
+        prom_path, jsonl_path = metrics.export()
+        if final:
+            print(f"\n📈 Metrics written to {prom_path} and {jsonl_path}")
+            print(f"💾 Schedules saved to {self.args.state_file}")
+
+
+def add_daemon_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--budget', type=float, default=120.0, help='Bison requests per minute across all clients')
+    parser.add_argument('--min-interval', type=float, default=180.0, help='Shortest poll interval (s), for busy clients')
+    parser.add_argument('--max-interval', type=float, default=3600.0, help='Longest poll interval (s), for dormant clients')
+    parser.add_argument('--initial-interval', type=float, default=600.0, help='Interval for clients without saved state (s)')
+    parser.add_argument('--max-pages', type=int, default=10, help='Most reply pages read in one poll')
+    parser.add_argument('--workers', type=int, default=4, help='Polls running at once')
+    parser.add_argument('--clients-refresh', type=float, default=900.0, help='Reload clients and campaigns every N s')
+    parser.add_argument('--export-interval', type=float, default=300.0, help='Write metrics and state every N s')
+    parser.add_argument('--write-wait', type=float, default=2.0, help='Longest a row waits in the write buffer (s)')
+    parser.add_argument('--breaker-reset', type=float, default=900.0,
+                        help='Seconds before a tripped client breaker lets a probe request through')
+    parser.add_argument('--date', help='Stats date to poll (default: today, UTC)')
+    parser.add_argument('--duration', type=float, default=0.0, help='Exit after N seconds (0 = run until stopped)')
+    parser.add_argument('--state-file', default=STATE_FILE, help='Where schedules are saved between runs')
+    add_policy_argument(parser)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the reply and stats sync as a daemon with adaptive polling')
+    add_daemon_arguments(parser)
+    args = parser.parse_args()
+    if args.quoted_body:
+        set_policy(args.quoted_body)
+
+    print("=" * 60)
+    print("Rillation Sync Daemon")
+    print("=" * 60)
+    daemon = SyncDaemon(args)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop.set())
+    daemon.run()
+    print("\n✅ Daemon stopped")
+
+
+if __name__ == '__main__':
+    main()
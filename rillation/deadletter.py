@@ -0,0 +1,229 @@
+"""
+Dead-letter files for failed work items, and the redrive command.
+
+A row or client the fixers and the reply sync could not process (API error
+after retries, breaker open, rejected write, missing token) is appended to
+deadletter/<job>.jsonl with everything needed to retry it:
+
+    {"key": "…", "item": {…}, "error": "HTTP 503 - …", "class": "http_503",
+     "attempts": 1, "first_failed_at": "…", "last_failed_at": "…"}
+
+Lines are flushed as they are written, so the file survives a crash. Running
+the job with --redrive processes only the dead-lettered items instead of the
+whole table: the file is claimed first (renamed to <job>.jsonl.redriving),
+items that fail again are written back with attempts + 1, and the claimed
+file is removed once the run finishes. A redrive that dies midway leaves the
+claimed file, which the next claim merges back in.
+
+$RILLATION_DEADLETTER_DIR overrides the folder (default: ./deadletter).
+
+Run:
+    python3 -m rillation redrive                          # pending items per job
+    python3 -m rillation redrive fix-leads-contacted      # retry just those items
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from rillation.errors import Error, classify_error, error_message
+
+DEADLETTER_DIR = os.environ.get('RILLATION_DEADLETTER_DIR', 'deadletter')
+
+CLAIMED_SUFFIX = '.redriving'
+
+# CLI command -> job (dead-letter file name) for the jobs that accept --redrive
+REDRIVE_JOBS = {
+    'sync-replies': 'sync-bison-replies',
+    'fix-leads-contacted': 'fix-total-leads-contacted',
+    'update-unique-contacts': 'update-unique-contacts-rr',
+    'recompute': 'recompute-campaign-metrics',
+    'fanout': 'edge-fanout',
+}
+
+
+class DeadLetterQueue:
+    """Append-only dead-letter file for one job; see the module docstring"""
+
+    def __init__(self, job: str, directory: Optional[str] = None):
+        self.job = job
+        self.directory = directory or DEADLETTER_DIR
+        self.path = os.path.join(self.directory, f'{job}.jsonl')
+        self.added = 0
+        self._claimed: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def add(self, key, item: Dict, error: Error, error_class: Optional[str] = None):
+        """Record one failed item; `key` identifies it across runs (e.g. the row id)"""
+        now = datetime.now(timezone.utc).isoformat()
+        key = str(key)
+        with self._lock:
+            previous = self._claimed.get(key)
+            record = {
+                'key': key,
+                'item': item,
+                'error': error_message(error)[:1000],
+                'class': error_class or classify_error(error),
+                'attempts': (previous['attempts'] + 1) if previous else 1,
+                'first_failed_at': previous['first_failed_at'] if previous else now,
+                'last_failed_at': now,
+            }
+            if self._file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(record, separators=(',', ':'), default=str) + '\n')
+            self._file.flush()
+            self.added += 1
+
+    def pending(self) -> List[Dict]:
+        """Records waiting in the file and any unfinished claim, latest per key"""
+        return list(_latest(_read(self.path + CLAIMED_SUFFIX) + _read(self.path)).values())
+
+    def claim(self) -> List[Dict]:
+        """Take every pending record for a redrive; call finish() when the run is done"""
+        claimed_path = self.path + CLAIMED_SUFFIX
+        with self._lock:
+            records = _read(claimed_path) + _read(self.path)
+            self._claimed = _latest(records)
+            if os.path.exists(self.path):
+                # Rewrite the merged claim so the current file starts empty
+                tmp_path = claimed_path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for record in self._claimed.values():
+                        f.write(json.dumps(record, separators=(',', ':'), default=str) + '\n')
+                os.replace(tmp_path, claimed_path)
+                os.remove(self.path)
+        return list(self._claimed.values())
+
+    def finish(self):
+        """Close the file and drop the claimed records (failures were re-added)"""
+        self.close()
+        if self._claimed:
+            try:
+                os.remove(self.path + CLAIMED_SUFFIX)
+            except FileNotFoundError:
+                pass
+            self._claimed = {}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _read(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A line cut off by a crash mid-write
+                continue
+    return records
+
+
+def _latest(records: List[Dict]) -> Dict[str, Dict]:
+    """key -> newest record, keeping the earliest first_failed_at and most attempts"""
+    latest: Dict[str, Dict] = {}
+    for record in records:
+        previous = latest.get(record['key'])
+        if previous is not None:
+            record = dict(record,
+                          attempts=max(record.get('attempts', 1), previous.get('attempts', 1)),
+                          first_failed_at=min(record['first_failed_at'], previous['first_failed_at']))
+        latest[record['key']] = record
+    return latest
+
+
+def write_failure_recorder(queue: DeadLetterQueue, mode: str, on_conflict: Iterable[str] = ('id',),
+                           ignore_duplicates: bool = False) -> Callable[[str, List[Dict], str], None]:
+    """
+    on_failed callback for BufferedWriter/CopyWriter: every row a write gave up
+    on becomes a 'write' item, replayed as-is by redrive_items
+    """
+    on_conflict = list(on_conflict)
+    target = {'mode': mode, 'on_conflict': on_conflict, 'ignore_duplicates': ignore_duplicates}
+
+    def record(table: str, rows: List[Dict], message: str):
+        for row in rows:
+            key = ':'.join(str(row.get(column)) for column in on_conflict)
+            queue.add(f'write:{table}:{key}', {'write': dict(target, table=table), 'row': row}, message)
+    return record
+
+
+def redrive_items(queue: DeadLetterQueue, writer) -> List[Dict]:
+    """
+    Claim the queue for a --redrive run: dead-lettered writes go straight back
+    to the writer, and the remaining work items are returned for the job to
+    process again
+    """
+    records = queue.claim()
+    items = []
+    replayed = 0
+    for record in records:
+        item = record['item']
+        write = item.get('write')
+        if write:
+            if write['mode'] == 'update':
+                writer.update(write['table'], write['on_conflict'][0], [item['row']])
+            elif write['mode'] == 'upsert':
+                writer.upsert(write['table'], [item['row']], write['on_conflict'])
+            else:
+                writer.insert(write['table'], [item['row']], write['on_conflict'], write['ignore_duplicates'])
+            replayed += 1
+        else:
+            items.append(item)
+    print(f"📮 Redriving {len(records)} dead-lettered items from {queue.path} "
+          f"({replayed} writes replayed, {len(items)} to reprocess)")
+    return items
+
+
+def print_deadletter_summary(queue: DeadLetterQueue):
+    if queue.added:
+        print(f"\n📮 {queue.added} failed items written to {queue.path} "
+              f"(retry them with: python3 -m rillation redrive {_command_for(queue.job)})")
+
+
+def _command_for(job: str) -> str:
+    return next((command for command, name in REDRIVE_JOBS.items() if name == job), job)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='rillation redrive',
+        description='List dead-lettered work items, or retry one job\'s items',
+        usage='python3 -m rillation redrive [command [job args]]')
+    parser.add_argument('command', nargs='?', choices=sorted(REDRIVE_JOBS), help='Job whose items to retry')
+    args, job_args = parser.parse_known_args()
+
+    if args.command is None:
+        print("Dead-lettered items:")
+        for command, job in REDRIVE_JOBS.items():
+            records = DeadLetterQueue(job).pending()
+            classes: Dict[str, int] = {}
+            for record in records:
+                classes[record['class']] = classes.get(record['class'], 0) + 1
+            detail = ', '.join(f"{name} {count}" for name, count in sorted(classes.items(), key=lambda kv: -kv[1]))
+            print(f"  {command}: {len(records)}" + (f" ({detail})" if detail else ""))
+        return
+
+    from rillation.cli import run_job
+    code = run_job(args.command, ['--redrive', *job_args])
+    if code:
+        sys.exit(code)
+
+
+if __name__ == '__main__':
+    main()
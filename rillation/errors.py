@@ -0,0 +1,112 @@
+"""
+Bounded error aggregation for the sync and fixer runs.
+
+Jobs used to append every failure to stats['errors'], one entry per row, and
+print the first 10-20. ErrorSummary keeps the same append/extend/len interface
+but stores only a count per error class plus the first few messages of each
+class, so a run that fails on a million rows holds a few dozen strings. The
+failed items themselves go to the dead-letter file (rillation.deadletter).
+
+Classes come from the message unless given: circuit_open, HTTP status
+(http_401, http_503), timeout, connection, no_api_key, else the exception type or
+'other'. Counts are exported as rillation_errors_total{class=...}.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from rillation.metrics import Metrics
+
+# Messages kept per class
+SAMPLES_PER_CLASS = 5
+
+_HTTP_STATUS = re.compile(r'HTTP (\d{3})')
+
+Error = Union[str, Dict, BaseException]
+
+
+class StatsFetchError(Exception):
+    """A /campaigns/{id}/stats call that failed after retries (not the no-sequence 400)"""
+
+
+def error_message(error: Error) -> str:
+    if isinstance(error, dict):
+        context = ' '.join(f"{key} {value}" for key, value in error.items() if key != 'error')
+        return f"{context}: {error.get('error')}" if context else str(error.get('error'))
+    return str(error)
+
+
+def classify_error(error: Error) -> str:
+    """Error class for counting: HTTP status, breaker, timeout, connection or exception type"""
+    message = error_message(error)
+    lowered = message.lower()
+    if 'circuit open' in lowered:
+        return 'circuit_open'
+    match = _HTTP_STATUS.search(message)
+    if match:
+        return f'http_{match.group(1)}'
+    if 'timed out' in lowered or 'timeout' in lowered:
+        return 'timeout'
+    if 'connection' in lowered:
+        return 'connection'
+    if 'no api key' in lowered or 'no api token' in lowered:
+        return 'no_api_key'
+    if isinstance(error, BaseException):
+        return type(error).__name__
+    return 'other'
+
+
+class ErrorSummary:
+    """Error counts by class with a few sample messages each; list-like for the old call sites"""
+
+    def __init__(self, metrics: Optional[Metrics] = None, samples_per_class: int = SAMPLES_PER_CLASS):
+        self.metrics = metrics
+        self.samples_per_class = samples_per_class
+        self.counts: Dict[str, int] = {}
+        self.samples: Dict[str, List[str]] = {}
+
+    def append(self, error: Error, error_class: Optional[str] = None, count: int = 1):
+        error_class = error_class or classify_error(error)
+        self.counts[error_class] = self.counts.get(error_class, 0) + count
+        samples = self.samples.setdefault(error_class, [])
+        if len(samples) < self.samples_per_class:
+            samples.append(error_message(error))
+        if self.metrics is not None:
+            self.metrics.inc('rillation_errors_total', count, **{'class': error_class})
+
+    def extend(self, errors: Union['ErrorSummary', Iterable[Error]]):
+        if isinstance(errors, ErrorSummary):
+            for error_class, count in errors.counts.items():
+                samples = errors.samples.get(error_class) or ['']
+                self.append(samples[0], error_class, count=count)
+                for sample in samples[1:]:
+                    if len(self.samples[error_class]) < self.samples_per_class:
+                        self.samples[error_class].append(sample)
+            return
+        for error in errors:
+            self.append(error)
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.counts)
+
+    def __iter__(self) -> Iterator[str]:
+        """The kept sample messages, most frequent class first"""
+        for error_class in self.classes():
+            yield from self.samples.get(error_class, [])
+
+    def classes(self) -> List[str]:
+        return sorted(self.counts, key=lambda error_class: (-self.counts[error_class], error_class))
+
+
+def print_error_summary(errors: ErrorSummary, samples: int = 3):
+    """The 'Errors encountered' block: count per class and its first messages"""
+    if not errors:
+        return
+    print("\nErrors by class:")
+    for error_class in errors.classes():
+        print(f"  {error_class}: {errors.counts[error_class]}")
+        for message in errors.samples.get(error_class, [])[:samples]:
+            print(f"    - {message[:300]}")
@@ -0,0 +1,372 @@
+"""
+Fan-out driver for the campaign_reporting edge functions.
+
+fix-total-leads-contacted and update-rr-campaign-stats process every row they
+select in one invocation, with a stats call and a 300 ms pause per row, so as
+history grows a full run outlives the function time limit (Supabase answers
+546 WORKER_LIMIT, or the gateway gives up with a 504) and the work done so far
+goes unreported. Both functions take an optional body limiting them to part
+of the table:
+
+    {"client": "…", "start_date": "2025-10-01", "end_date": "2025-10-14", "campaign_ids": [12, 15]}
+
+This driver plans those chunks from one narrow read of campaign_reporting
+(client, campaign_id, date): consecutive dates (--by date) or campaigns
+(--by campaign) of one client are packed until a chunk holds --chunk-rows
+rows. It then invokes the function for up to --concurrency chunks at a time
+and adds up the processed/updated/skipped/errors each one returns.
+
+A chunk that hits the time limit (546, 504 or the --timeout here) is split in
+half and both halves are queued; a single campaign is split by its date range. One that fails with 429/5xx or a connection
+error is retried with backoff, up to --attempts calls. Chunks that still fail
+go to the dead-letter file (rillation.deadletter) for a later --redrive.
+
+Run:
+    python3 -m rillation fanout fix-total-leads-contacted --concurrency 4 --chunk-rows 200
+    python3 -m rillation fanout update-rr-campaign-stats --by campaign --since 2025-01-01
+    python3 -m rillation redrive fanout
+"""
+
+import argparse
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+from rillation.config import SUPABASE_HEADERS, SUPABASE_URL
+from rillation.deadletter import DeadLetterQueue, print_deadletter_summary, redrive_items
+from rillation.errors import ErrorSummary, print_error_summary
+from rillation.metrics import Metrics, ProgressReporter, instrumented_session, print_endpoint_summary
+from rillation.retry import DEFAULT_POLICY, RetryPolicy
+from rillation.rows import stream_rows
+
+# Function -> the one client it always processes (None: any, chosen per chunk)
+FUNCTIONS = {
+    'fix-total-leads-contacted': None,
+    'update-rr-campaign-stats': 'Rillation Revenue',
+}
+
+# A stats call plus the function's 300 ms pause per row: 200 rows finish well
+# inside the 150 s wall-clock limit
+CHUNK_ROWS = 200
+CONCURRENCY = 4
+ATTEMPTS = 3
+
+# Seconds to wait for one invocation; the platform limit is 150 s (400 s on paid plans)
+INVOKE_TIMEOUT = 420
+
+# Answers meaning the chunk did not finish in time
+TIME_LIMIT_STATUSES = frozenset({504, 546})
+
+FUNCTION_HEADERS = {key: value for key, value in SUPABASE_HEADERS.items() if key != 'Prefer'}
+
+
+def plan_chunks(http: requests.Session, function: str, metrics: Optional[Metrics] = None,
+                client: Optional[str] = None, by: str = 'date', chunk_rows: int = CHUNK_ROWS,
+                since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+    """
+    Chunks covering every campaign_reporting row the function would process,
+    each one client's consecutive dates or campaigns adding up to at most
+    `chunk_rows` rows (a single date or campaign over the budget is its own chunk)
+    """
+    client = FUNCTIONS[function] or client
+    query = 'select=client,campaign_id,date'
+    if client:
+        query += f'&client=eq.{quote(client)}'
+    if since:
+        query += f'&date=gte.{since}'
+    if until:
+        query += f'&date=lte.{until}'
+    query += '&order=client.asc,date.asc,id.asc'
+
+    # client -> date or campaign id -> [key, rows, first date, last date]
+    counts: Dict[str, Dict] = {}
+    for row in stream_rows(http, 'campaign_reporting', query, metrics=metrics, stage='plan_chunks'):
+        key = row['date'] if by == 'date' else int(row['campaign_id'])
+        units = counts.setdefault(row['client'], {})
+        unit = units.get(key)
+        if unit is None:
+            units[key] = [key, 1, row['date'], row['date']]
+        else:
+            unit[1] += 1
+            unit[3] = row['date']
+
+    chunks = []
+    for name, units in counts.items():
+        current: List[List] = []
+        current_rows = 0
+        for key in sorted(units):
+            unit = units[key] if by == 'campaign' else units[key][:2]
+            if current and current_rows + unit[1] > chunk_rows:
+                chunks.append(new_chunk(function, name, by, current, since, until))
+                current, current_rows = [], 0
+            current.append(unit)
+            current_rows += unit[1]
+        if current:
+            chunks.append(new_chunk(function, name, by, current, since, until))
+    return chunks
+
+
+def new_chunk(function: str, client: str, by: str, units: List[List], since: Optional[str] = None,
+              until: Optional[str] = None) -> Dict:
+    """
+    `units` are [date, rows] or [campaign id, rows, first date, last date]
+    lists in order; since/until bound the dates of a campaign chunk
+    """
+    return {'function': function, 'client': client, 'by': by, 'units': units,
+            'since': since, 'until': until, 'attempt': 0}
+
+
+def chunk_body(chunk: Dict) -> Dict:
+    """The request body the edge function filters its rows by"""
+    keys = [unit[0] for unit in chunk['units']]
+    body = {'client': chunk['client']}
+    if chunk['by'] == 'date':
+        body['start_date'], body['end_date'] = keys[0], keys[-1]
+    else:
+        body['campaign_ids'] = keys
+        if chunk.get('since'):
+            body['start_date'] = chunk['since']
+        if chunk.get('until'):
+            body['end_date'] = chunk['until']
+    return body
+
+
+def chunk_label(chunk: Dict) -> str:
+    keys = [unit[0] for unit in chunk['units']]
+    if chunk['by'] == 'date':
+        return f"{chunk['client']} {keys[0]}..{keys[-1]}"
+    if len(keys) == 1:
+        dates = f" {chunk.get('since') or ''}..{chunk.get('until') or ''}" if chunk.get('since') or chunk.get('until') else ''
+        return f"{chunk['client']} campaign {keys[0]}{dates}"
+    return f"{chunk['client']} campaigns {keys[0]}..{keys[-1]} ({len(keys)})"
+
+
+def chunk_size(chunk: Dict) -> int:
+    return sum(unit[1] for unit in chunk['units'])
+
+
+def split_chunk(chunk: Dict) -> Optional[Tuple[Dict, Dict]]:
+    """
+    Two halves of about equal rows. A single campaign is halved by date (its
+    rows are assumed even over the range); a single date can't be split.
+    """
+    units = chunk['units']
+    if len(units) == 1 and chunk['by'] == 'campaign':
+        campaign_id, rows, first, last = units[0]
+        start = date.fromisoformat(max(first, chunk.get('since') or first))
+        end = date.fromisoformat(min(last, chunk.get('until') or last))
+        if start >= end:
+            return None
+        middle = start + (end - start) // 2
+        return (dict(chunk, units=[[campaign_id, rows - rows // 2, start.isoformat(), middle.isoformat()]],
+                     since=start.isoformat(), until=middle.isoformat(), attempt=0),
+                dict(chunk, units=[[campaign_id, rows // 2, (middle + timedelta(days=1)).isoformat(), end.isoformat()]],
+                     since=(middle + timedelta(days=1)).isoformat(), until=end.isoformat(), attempt=0))
+    if len(units) < 2:
+        return None
+    half = chunk_size(chunk) / 2
+    running = 0
+    for index, unit in enumerate(units[:-1], start=1):
+        running += unit[1]
+        if running >= half:
+            break
+    return (dict(chunk, units=units[:index], attempt=0),
+            dict(chunk, units=units[index:], attempt=0))
+
+
+class FanOut:
+    """Invokes one edge function over many chunks with bounded concurrency; see the module docstring"""
+
+    def __init__(self, http: requests.Session, function: str, metrics: Metrics, deadletter: DeadLetterQueue,
+                 concurrency: int = CONCURRENCY, attempts: int = ATTEMPTS, timeout: float = INVOKE_TIMEOUT,
+                 policy: RetryPolicy = DEFAULT_POLICY):
+        self.http = http
+        self.function = function
+        self.url = f'{SUPABASE_URL}/functions/v1/{function}'
+        self.metrics = metrics
+        self.deadletter = deadletter
+        self.concurrency = max(1, concurrency)
+        self.attempts = max(1, attempts)
+        self.timeout = timeout
+        self.policy = policy
+        self.totals = {'processed': 0, 'updated': 0, 'skipped': 0}
+        self.outcomes = {'ok': 0, 'split': 0, 'retried': 0, 'failed': 0}
+        self.errors = ErrorSummary(metrics)
+        self.slowest: Tuple[float, str] = (0.0, '')
+
+    def invoke(self, chunk: Dict) -> Tuple[str, object, float]:
+        """
+        One call for one chunk: ('ok', response body) or ('time_limit' |
+        'retry' | 'failed', error message), plus the seconds it took
+        """
+        if chunk['attempt']:
+            time.sleep(self.policy.backoff(chunk['attempt']))
+        started = time.monotonic()
+        try:
+            response = self.http.post(self.url, headers=FUNCTION_HEADERS, json=chunk_body(chunk), timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            return 'time_limit', f'timed out after {self.timeout:g}s', time.monotonic() - started
+        except requests.exceptions.RequestException as e:
+            return 'retry', f'connection error: {e}', time.monotonic() - started
+        elapsed = time.monotonic() - started
+
+        status = response.status_code
+        if status in TIME_LIMIT_STATUSES:
+            return 'time_limit', f'HTTP {status} - {response.text[:200]}', elapsed
+        if response.ok:
+            try:
+                body = response.json()
+            except ValueError:
+                return 'retry', f'HTTP {status} - unreadable body: {response.text[:200]}', elapsed
+            # update-rr-campaign-stats reports a failed run as 200 with an `error`
+            if body.get('ok') is False or isinstance(body.get('error'), str):
+                return 'retry', f"HTTP {status} - {body.get('error')}", elapsed
+            return 'ok', body, elapsed
+        outcome = 'retry' if self.policy.retryable(status) else 'failed'
+        return outcome, f'HTTP {status} - {response.text[:200]}', elapsed
+
+    def run(self, chunks: List[Dict]):
+        pending = deque(chunks)
+        progress = ProgressReporter(f'{self.function} chunks', total=len(chunks))
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='fanout') as pool:
+            running = {}
+            while pending or running:
+                while pending and len(running) < self.concurrency:
+                    chunk = pending.popleft()
+                    running[pool.submit(self.invoke, chunk)] = chunk
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = running.pop(future)
+                    outcome, result, elapsed = future.result()
+                    follow_up = self.handle(chunk, outcome, result, elapsed)
+                    pending.extend(follow_up)
+                    if follow_up:
+                        progress.total += len(follow_up) - 1
+                    else:
+                        progress.update(1, **{outcome if outcome == 'ok' else 'failed': 1})
+        progress.close()
+
+    def handle(self, chunk: Dict, outcome: str, result, elapsed: float) -> List[Dict]:
+        """Record one call's result; returns the chunks to queue next (halves or a retry)"""
+        label = chunk_label(chunk)
+        if outcome == 'ok':
+            for key in self.totals:
+                self.totals[key] += int(result.get(key) or 0)
+            reported = result.get('errors') or []
+            for error in reported:
+                self.errors.append(error)
+            unreported = int(result.get('error_count') or len(reported)) - len(reported)
+            if unreported > 0:
+                self.errors.append(f'{label}: {unreported} more errors not returned by the function',
+                                   'unreported', count=unreported)
+            self.slowest = max(self.slowest, (elapsed, label))
+            return self._count('ok', [])
+
+        if outcome == 'time_limit':
+            halves = split_chunk(chunk)
+            if halves:
+                print(f"  ✂️  {label}: {result}; splitting into {chunk_label(halves[0])} and {chunk_label(halves[1])}")
+                return self._count('split', list(halves))
+        if outcome != 'failed' and chunk['attempt'] + 1 < self.attempts:
+            return self._count('retried', [dict(chunk, attempt=chunk['attempt'] + 1)])
+
+        print(f"  ❌ {label}: {result}")
+        self.errors.append(f'{label}: {result}')
+        item = {key: chunk[key] for key in ('function', 'client', 'by', 'units', 'since', 'until')}
+        self.deadletter.add(f'{self.function}:{label}', item, result)
+        return self._count('failed', [])
+
+    def _count(self, outcome: str, follow_up: List[Dict]) -> List[Dict]:
+        self.outcomes[outcome] += 1
+        self.metrics.inc('rillation_fanout_chunks_total', function=self.function, outcome=outcome)
+        return follow_up
+
+
+def redrive_chunks(deadletter: DeadLetterQueue) -> Dict[str, List[Dict]]:
+    """function -> the dead-lettered chunks to invoke again"""
+    chunks: Dict[str, List[Dict]] = {}
+    for item in redrive_items(deadletter, writer=None):
+        chunks.setdefault(item['function'], []).append(dict(item, attempt=0))
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a campaign_reporting edge function in concurrent chunks')
+    parser.add_argument('function', nargs='?', choices=sorted(FUNCTIONS), help='Edge function to fan out')
+    parser.add_argument('--by', choices=('date', 'campaign'), default='date',
+                        help='Chunk each client by consecutive dates or by campaigns (default: date)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                        help=f'Rows per chunk (default: {CHUNK_ROWS})')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY,
+                        help=f'Invocations in flight at once (default: {CONCURRENCY})')
+    parser.add_argument('--attempts', type=int, default=ATTEMPTS,
+                        help=f'Calls per chunk before it is dead-lettered (default: {ATTEMPTS})')
+    parser.add_argument('--timeout', type=float, default=INVOKE_TIMEOUT,
+                        help=f'Seconds to wait for one invocation before splitting the chunk (default: {INVOKE_TIMEOUT})')
+    parser.add_argument('--client', help='Only this client (fix-total-leads-contacted)')
+    parser.add_argument('--since', help='First date (YYYY-MM-DD)')
+    parser.add_argument('--until', help='Last date (YYYY-MM-DD)')
+    parser.add_argument('--redrive', action='store_true', help='Invoke only the dead-lettered chunks')
+    args = parser.parse_args()
+    if not args.function and not args.redrive:
+        parser.error('a function is required unless --redrive is given')
+
+    metrics = Metrics('edge-fanout')
+    http = instrumented_session(metrics)
+    deadletter = DeadLetterQueue('edge-fanout')
+
+    print("=" * 60)
+    print("🚀 Edge function fan-out")
+    print("=" * 60)
+
+    if args.redrive:
+        planned = redrive_chunks(deadletter)
+        if args.function:
+            planned = {args.function: planned.get(args.function, [])}
+    else:
+        chunks = plan_chunks(http, args.function, metrics, client=args.client, by=args.by,
+                             chunk_rows=args.chunk_rows, since=args.since, until=args.until)
+        planned = {args.function: chunks}
+
+    started = time.monotonic()
+    runs = []
+    for function, chunks in planned.items():
+        rows = sum(chunk_size(chunk) for chunk in chunks)
+        print(f"\n📦 {function}: {len(chunks)} chunks, {rows} rows, {args.concurrency} at a time")
+        fanout = FanOut(http, function, metrics, deadletter, concurrency=args.concurrency,
+                        attempts=args.attempts, timeout=args.timeout)
+        with metrics.stage('invoke') as timer:
+            fanout.run(chunks)
+            timer.add_rows(rows)
+        runs.append(fanout)
+    if args.redrive:
+        deadletter.finish()
+    else:
+        deadletter.close()
+
+    print("\n" + "=" * 60)
+    print("📊 Summary")
+    print("=" * 60)
+    for fanout in runs:
+        print(f"{fanout.function}:")
+        print(f"  Rows processed: {fanout.totals['processed']}, updated: {fanout.totals['updated']}, "
+              f"skipped: {fanout.totals['skipped']}")
+        print(f"  Chunks ok: {fanout.outcomes['ok']}, split: {fanout.outcomes['split']}, "
+              f"retried: {fanout.outcomes['retried']}, failed: {fanout.outcomes['failed']}")
+        if fanout.slowest[1]:
+            print(f"  Slowest chunk: {fanout.slowest[1]} ({fanout.slowest[0]:.1f}s)")
+        print(f"  Errors: {len(fanout.errors)}")
+        print_error_summary(fanout.errors)
+    print(f"Elapsed: {time.monotonic() - started:.1f}s")
+    print_deadletter_summary(deadletter)
+    print_endpoint_summary(metrics)
+    metrics.export()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Schema inventory from the PostgREST OpenAPI document.
+
+One GET on the REST root (/rest/v1/) returns the OpenAPI description of every
+exposed table and view, with each column's Postgres type, so no per-table
+probing is needed to discover tables or columns - empty tables included.
+
+Row counts are then fetched in parallel with HEAD requests using
+Prefer: count=planned (planner estimate, cheap) or count=exact. The inventory
+file is rewritten after every probe completes, and a table is only re-probed
+when its definition hash changed since the previous inventory (or --force).
+
+The output keeps the keys of the older sample-row inventory (existing_tables,
+missing_tables, total_checked) so existing readers keep working.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+from rillation.config import SUPABASE_KEY, SUPABASE_URL
+
+INVENTORY_FILE = 'supabase-tables-inventory.json'
+
+COUNT_METHODS = ('planned', 'exact', 'estimated')
+
+
+def _headers(extra: Optional[Dict] = None) -> Dict:
+    return {
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {SUPABASE_KEY}',
+        **(extra or {})
+    }
+
+
+def fetch_openapi(http: requests.Session) -> Dict:
+    """Fetch the OpenAPI (Swagger 2.0) document PostgREST serves at the REST root"""
+    response = http.get(f'{SUPABASE_URL}/rest/v1/',
+                        headers=_headers({'Accept': 'application/openapi+json'}), timeout=30)
+    if not response.ok:
+        raise Exception(f'Failed to fetch OpenAPI document: HTTP {response.status_code} - {response.text[:200]}')
+    return response.json()
+
+
+def table_definitions(openapi: Dict) -> Dict[str, Dict]:
+    """
+    Reduce the OpenAPI document to {table: {columns, column_types, primary_key, definition_hash}}.
+    PostgREST puts the Postgres type in each property's 'format' and marks
+    primary keys with '<pk/>' in the description.
+    """
+    tables = {}
+    for name, definition in sorted((openapi.get('definitions') or {}).items()):
+        properties = definition.get('properties') or {}
+        column_types = {
+            column: spec.get('format') or spec.get('type') or 'unknown'
+            for column, spec in properties.items()
+        }
+        primary_key = [
+            column for column, spec in properties.items()
+            if '<pk/>' in (spec.get('description') or '')
+        ]
+        fingerprint = json.dumps(
+            {'properties': properties, 'required': sorted(definition.get('required') or [])},
+            sort_keys=True, default=str
+        )
+        tables[name] = {
+            'columns': list(properties),
+            'column_types': column_types,
+            'required': definition.get('required') or [],
+            'primary_key': primary_key,
+            'definition_hash': hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+        }
+    return tables
+
+
+def count_rows(http: requests.Session, table: str, method: str = 'planned') -> Optional[int]:
+    """Row count from the Content-Range header of a HEAD request; None if unavailable"""
+    response = http.head(
+        f'{SUPABASE_URL}/rest/v1/{table}?select=*&limit=1',
+        headers=_headers({'Prefer': f'count={method}'}),
+        timeout=30
+    )
+    if not response.ok:
+        return None
+    content_range = response.headers.get('Content-Range') or ''
+    total = content_range.rsplit('/', 1)[-1]
+    return int(total) if total.isdigit() else None
+
+
+def load_inventory(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: str, data: Dict):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+class InventoryWriter:
+    """Holds the inventory being built and rewrites the file after every change"""
+
+    def __init__(self, path: str, tables: Dict[str, Dict], previous: Dict, candidates: Iterable[str]):
+        self.path = path
+        self.lock = threading.Lock()
+        self.previous = {entry['table']: entry for entry in previous.get('existing_tables', [])}
+        self.candidates = list(candidates)
+        self.entries: Dict[str, Dict] = {}
+        for name, definition in tables.items():
+            entry = {'table': name, 'exists': True, **definition, 'column_count': len(definition['columns'])}
+            old = self.previous.get(name, {})
+            for key in ('row_count', 'row_count_method', 'probed_at', 'sample_row'):
+                if key in old:
+                    entry[key] = old[key]
+            self.entries[name] = entry
+
+    def needs_probe(self, table: str, force: bool) -> bool:
+        old = self.previous.get(table)
+        return force or not old or old.get('definition_hash') != self.entries[table]['definition_hash'] \
+            or old.get('row_count') is None
+
+    def record_count(self, table: str, count: Optional[int], method: str):
+        with self.lock:
+            entry = self.entries[table]
+            entry['row_count'] = count
+            entry['row_count_method'] = method
+            entry['probed_at'] = datetime.now(timezone.utc).isoformat()
+            self.write()
+
+    def write(self):
+        tables = list(self.entries.values())
+        missing = [name for name in self.candidates if name not in self.entries]
+        _write_atomic(self.path, {
+            'source': 'openapi',
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'existing_tables': tables,
+            'missing_tables': missing,
+            'total_checked': len(tables) + len(missing)
+        })
+
+
+def build_inventory(http: requests.Session, path: str = INVENTORY_FILE, count_method: str = 'planned',
+                    workers: int = 8, force: bool = False, candidates: Iterable[str] = ()) -> Dict:
+    """
+    Build the inventory: one OpenAPI fetch, then parallel row counts for new or
+    changed tables. Returns {'tables', 'probed', 'reused'} for reporting.
+    """
+    tables = table_definitions(fetch_openapi(http))
+    writer = InventoryWriter(path, tables, load_inventory(path), candidates)
+    writer.write()
+
+    to_probe = [table for table in tables if writer.needs_probe(table, force)]
+    failed: List[str] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(count_rows, http, table, count_method): table for table in to_probe}
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                count = future.result()
+            except requests.exceptions.RequestException:
+                count = None
+            if count is None:
+                failed.append(table)
+            writer.record_count(table, count, count_method)
+
+    return {
+        'tables': writer.entries,
+        'probed': to_probe,
+        'reused': [table for table in tables if table not in to_probe],
+        'failed': failed,
+        'missing': [name for name in writer.candidates if name not in tables]
+    }
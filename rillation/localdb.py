@@ -0,0 +1,479 @@
+"""
+Local analytical copy of the reporting tables, queried with DuckDB.
+
+Ad-hoc questions (reply rate by client and week, interested replies per
+campaign) used to mean a one-off script paging rows over REST on every run.
+LocalStore keeps campaign_reporting, replies and meetings_booked as Parquet
+files under localdb/ and answers SQL over them in-process, in milliseconds
+and without touching Supabase:
+
+  localdb/<table>/part-000001.parquet ...   one file per sync that found rows
+  localdb/state.json                         per-table watermark, rows, parts
+
+Syncs are incremental where the table allows it. campaign_reporting and
+replies are read with updated_at >= the saved watermark (minus
+WATERMARK_OVERLAP, as rillation.rollups does) into a new part; the views
+keep the newest version of each key, so a row the stats sync rewrote shows
+up once. After COMPACT_PARTS parts a table is rewritten into a single file.
+meetings_booked has no updated_at (nor a key) and is re-read whole each sync.
+Rows deleted upstream stay until a --full sync.
+
+Parquet columns have fixed types (TABLES) so parts written on different days
+line up; timestamps are stored as UTC TIMESTAMPs. replies.quoted_body_z is not copied; text_body is the new reply text
+only (rillation.quoting).
+
+Python:
+    store = LocalStore()
+    store.sync()
+    columns, rows = store.query("SELECT client, count(*) FROM replies GROUP BY 1")
+
+DuckDB is optional and only needed here: pip install duckdb. Files live in
+$RILLATION_LOCALDB_DIR (default ./localdb).
+
+Run:
+    python3 -m rillation.localdb sync [--full] [--table replies]
+    python3 -m rillation.localdb query "SELECT ..."      (or --saved reply-rate-weekly)
+    python3 -m rillation.localdb saved                   (lists the saved queries)
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import requests
+
+from rillation import codec
+from rillation.errors import ErrorSummary, print_error_summary
+from rillation.metrics import Metrics, instrumented_session, print_endpoint_summary
+from rillation.rollups import parse_timestamp
+from rillation.rows import stream_rows
+
+try:
+    import duckdb
+except ImportError:  # optional dependency, only needed for the local store
+    duckdb = None
+
+LOCALDB_DIR = os.environ.get('RILLATION_LOCALDB_DIR', 'localdb')
+
+# table -> key (None: no key), incremental cursor column (None: full reload), {column: DuckDB type}
+TABLES: Dict[str, Dict[str, Any]] = {
+    'campaign_reporting': {
+        'key': 'id',
+        'cursor': 'updated_at',
+        'columns': {
+            'id': 'VARCHAR', 'campaign_id': 'BIGINT', 'campaign_name': 'VARCHAR', 'client': 'VARCHAR',
+            'date': 'DATE', 'emails_sent': 'DOUBLE', 'total_leads_contacted': 'DOUBLE',
+            'opened': 'DOUBLE', 'opened_percentage': 'DOUBLE',
+            'unique_opens_per_contact': 'DOUBLE', 'unique_opens_per_contact_percentage': 'DOUBLE',
+            'unique_replies_per_contact': 'DOUBLE', 'unique_replies_per_contact_percentage': 'DOUBLE',
+            'bounced': 'DOUBLE', 'bounced_percentage': 'DOUBLE',
+            'unsubscribed': 'DOUBLE', 'unsubscribed_percentage': 'DOUBLE',
+            'interested': 'DOUBLE', 'interested_percentage': 'DOUBLE',
+            'created_at': 'TIMESTAMP', 'updated_at': 'TIMESTAMP',
+        },
+    },
+    'replies': {
+        'key': 'reply_id',
+        'cursor': 'updated_at',
+        'columns': {
+            'reply_id': 'BIGINT', 'type': 'VARCHAR', 'lead_id': 'BIGINT', 'subject': 'VARCHAR',
+            'category': 'VARCHAR', 'text_body': 'VARCHAR', 'campaign_id': 'BIGINT', 'date_received': 'DATE',
+            'from_email': 'VARCHAR', 'primary_to_email': 'VARCHAR', 'client': 'VARCHAR',
+            'created_at': 'TIMESTAMP', 'updated_at': 'TIMESTAMP',
+        },
+    },
+    'meetings_booked': {
+        'key': None,
+        'cursor': None,
+        'order': 'created_time.asc,email.asc',
+        'columns': {
+            'first_name': 'VARCHAR', 'last_name': 'VARCHAR', 'full_name': 'VARCHAR', 'title': 'VARCHAR',
+            'company': 'VARCHAR', 'company_linkedin': 'VARCHAR', 'company_domain': 'VARCHAR',
+            'campaign_name': 'VARCHAR', 'profile_url': 'VARCHAR', 'client': 'VARCHAR',
+            'created_time': 'TIMESTAMP', 'campaign_id': 'BIGINT', 'email': 'VARCHAR',
+        },
+    },
+}
+
+# Rescan this far behind the watermark for rows committed after a later one
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+# Rewrite a table into one file once it has this many parts
+COMPACT_PARTS = 8
+
+PAGE_SIZE = 1000
+
+# Named queries for the usual questions: name -> (description, SQL)
+SAVED_QUERIES: Dict[str, Tuple[str, str]] = {
+    'reply-rate-weekly': (
+        'Replies, real replies (not Out Of Office) and reply rate per client and week',
+        """
+        WITH sent AS (
+            SELECT client, date_trunc('week', date) AS week, sum(total_leads_contacted) AS contacted
+            FROM campaign_reporting GROUP BY ALL
+        ), received AS (
+            SELECT client, date_trunc('week', date_received) AS week, count(*) AS replies,
+                   count(*) FILTER (WHERE category IS DISTINCT FROM 'Out Of Office') AS real_replies
+            FROM replies GROUP BY ALL
+        )
+        SELECT client, CAST(week AS DATE) AS week, coalesce(contacted, 0) AS contacted,
+               coalesce(replies, 0) AS replies, coalesce(real_replies, 0) AS real_replies,
+               round(100.0 * real_replies / nullif(contacted, 0), 2) AS reply_rate_pct
+        FROM sent FULL JOIN received USING (client, week)
+        ORDER BY client, week
+        """,
+    ),
+    'interested-by-campaign': (
+        'Interested replies, all replies and meetings booked per campaign',
+        """
+        WITH r AS (
+            SELECT client, campaign_id, count(*) AS replies,
+                   count(*) FILTER (WHERE category = 'Interested') AS interested
+            FROM replies WHERE campaign_id IS NOT NULL GROUP BY ALL
+        ), m AS (
+            SELECT client, campaign_id, count(*) AS meetings
+            FROM meetings_booked WHERE campaign_id IS NOT NULL GROUP BY ALL
+        ), names AS (
+            SELECT campaign_id, any_value(campaign_name) AS campaign_name FROM campaign_reporting GROUP BY ALL
+        )
+        SELECT client, campaign_id, campaign_name, coalesce(replies, 0) AS replies,
+               coalesce(interested, 0) AS interested, coalesce(meetings, 0) AS meetings
+        FROM r FULL JOIN m USING (client, campaign_id) LEFT JOIN names USING (campaign_id)
+        ORDER BY interested DESC, replies DESC
+        """,
+    ),
+    'categories-monthly': (
+        'Replies per client, month and category',
+        """
+        SELECT client, CAST(date_trunc('month', date_received) AS DATE) AS month, category, count(*) AS replies
+        FROM replies GROUP BY ALL ORDER BY client, month, replies DESC
+        """,
+    ),
+    'meetings-weekly': (
+        'Meetings booked per client and week',
+        """
+        SELECT client, CAST(date_trunc('week', created_time) AS DATE) AS week, count(*) AS meetings
+        FROM meetings_booked GROUP BY ALL ORDER BY client, week
+        """,
+    ),
+}
+
+
+def _require_duckdb():
+    if duckdb is None:
+        raise RuntimeError('The local analytics store needs DuckDB: pip install duckdb')
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class LocalStore:
+    """Parquet copies of the reporting tables plus DuckDB views over them; see the module docstring"""
+
+    def __init__(self, directory: Optional[str] = None, http: Optional[requests.Session] = None,
+                 metrics: Optional[Metrics] = None):
+        self.directory = directory or LOCALDB_DIR
+        self.metrics = metrics
+        self.http = http
+        self.errors = ErrorSummary(metrics)
+        self.state_file = os.path.join(self.directory, 'state.json')
+        self.state: Dict[str, Dict] = self._load_state()
+        self._connection = None
+
+    # ---- state ----------------------------------------------------------
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f).get('tables', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self.state_file}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'saved_at': datetime.now(timezone.utc).isoformat(), 'tables': self.state},
+                      f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_file)
+
+    def parts(self, table: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, table, 'part-*.parquet')))
+
+    # ---- sync -----------------------------------------------------------
+
+    def sync(self, tables: Optional[Iterable[str]] = None, full: bool = False) -> Dict[str, int]:
+        """Copy new and changed rows of each table into a new part; returns rows fetched per table"""
+        _require_duckdb()
+        if self.http is None:
+            self.http = instrumented_session(self.metrics or Metrics('localdb'))
+        fetched = {}
+        for table in tables or TABLES:
+            try:
+                fetched[table] = self._sync_table(table, full)
+            except Exception as e:
+                self.errors.append(f'{table}: {e}')
+                print(f"  ❌ {table}: {e}")
+        self.close()
+        return fetched
+
+    def _sync_table(self, table: str, full: bool) -> int:
+        spec = TABLES[table]
+        state = self.state.get(table) or {}
+        cursor = spec['cursor']
+        incremental = cursor is not None and not full and state.get('watermark') and self.parts(table)
+
+        query = f"select={','.join(spec['columns'])}"
+        if incremental:
+            since = parse_timestamp(state['watermark']) - WATERMARK_OVERLAP
+            query += f'&{cursor}=gte.{quote(since.isoformat())}'
+        order = spec.get('order') or f"{cursor}.asc,{spec['key']}.asc"
+        query += f'&order={order}'
+
+        started = time.perf_counter()
+        os.makedirs(os.path.join(self.directory, table), exist_ok=True)
+        # Rows re-read by the overlap that are already stored unchanged don't need a new part
+        known = self._versions_since(table, since) if incremental else set()
+        count, watermark = 0, state.get('watermark') if incremental else None
+        with tempfile.NamedTemporaryFile('wb', suffix='.jsonl', dir=self.directory, delete=False) as tmp:
+            for row in stream_rows(self.http, table, query, PAGE_SIZE, self.metrics, stage=f'localdb_{table}'):
+                changed_at = parse_timestamp(row[cursor]) if cursor and row.get(cursor) else None
+                if changed_at and (row.get(spec['key']), _utc(changed_at)) in known:
+                    continue
+                tmp.write(codec.dumps(row) + b'\n')
+                count += 1
+                if changed_at and (watermark is None or changed_at > parse_timestamp(watermark)):
+                    watermark = row[cursor]
+        try:
+            old_parts = self.parts(table)
+            if count:
+                self._write_part(table, tmp.name, self._next_part(table, old_parts))
+            if not incremental:
+                # A full read replaces everything before it (also when the table came back empty)
+                for path in old_parts:
+                    os.remove(path)
+        finally:
+            os.remove(tmp.name)
+        if incremental and len(self.parts(table)) >= COMPACT_PARTS:
+            self.compact(table)
+
+        self.state[table] = {
+            'watermark': watermark,
+            'synced_at': datetime.now(timezone.utc).isoformat(),
+            'rows': self._count(table),
+            'parts': len(self.parts(table)),
+            'mode': 'incremental' if incremental else 'full',
+        }
+        self._save_state()
+        if self.metrics is not None:
+            self.metrics.inc('rillation_localdb_rows_synced_total', count, table=table)
+        print(f"  📦 {table}: {count} rows fetched ({self.state[table]['mode']}), "
+              f"{self.state[table]['rows']} stored in {self.state[table]['parts']} part(s), "
+              f"{time.perf_counter() - started:.1f}s")
+        return count
+
+    def _versions_since(self, table: str, since: datetime) -> set:
+        """(key, cursor value) of the stored rows changed at or after `since`"""
+        key, cursor = TABLES[table]['key'], TABLES[table]['cursor']
+        connection = duckdb.connect()
+        try:
+            rows = connection.execute(f'SELECT {_quote(key)}, {_quote(cursor)} FROM ({self._current_rows_sql(table)}) '
+                                      f'WHERE {_quote(cursor)} >= ?', [_utc(since)]).fetchall()
+        finally:
+            connection.close()
+        return set(rows)
+
+    @staticmethod
+    def _next_part(table: str, parts: List[str]) -> int:
+        numbers = [int(os.path.basename(path)[5:11]) for path in parts]
+        return max(numbers, default=0) + 1
+
+    def _write_part(self, table: str, source: str, number: int):
+        """JSON-lines rows -> typed, zstd-compressed Parquet (written to a temp name, then renamed)"""
+        columns = TABLES[table]['columns']
+        struct = '{' + ', '.join(f'{_sql_string(name)}: {_sql_string(kind)}' for name, kind in columns.items()) + '}'
+        path = os.path.join(self.directory, table, f'part-{number:06d}.parquet')
+        tmp_path = f'{path}.tmp'
+        connection = duckdb.connect()
+        try:
+            connection.execute(
+                f"COPY (SELECT {', '.join(_quote(name) for name in columns)} "
+                f"FROM read_json({_sql_string(source)}, format='newline_delimited', columns={struct})) "
+                f"TO {_sql_string(tmp_path)} (FORMAT parquet, COMPRESSION zstd)")
+        finally:
+            connection.close()
+        os.replace(tmp_path, path)
+
+    def compact(self, table: str):
+        """Rewrite a table's parts into one file holding only the current version of each row"""
+        _require_duckdb()
+        parts = self.parts(table)
+        if len(parts) < 2:
+            return
+        path = os.path.join(self.directory, table, f'part-{self._next_part(table, parts):06d}.parquet')
+        tmp_path = f'{path}.tmp'
+        connection = duckdb.connect()
+        try:
+            connection.execute(f"COPY ({self._current_rows_sql(table, parts)}) TO {_sql_string(tmp_path)} "
+                               f"(FORMAT parquet, COMPRESSION zstd)")
+        finally:
+            connection.close()
+        os.replace(tmp_path, path)
+        for old in parts:
+            os.remove(old)
+
+    # ---- queries ----------------------------------------------------------
+
+    def _current_rows_sql(self, table: str, parts: Optional[List[str]] = None) -> str:
+        """SELECT of a table's rows, the newest part's version winning for each key"""
+        parts = self.parts(table) if parts is None else parts
+        columns = TABLES[table]['columns']
+        files = '[' + ', '.join(_sql_string(path) for path in parts) + ']'
+        select_list = ', '.join(_quote(name) for name in columns)
+        key = TABLES[table]['key']
+        if key is None or len(parts) == 1:
+            return f"SELECT {select_list} FROM read_parquet({files})"
+        return (f"SELECT {select_list} FROM read_parquet({files}, filename = true) "
+                f"QUALIFY row_number() OVER (PARTITION BY {_quote(key)} ORDER BY filename DESC) = 1")
+
+    def connect(self):
+        """DuckDB connection with one view per synced table (empty tables get an empty view)"""
+        _require_duckdb()
+        if self._connection is None:
+            connection = duckdb.connect()
+            for table, spec in TABLES.items():
+                if self.parts(table):
+                    body = self._current_rows_sql(table)
+                else:
+                    body = 'SELECT ' + ', '.join(f'CAST(NULL AS {kind}) AS {_quote(name)}'
+                                                 for name, kind in spec['columns'].items()) + ' WHERE false'
+                connection.execute(f'CREATE VIEW {_quote(table)} AS {body}')
+            self._connection = connection
+        return self._connection
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> Tuple[List[str], List[tuple]]:
+        """(column names, rows) of a SQL query over the local tables"""
+        cursor = self.connect().execute(sql, params or [])
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+    def _count(self, table: str) -> int:
+        if not self.parts(table):
+            return 0
+        connection = duckdb.connect()
+        try:
+            return connection.execute(f'SELECT count(*) FROM ({self._current_rows_sql(table)})').fetchone()[0]
+        finally:
+            connection.close()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def reset(self):
+        """Remove every local file"""
+        self.close()
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        self.state = {}
+
+
+def _utc(value: datetime) -> datetime:
+    """Aware datetime -> naive UTC, as the TIMESTAMP columns hold it"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def print_table(columns: List[str], rows: List[tuple], limit: int = 50):
+    """Rows as aligned text columns (the first `limit` rows)"""
+    shown = [['' if value is None else str(value) for value in row] for row in rows[:limit]]
+    widths = [max([len(column)] + [len(row[index]) for row in shown]) for index, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in shown:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)))
+    if len(rows) > limit:
+        print(f"... {len(rows) - limit} more rows (--limit to show them)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync the reporting tables to local Parquet and query them with DuckDB')
+    parser.add_argument('--dir', default=LOCALDB_DIR, help='Local store folder')
+    commands = parser.add_subparsers(dest='command', required=True)
+    sync = commands.add_parser('sync', help='Copy new and changed rows from Supabase')
+    sync.add_argument('--table', action='append', choices=list(TABLES), help='Only this table (repeatable)')
+    sync.add_argument('--full', action='store_true', help='Re-read whole tables instead of rows changed since the last sync')
+    sync.add_argument('--reset', action='store_true', help='Delete the local files first')
+    query = commands.add_parser('query', help='Run SQL over the local tables')
+    query.add_argument('sql', nargs='?', help='SQL over campaign_reporting, replies and meetings_booked')
+    query.add_argument('--saved', choices=list(SAVED_QUERIES), help='Run a saved query instead')
+    query.add_argument('--limit', type=int, default=50, help='Rows to print')
+    query.add_argument('--json', action='store_true', help='Print rows as JSON lines')
+    commands.add_parser('saved', help='List the saved queries')
+    args = parser.parse_args()
+
+    if args.command == 'saved':
+        for name, (description, _) in SAVED_QUERIES.items():
+            print(f"{name:<26} {description}")
+        return
+
+    if args.command == 'query':
+        if not args.sql and not args.saved:
+            parser.error('query needs SQL or --saved NAME')
+        store = LocalStore(args.dir)
+        if not any(store.parts(table) for table in TABLES):
+            print(f"⚠️  No local data in {args.dir}; run: python3 -m rillation localdb sync")
+        started = time.perf_counter()
+        columns, rows = store.query(SAVED_QUERIES[args.saved][1] if args.saved else args.sql)
+        elapsed = time.perf_counter() - started
+        if args.json:
+            for row in rows[:args.limit]:
+                print(codec.dumps(dict(zip(columns, row))).decode('utf-8'))
+        else:
+            print_table(columns, rows, args.limit)
+        synced = min((state.get('synced_at', '') for state in store.state.values()), default='never')
+        print(f"\n{len(rows)} rows in {elapsed * 1000:.1f} ms (local data synced {synced})")
+        store.close()
+        return
+
+    metrics = Metrics('localdb-sync')
+    store = LocalStore(args.dir, instrumented_session(metrics), metrics)
+    if args.reset:
+        store.reset()
+        print(f"🧹 Removed {args.dir}")
+    print("=" * 60)
+    print("Local Analytics Store Sync")
+    print("=" * 60)
+    print(f"Folder: {os.path.abspath(args.dir)}")
+    fetched = store.sync(args.table, full=args.full)
+
+    print("\n" + "=" * 60)
+    print("SYNC SUMMARY")
+    print("=" * 60)
+    for table, count in fetched.items():
+        state = store.state.get(table, {})
+        print(f"{table}: {count} fetched, {state.get('rows', 0)} stored, watermark {state.get('watermark') or '-'}")
+    size = sum(os.path.getsize(path) for table in TABLES for path in store.parts(table))
+    print(f"Parquet size: {size:,} B")
+    print(f"Errors: {len(store.errors)}")
+    print_error_summary(store.errors)
+    print_endpoint_summary(metrics)
+    prom_path, jsonl_path = metrics.export()
+    print(f"\n📈 Metrics written to {prom_path} and {jsonl_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,511 @@
+"""
+Metrics and latency instrumentation for the sync jobs.
+
+Every HTTP call made through an InstrumentedSession is counted and timed per
+endpoint (method + host + normalized path), together with bytes sent and
+received and throttled (429) responses. Received bytes are counted twice: as
+transferred on the wire (before gzip/deflate/br decoding; the session always
+advertises every encoding urllib3 can decode) and after decoding. Jobs can
+also time their own stages and count the rows each stage handled.
+
+JSON bodies go through rillation.codec: json= arguments are encoded with its
+dumps() and response.json() decodes with its loads(), so the sessions use
+orjson when it is installed.
+
+PostgREST reads should name their columns. A GET on a table without select=
+(or with select=*) is counted in rillation_http_unprojected_reads_total and
+flagged in the endpoint summary; with RILLATION_REQUIRE_SELECT=1 the session
+refuses to send it.
+
+At the end of a run the registry is exported as:
+  - a Prometheus text-file (<job>.prom, overwritten each run) for node_exporter's
+    textfile collector
+  - a JSON-lines snapshot (<job>.jsonl, one line appended per run)
+
+Both go to $RILLATION_METRICS_DIR (default: ./metrics).
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from rillation import codec
+
+METRICS_DIR = os.environ.get('RILLATION_METRICS_DIR', 'metrics')
+
+# Raise instead of counting when a PostgREST read has no explicit column list
+REQUIRE_SELECT = os.environ.get('RILLATION_REQUIRE_SELECT', '') not in ('', '0')
+
+# Latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    'rillation_http_requests_total': 'HTTP requests by endpoint and status code',
+    'rillation_http_request_errors_total': 'HTTP requests that raised before a response was received',
+    'rillation_http_request_bytes_total': 'Request body bytes sent',
+    'rillation_http_response_bytes_total': 'Response body bytes received, after decompression',
+    'rillation_http_response_wire_bytes_total': 'Response body bytes received on the wire, before decompression',
+    'rillation_http_unprojected_reads_total': 'PostgREST reads without an explicit select= column list',
+    'rillation_http_throttled_total': 'Responses with HTTP 429',
+    'rillation_http_retries_total': 'Requests retried after a failure',
+    'rillation_http_request_duration_seconds': 'HTTP request latency',
+    'rillation_stage_seconds_total': 'Wall time spent in each job stage',
+    'rillation_stage_cpu_seconds_total': 'Process CPU time spent in each job stage',
+    'rillation_stage_rows_total': 'Rows handled by each job stage',
+    'rillation_stage_rows_per_second': 'Throughput of each job stage',
+    'rillation_webhook_events_total': 'Webhook events received, by outcome',
+    'rillation_write_rows_total': 'Rows sent by the buffered writer, by table and result',
+    'rillation_write_flushes_total': 'Buffered writer flushes, by table and trigger (rows, bytes, time, flush)',
+    'rillation_write_buffer_wait_seconds': 'Time rows spent in the write buffer before being written',
+    'rillation_write_backpressure_seconds_total': 'Time producers were blocked waiting for the writer',
+    'rillation_write_batch_resizes_total': 'Adaptive write batch limit changes, by table and direction (grow, shrink)',
+    'rillation_copy_rows_total': 'Rows loaded by the direct COPY writer, by table and result (written, skipped, failed)',
+    'rillation_rollup_buckets_total': 'client_rollups buckets recomputed, by grain (day, week, month)',
+    'rillation_snapshot_bytes_written_total': 'Dashboard snapshot bytes written (unchanged files are skipped)',
+    'rillation_reply_body_bytes_total': 'Reply body bytes received from Bison, kept in text_body and stored compressed in quoted_body_z',
+    'rillation_localdb_rows_synced_total': 'Rows copied into the local Parquet store, by table',
+    'rillation_errors_total': 'Errors recorded by a run, by class (HTTP status, circuit_open, timeout, ...)',
+    'rillation_fanout_chunks_total': 'Edge function chunk calls, by function and outcome (ok, split, retried, failed)',
+    'rillation_activity_skipped_total': 'Stats calls skipped for (campaign, date) pairs outside the campaign activity window, by reason',
+    'rillation_breaker_trips_total': 'Circuit breaker trips, by breaker (client) and the status that tripped it',
+    'rillation_breaker_rejected_total': 'Calls skipped because the client circuit breaker was open',
+    'rillation_daemon_polls_total': 'Sync daemon polls, by kind and result (new, idle, error, breaker_open)',
+    'rillation_daemon_budget_wait_seconds_total': 'Time sync daemon polls waited for the Bison request budget',
+    'rillation_daemon_new_rows_total': 'New replies and changed stats rows found by the sync daemon',
+    'rillation_daemon_reply_lag_seconds_total': 'Sum of (found at - date_received) over replies the sync daemon found',
+}
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$')
+
+
+def normalize_endpoint(method: str, url: str) -> str:
+    """
+    Collapse a URL into an endpoint label: query strings are dropped and numeric
+    or UUID path segments become {id}, e.g.
+    POST https://send.rillationrevenue.com/api/campaigns/42/stats
+      -> POST send.rillationrevenue.com/api/campaigns/{id}/stats
+    """
+    parts = urlsplit(url)
+    segments = ['{id}' if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split('/')]
+    return f"{method.upper()} {parts.netloc}{'/'.join(segments)}"
+
+
+def unprojected_read(method: str, url: str) -> bool:
+    """True for a GET on a PostgREST table that doesn't name its columns"""
+    if method.upper() != 'GET':
+        return False
+    parts = urlsplit(url)
+    table = parts.path.split('/rest/v1/', 1)[1] if '/rest/v1/' in parts.path else ''
+    if not table or table.startswith('rpc/'):
+        return False
+    select = parse_qs(parts.query).get('select')
+    return not select or any('*' in value for value in select)
+
+
+def _labels(**labels) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ''
+    escaped = [f'{key}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, value in labels]
+    return '{' + ','.join(escaped) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            'buckets': {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+            'sum': round(self.sum, 6),
+            'count': self.count
+        }
+
+
+class Metrics:
+    """Thread-safe registry of counters, histograms and stage timings for one job run"""
+
+    def __init__(self, job: str = 'rillation'):
+        self.job = job
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._histograms: Dict[str, Dict[LabelSet, Histogram]] = {}
+        self._stage_seconds: Dict[str, float] = {}
+        self._stage_cpu_seconds: Dict[str, float] = {}
+        self._stage_rows: Dict[str, int] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increment a counter"""
+        key = _labels(**labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a value into a histogram"""
+        key = _labels(**labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Current value of a counter; without labels, the sum over all label sets"""
+        with self._lock:
+            series = self._counters.get(name, {})
+            if labels:
+                return series.get(_labels(**labels), 0)
+            return sum(series.values())
+
+    def record_request(self, method: str, url: str, status: Optional[int], elapsed: float,
+                       bytes_out: int, bytes_in: int, error: Optional[str] = None,
+                       wire_bytes_in: Optional[int] = None):
+        """Record one HTTP exchange; wire_bytes_in defaults to bytes_in (uncompressed response)"""
+        endpoint = normalize_endpoint(method, url)
+        if error:
+            self.inc('rillation_http_request_errors_total', endpoint=endpoint, error=error)
+        else:
+            self.inc('rillation_http_requests_total', endpoint=endpoint, status=status)
+            if status == 429:
+                self.inc('rillation_http_throttled_total', endpoint=endpoint)
+        self.observe('rillation_http_request_duration_seconds', elapsed, endpoint=endpoint)
+        self.inc('rillation_http_request_bytes_total', bytes_out, endpoint=endpoint)
+        self.inc('rillation_http_response_bytes_total', bytes_in, endpoint=endpoint)
+        self.inc('rillation_http_response_wire_bytes_total',
+                 bytes_in if wire_bytes_in is None else wire_bytes_in, endpoint=endpoint)
+
+    def record_retry(self, method: str, url: str):
+        """Count a retry of a request; called by the retry layer"""
+        self.inc('rillation_http_retries_total', endpoint=normalize_endpoint(method, url))
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator['StageTimer']:
+        """
+        Time a stage of the job (wall clock and process CPU time). Rows handled
+        inside the block are reported with timer.add_rows(n). Re-entering the
+        same stage accumulates; stages may nest, so their times can overlap.
+        """
+        timer = StageTimer()
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield timer
+        finally:
+            elapsed = time.perf_counter() - start
+            cpu_elapsed = time.process_time() - cpu_start
+            with self._lock:
+                self._stage_seconds[name] = self._stage_seconds.get(name, 0.0) + elapsed
+                self._stage_cpu_seconds[name] = self._stage_cpu_seconds.get(name, 0.0) + cpu_elapsed
+                self._stage_rows[name] = self._stage_rows.get(name, 0) + timer.rows
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """Wall seconds, CPU seconds, rows and rows/second for every stage"""
+        with self._lock:
+            summary = {}
+            for name, seconds in self._stage_seconds.items():
+                rows = self._stage_rows.get(name, 0)
+                summary[name] = {
+                    'seconds': round(seconds, 6),
+                    'cpu_seconds': round(self._stage_cpu_seconds.get(name, 0.0), 6),
+                    'rows': rows,
+                    'rows_per_second': round(rows / seconds, 3) if seconds > 0 else 0.0
+                }
+            return summary
+
+    def endpoint_summary(self) -> List[Dict]:
+        """Per-endpoint request count, latency and bytes, busiest endpoint first"""
+        with self._lock:
+            durations = dict(self._histograms.get('rillation_http_request_duration_seconds', {}))
+            bytes_in = dict(self._counters.get('rillation_http_response_bytes_total', {}))
+            wire_in = dict(self._counters.get('rillation_http_response_wire_bytes_total', {}))
+            bytes_out = dict(self._counters.get('rillation_http_request_bytes_total', {}))
+            unprojected = dict(self._counters.get('rillation_http_unprojected_reads_total', {}))
+        rows = []
+        for labels, histogram in durations.items():
+            rows.append({
+                'endpoint': dict(labels)['endpoint'],
+                'requests': histogram.count,
+                'total_seconds': round(histogram.sum, 6),
+                'avg_seconds': round(histogram.sum / histogram.count, 4) if histogram.count else 0.0,
+                'bytes_in': int(bytes_in.get(labels, 0)),
+                'wire_bytes_in': int(wire_in.get(labels, bytes_in.get(labels, 0))),
+                'bytes_out': int(bytes_out.get(labels, 0)),
+                'unprojected_reads': int(unprojected.get(labels, 0))
+            })
+        rows.sort(key=lambda row: row['requests'], reverse=True)
+        return rows
+
+    def snapshot(self) -> Dict:
+        """Plain-dict view of everything recorded so far"""
+        with self._lock:
+            counters = {
+                name: [{'labels': dict(labels), 'value': value} for labels, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [{'labels': dict(labels), **histogram.to_dict()} for labels, histogram in series.items()]
+                for name, series in self._histograms.items()
+            }
+        return {
+            'job': self.job,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'duration_seconds': round(time.time() - self.started_at, 3),
+            'counters': counters,
+            'histograms': histograms,
+            'stages': self.stage_summary()
+        }
+
+    def to_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format"""
+        job = (('job', self.job),)
+        lines = []
+
+        def header(name: str, kind: str):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for name in sorted(self._counters):
+                header(name, 'counter')
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(job + labels)} {value:g}")
+
+            for name in sorted(self._histograms):
+                header(name, 'histogram')
+                for labels, histogram in sorted(self._histograms[name].items(), key=lambda item: item[0]):
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{name}_bucket{_format_labels(job + labels + (('le', f'{bound:g}'),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(job + labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(job + labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(job + labels)} {histogram.count}")
+
+        stages = self.stage_summary()
+        if stages:
+            for name, field, kind in (
+                ('rillation_stage_seconds_total', 'seconds', 'counter'),
+                ('rillation_stage_cpu_seconds_total', 'cpu_seconds', 'counter'),
+                ('rillation_stage_rows_total', 'rows', 'counter'),
+                ('rillation_stage_rows_per_second', 'rows_per_second', 'gauge'),
+            ):
+                header(name, kind)
+                for stage_name, values in sorted(stages.items()):
+                    lines.append(f"{name}{_format_labels(job + (('stage', stage_name),))} {values[field]:g}")
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self, directory: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Write <job>.prom (atomically replaced) and append a line to <job>.jsonl.
+        Returns both paths.
+        """
+        directory = directory or METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+
+        prom_path = os.path.join(directory, f'{self.job}.prom')
+        tmp_path = f'{prom_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, prom_path)
+
+        jsonl_path = os.path.join(directory, f'{self.job}.jsonl')
+        with open(jsonl_path, 'a') as f:
+            f.write(json.dumps(self.snapshot(), default=str) + '\n')
+
+        return prom_path, jsonl_path
+
+
+class StageTimer:
+    """Row counter handed out by Metrics.stage()"""
+
+    def __init__(self):
+        self.rows = 0
+
+    def add_rows(self, count: int = 1):
+        self.rows += count
+
+
+# Keep-alive connections per host in the process-wide pool (BufferedWriter and the daemon use several threads)
+POOL_MAXSIZE = 20
+
+_shared_adapter: Optional[HTTPAdapter] = None
+_shared_adapter_lock = threading.Lock()
+
+
+def shared_adapter() -> HTTPAdapter:
+    """
+    One connection pool for the whole process. Every InstrumentedSession mounts
+    it, so jobs chained by the rillation CLI reuse warm TLS connections while
+    keeping their own metrics.
+    """
+    global _shared_adapter
+    with _shared_adapter_lock:
+        if _shared_adapter is None:
+            _shared_adapter = HTTPAdapter(pool_maxsize=POOL_MAXSIZE)
+        return _shared_adapter
+
+
+class CodecResponse(requests.Response):
+    """Response whose .json() decodes with rillation.codec"""
+
+    def json(self, **kwargs):
+        if kwargs:
+            return super().json(**kwargs)
+        return codec.loads(self.content)
+
+
+class InstrumentedSession(requests.Session):
+    """requests.Session that records every exchange into a Metrics registry"""
+
+    def __init__(self, metrics: 'Metrics'):
+        super().__init__()
+        self.metrics = metrics
+        # Everything urllib3 can decode here (gzip, deflate, plus br/zstd when installed)
+        self.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        adapter = shared_adapter()
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def close(self):
+        # The pool is shared with other sessions; leave its connections open
+        pass
+
+    def request(self, method, url, *args, **kwargs):
+        body = kwargs.pop('json', None)
+        if body is not None and kwargs.get('data') is None and len(args) < 2:
+            kwargs['data'] = codec.dumps(body)
+            headers = dict(kwargs.get('headers') or {})
+            if not any(key.lower() == 'content-type' for key in headers):
+                headers['Content-Type'] = 'application/json'
+            kwargs['headers'] = headers
+        return super().request(method, url, *args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if unprojected_read(request.method, request.url):
+            if REQUIRE_SELECT:
+                raise ValueError(f'PostgREST read without an explicit select= column list: {request.url}')
+            self.metrics.inc('rillation_http_unprojected_reads_total',
+                             endpoint=normalize_endpoint(request.method, request.url))
+
+        body = request.body or b''
+        bytes_out = len(body.encode('utf-8') if isinstance(body, str) else body)
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.metrics.record_request(request.method, request.url, None, time.perf_counter() - start,
+                                        bytes_out, 0, error=type(e).__name__)
+            raise
+
+        if kwargs.get('stream'):
+            bytes_in = wire_bytes_in = int(response.headers.get('Content-Length') or 0)
+        else:
+            bytes_in = len(response.content)
+            # urllib3 counts bytes read from the socket, i.e. before decompression
+            wire_bytes_in = response.raw.tell() if hasattr(response.raw, 'tell') else bytes_in
+        self.metrics.record_request(request.method, request.url, response.status_code,
+                                    time.perf_counter() - start, bytes_out, bytes_in,
+                                    wire_bytes_in=wire_bytes_in)
+        response.__class__ = CodecResponse
+        return response
+
+
+class ProgressReporter:
+    """
+    Rate-limited progress line, replacing one print per row.
+    Prints at most once every `interval` seconds, plus once on close().
+    """
+
+    def __init__(self, label: str, total: Optional[int] = None, interval: float = 5.0, stream=None):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.done = 0
+        self.counts: Dict[str, int] = {}
+        self._start = time.monotonic()
+        self._last_print = self._start
+
+    def update(self, count: int = 1, **outcomes):
+        """Advance by `count` items; keyword arguments bump named outcome counters"""
+        self.done += count
+        for key, value in outcomes.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+        now = time.monotonic()
+        if now - self._last_print >= self.interval:
+            self._last_print = now
+            self._print(now)
+
+    def close(self):
+        self._print(time.monotonic())
+
+    def _print(self, now: float):
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        progress = f"{self.done}/{self.total}" if self.total is not None else str(self.done)
+        outcomes = ' '.join(f"{key}={value}" for key, value in sorted(self.counts.items()))
+        line = f"  ⏳ {self.label}: {progress} ({rate:.1f}/s)"
+        if outcomes:
+            line += f" {outcomes}"
+        print(line, file=self.stream, flush=True)
+
+
+def instrumented_session(metrics: 'Metrics') -> InstrumentedSession:
+    """Create a session that records into `metrics`"""
+    return InstrumentedSession(metrics)
+
+
+def print_endpoint_summary(metrics: 'Metrics', limit: int = 10):
+    """Print the busiest endpoints with their latency and bytes, then where the bandwidth went"""
+    endpoints = metrics.endpoint_summary()
+    if not endpoints:
+        return
+    print("\nHTTP endpoints:")
+    for row in endpoints[:limit]:
+        line = (f"  {row['endpoint']}: {row['requests']} requests, avg {row['avg_seconds'] * 1000:.0f} ms, "
+                f"{row['bytes_out']} B out / {row['bytes_in']} B in")
+        if row['wire_bytes_in'] != row['bytes_in']:
+            line += f" ({row['wire_bytes_in']} B on the wire)"
+        if row['unprojected_reads']:
+            line += f" ⚠️  {row['unprojected_reads']} reads without select="
+        print(line)
+
+    total = sum(row['wire_bytes_in'] + row['bytes_out'] for row in endpoints)
+    if total:
+        decoded = sum(row['bytes_in'] for row in endpoints)
+        wire = sum(row['wire_bytes_in'] for row in endpoints)
+        heaviest = sorted(endpoints, key=lambda row: row['wire_bytes_in'] + row['bytes_out'], reverse=True)
+        shares = ', '.join(
+            f"{row['endpoint']} {(row['wire_bytes_in'] + row['bytes_out']) / total:.0%}" for row in heaviest[:3]
+        )
+        print(f"Bandwidth: {sum(row['bytes_out'] for row in endpoints)} B out, {wire} B in on the wire "
+              f"({decoded} B decoded); most from {shares}")
@@ -0,0 +1,639 @@
+"""
+Local stand-in for the Email Bison API and Supabase PostgREST.
+
+Serves, from an in-memory dataset:
+  Bison      GET  /api/replies?page=N             (client picked by bearer token)
+             POST /api/campaigns/{id}/stats
+  PostgREST  GET/POST/PATCH /rest/v1/<table>       (Clients, replies, campaign_reporting, ...)
+             GET  /rest/v1/                      (OpenAPI document, types inferred from the rows)
+  Functions  POST /functions/v1/fix-total-leads-contacted, update-rr-campaign-stats
+             (the chunk body the deployed functions accept; --function-row-limit
+             answers larger chunks with Supabase's 546 WORKER_LIMIT)
+
+Only the PostgREST features the scripts use are implemented: eq/neq/gt/gte/lt/lte/in
+filters, select projection, order, limit/offset, Prefer: count=exact, and
+upserts with Prefer: resolution=merge-duplicates or ignore-duplicates
+(optionally ?on_conflict=). Like Supabase's edge, responses of 1 KB or more are
+gzip-compressed when the client sends Accept-Encoding: gzip.
+
+Latency, 429 throttling and a request size limit (413) can be injected to make
+performance work realistic.
+The dataset comes from rillation.synthetic, either generated in-process from the
+size flags or loaded from a fixture directory (--fixtures).
+
+Run standalone:
+    python3 -m rillation.mock_server --port 8787 --latency-ms 40 --throttle-rate 0.02
+then point a script at it:
+    SUPABASE_URL=http://127.0.0.1:8787 BISON_API_BASE=http://127.0.0.1:8787/api python3 sync-bison-replies.py
+"""
+
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from rillation.stats import map_api_response_to_campaign_reporting, sequence_leads_contacted
+from rillation.synthetic import add_dataset_arguments, dataset_from_args, load_fixtures
+
+# Primary key per table; tables not listed here use 'id'
+PRIMARY_KEYS = {
+    'Clients': 'Business',
+    'replies': 'reply_id',
+    'campaign_reporting': 'id',
+    'rollup_watermarks': 'source',
+}
+
+# Secondary equality indexes kept per table so client-scoped reads stay fast at scale
+INDEXED_COLUMNS = {
+    'replies': ('client',),
+    'campaign_reporting': ('client', 'campaign_id'),
+    'client_rollups': ('client',),
+}
+
+NO_SEQUENCE_MESSAGE = 'Stats can only be viewed for campaigns with a sequence.'
+REPLIES_PER_PAGE = 15
+CAMPAIGNS_PER_PAGE = 15
+
+# Edge functions served under /functions/v1/, and the client each is fixed to
+EDGE_FUNCTIONS = {
+    'fix-total-leads-contacted': None,
+    'update-rr-campaign-stats': 'Rillation Revenue',
+}
+WORKER_LIMIT_MESSAGE = 'Function failed due to not having enough compute resources (please check logs)'
+
+# Smaller responses are sent uncompressed
+GZIP_MIN_BYTES = 1024
+
+
+class Table:
+    """In-memory table with a primary key and optional equality indexes"""
+
+    def __init__(self, name: str, rows: Optional[List[Dict]] = None):
+        self.name = name
+        self.pk = PRIMARY_KEYS.get(name, 'id')
+        self.rows: Dict = {}
+        self.indexes: Dict[str, Dict] = {column: {} for column in INDEXED_COLUMNS.get(name, ())}
+        for row in rows or []:
+            self.put(row)
+
+    def put(self, row: Dict) -> Dict:
+        """Insert or replace a row (by primary key)"""
+        if row.get(self.pk) is None and self.pk == 'id':
+            row['id'] = str(uuid.uuid4())
+        key = row.get(self.pk)
+        previous = self.rows.get(key)
+        if previous is not None:
+            self._unindex(previous)
+        self.rows[key] = row
+        for column, index in self.indexes.items():
+            index.setdefault(row.get(column), {})[key] = row
+        return row
+
+    def _unindex(self, row: Dict):
+        key = row.get(self.pk)
+        for column, index in self.indexes.items():
+            index.get(row.get(column), {}).pop(key, None)
+
+    def candidates(self, filters: List[Tuple[str, str, str]]):
+        """Rows worth testing against the filters, narrowed by an index when possible"""
+        for column, op, value in filters:
+            if op == 'eq' and column == self.pk:
+                row = self.rows.get(_coerce_like(value, next(iter(self.rows), None)))
+                return [row] if row is not None else []
+            if op == 'eq' and column in self.indexes:
+                index = self.indexes[column]
+                sample = next(iter(index), None)
+                return list(index.get(_coerce_like(value, sample), {}).values())
+        return list(self.rows.values())
+
+
+def _coerce_like(value: str, sample):
+    """Convert a query-string value to the type of an existing stored value"""
+    if isinstance(sample, bool):
+        return value == 'true'
+    if isinstance(sample, int):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if isinstance(sample, float):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _compare(stored, op: str, raw: str) -> bool:
+    if op == 'in':
+        options = [option.strip().strip('"') for option in raw.strip('()').split(',')]
+        return any(stored == _coerce_like(option, stored) for option in options)
+    if op == 'is':
+        return stored is None if raw == 'null' else stored == (raw == 'true')
+    value = _coerce_like(raw, stored)
+    if stored is None:
+        return op == 'neq'
+    try:
+        if op == 'eq':
+            return stored == value
+        if op == 'neq':
+            return stored != value
+        if op == 'gt':
+            return stored > value
+        if op == 'gte':
+            return stored >= value
+        if op == 'lt':
+            return stored < value
+        if op == 'lte':
+            return stored <= value
+    except TypeError:
+        return False
+    return False
+
+
+def parse_query(query: str):
+    """Split a PostgREST query string into filters, select, order, limit, offset and other params"""
+    filters = []
+    select = None
+    order = []
+    limit = None
+    offset = 0
+    params = {}
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        if key == 'select':
+            select = [column.strip().strip('"') for column in value.split(',') if column.strip()]
+            if select == ['*']:
+                select = None
+        elif key == 'order':
+            for term in value.split(','):
+                parts = term.split('.')
+                order.append((parts[0], len(parts) > 1 and parts[1] == 'desc'))
+        elif key == 'limit':
+            limit = int(value)
+        elif key == 'offset':
+            offset = int(value)
+        elif key in ('on_conflict', 'columns'):
+            params[key] = value
+        else:
+            match = re.match(r'^(not\.)?(eq|neq|gt|gte|lt|lte|in|is)\.(.*)$', value, re.S)
+            if match:
+                filters.append((key, match.group(2), match.group(3)))
+    return filters, select, order, limit, offset, params
+
+
+_UUID = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_TIMESTAMP = re.compile(r'^\d{4}-\d{2}-\d{2}T')
+
+
+def _column_spec(value) -> Dict:
+    """OpenAPI property for a column, inferred from a stored value the way PostgREST would describe it"""
+    if isinstance(value, bool):
+        return {'type': 'boolean', 'format': 'boolean'}
+    if isinstance(value, int):
+        return {'type': 'integer', 'format': 'bigint'}
+    if isinstance(value, float):
+        return {'type': 'number', 'format': 'double precision'}
+    if isinstance(value, str) and _UUID.match(value):
+        return {'type': 'string', 'format': 'uuid'}
+    if isinstance(value, str) and _DATE.match(value):
+        return {'type': 'string', 'format': 'date'}
+    if isinstance(value, str) and _TIMESTAMP.match(value):
+        return {'type': 'string', 'format': 'timestamp with time zone'}
+    return {'type': 'string', 'format': 'text'}
+
+
+def openapi_document(tables: Dict[str, 'Table']) -> Dict:
+    """Swagger 2.0 document in the shape PostgREST serves at the REST root"""
+    definitions = {}
+    for name, table in tables.items():
+        properties = {}
+        for row in list(table.rows.values())[:50]:
+            for column, value in row.items():
+                current = properties.get(column, {}).get('format')
+                if current is None or (value is not None and current == 'text') \
+                        or (isinstance(value, float) and current == 'bigint'):
+                    properties[column] = _column_spec(value)
+        if table.pk in properties:
+            properties[table.pk]['description'] = 'Note:\nThis is a Primary Key.<pk/>'
+        definitions[name] = {'type': 'object', 'required': [table.pk], 'properties': properties}
+    return {
+        'swagger': '2.0',
+        'info': {'title': 'PostgREST API (mock)', 'version': '12.0.2'},
+        'paths': {f'/{name}': {} for name in tables},
+        'definitions': definitions
+    }
+
+
+def _sort_key(value):
+    # None sorts last, mixed types sort by string form
+    return (value is None, value if isinstance(value, (int, float)) else str(value))
+
+
+class MockState:
+    """Dataset plus fault-injection settings shared by all handler threads"""
+
+    def __init__(self, dataset: Dict, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: float = 1.0, seed: int = 1,
+                 function_row_limit: int = 0, max_body_bytes: int = 0):
+        self.lock = threading.Lock()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        # Rows an edge function invocation may process before it "times out" (0 = no limit)
+        self.function_row_limit = function_row_limit
+        # Larger request bodies are answered with 413 (0 = no limit)
+        self.max_body_bytes = max_body_bytes
+        self.random = random.Random(seed)
+        self.tables: Dict[str, Table] = {
+            name: Table(name, rows) for name, rows in dataset.get('tables', {}).items()
+        }
+        # token -> replies newest first (a list or any sliceable sequence)
+        self.bison_replies: Dict[str, Sequence[Dict]] = dataset.get('bison_replies', {})
+        self.stats_provider: Callable[[str, int, str, str], Optional[Dict]] = dataset.get('stats_provider') or _no_stats
+        # token -> that client's /campaigns list; without one the endpoint answers 404
+        self.campaigns_provider: Optional[Callable[[str], Optional[List[Dict]]]] = dataset.get('campaigns_provider')
+        self.request_count = 0
+        self.throttled_count = 0
+        self.hooks: Dict[str, Callable] = {}
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            self.tables[name] = Table(name)
+        return self.tables[name]
+
+    def should_throttle(self) -> bool:
+        with self.lock:
+            self.request_count += 1
+            throttle = self.throttle_rate > 0 and self.random.random() < self.throttle_rate
+            if throttle:
+                self.throttled_count += 1
+            return throttle
+
+    def delay(self):
+        if self.latency_ms or self.jitter_ms:
+            with self.lock:
+                jitter = self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+            time.sleep((self.latency_ms + jitter) / 1000.0)
+
+
+def _no_stats(token, campaign_id, start_date, end_date):
+    return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Routes Bison and PostgREST requests onto MockState"""
+
+    server_version = 'RillationMock/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---- plumbing -------------------------------------------------------
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        raw = self.rfile.read(length)
+        return json.loads(raw.decode('utf-8'))
+
+    def _send_json(self, status: int, payload, headers: Optional[Dict] = None):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        gzipped = len(body) >= GZIP_MIN_BYTES and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        if gzipped:
+            body = gzip.compress(body, compresslevel=5)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _bearer(self) -> str:
+        auth = self.headers.get('Authorization') or ''
+        return auth[7:] if auth.startswith('Bearer ') else ''
+
+    def _dispatch(self):
+        self.state.delay()
+        if self.state.should_throttle():
+            self._send_json(429, {'message': 'Too Many Attempts.'},
+                            {'Retry-After': f'{self.state.retry_after:g}'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if self.state.max_body_bytes and length > self.state.max_body_bytes:
+            self.rfile.read(length)
+            self._send_json(413, {'message': 'Payload too large'})
+            return
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        hook = self.state.hooks.get(f'{self.command} {path}')
+        try:
+            if hook:
+                hook(self, parts.query)
+            elif path.startswith('/rest/v1/'):
+                self._postgrest(path[len('/rest/v1/'):], parts.query)
+            elif path.startswith('/api/'):
+                self._bison(path[len('/api/'):], parts.query)
+            elif path.startswith('/functions/v1/'):
+                self._edge_function(path[len('/functions/v1/'):])
+            else:
+                self._send_json(404, {'message': 'Not found'})
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {'message': str(e)})
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_HEAD = _dispatch
+
+    # ---- Bison ----------------------------------------------------------
+
+    def _bison(self, path: str, query: str):
+        token = self._bearer()
+        if token not in self.state.bison_replies:
+            # Drain the body so the kept-alive connection stays usable
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            self._send_json(401, {'message': 'Unauthenticated.'})
+            return
+
+        if path == 'replies' and self.command == 'GET':
+            params = dict(parse_qsl(query))
+            page = int(params.get('page') or 1)
+            per_page = int(params.get('per_page') or REPLIES_PER_PAGE)
+            replies = self.state.bison_replies[token]
+            start = (page - 1) * per_page
+            self._send_json(200, {
+                'data': replies[start:start + per_page],
+                'meta': {'current_page': page, 'per_page': per_page, 'total': len(replies)}
+            })
+            return
+
+        if path == 'campaigns' and self.command == 'GET' and self.state.campaigns_provider:
+            params = dict(parse_qsl(query))
+            page = int(params.get('page') or 1)
+            per_page = int(params.get('per_page') or CAMPAIGNS_PER_PAGE)
+            campaigns = self.state.campaigns_provider(token) or []
+            start = (page - 1) * per_page
+            self._send_json(200, {
+                'data': campaigns[start:start + per_page],
+                'meta': {'current_page': page, 'per_page': per_page, 'total': len(campaigns),
+                         'last_page': max(1, -(-len(campaigns) // per_page))}
+            })
+            return
+
+        match = re.match(r'^campaigns/(\d+)/stats$', path)
+        if match and self.command == 'POST':
+            body = self._read_body() or {}
+            payload = self.state.stats_provider(token, int(match.group(1)),
+                                                body.get('start_date'), body.get('end_date'))
+            if payload is None:
+                self._send_json(400, {'message': NO_SEQUENCE_MESSAGE})
+            else:
+                self._send_json(200, {'data': payload})
+            return
+
+        self._send_json(404, {'message': 'Not found'})
+
+    # ---- Edge functions -------------------------------------------------
+
+    def _edge_function(self, name: str):
+        """
+        The campaign_reporting fixers, run in-process over the chunk in the
+        request body (client, start_date, end_date, campaign_ids; all optional)
+        and answered with the functions' processed/updated/skipped/errors body
+        """
+        chunk = self._read_body() or {}
+        if name not in EDGE_FUNCTIONS or self.command != 'POST':
+            self._send_json(404, {'message': 'Function not found'})
+            return
+        client = EDGE_FUNCTIONS[name] or chunk.get('client')
+        campaign_ids = set(chunk.get('campaign_ids') or [])
+        with self.state.lock:
+            table = self.state.table('campaign_reporting')
+            candidates = table.candidates([('client', 'eq', client)] if client else [])
+            rows = [row for row in candidates
+                    if (not client or row.get('client') == client)
+                    and (not chunk.get('start_date') or row['date'] >= chunk['start_date'])
+                    and (not chunk.get('end_date') or row['date'] <= chunk['end_date'])
+                    and (not campaign_ids or row.get('campaign_id') in campaign_ids)]
+            tokens = {entry['Business']: entry.get('Api Key - Bison') for entry in self.state.table('Clients').rows.values()}
+        limit = self.state.function_row_limit
+        if limit and len(rows) > limit:
+            self._send_json(546, {'code': 'WORKER_LIMIT', 'message': WORKER_LIMIT_MESSAGE})
+            return
+
+        processed = updated = skipped = 0
+        errors = []
+        for row in rows:
+            token = tokens.get(row['client'])
+            if not token:
+                skipped += 1
+                errors.append({'campaign_id': row['campaign_id'], 'date': row['date'],
+                               'error': f"No API key for client: {row['client']}"})
+                continue
+            stats = self.state.stats_provider(token, int(row['campaign_id']), row['date'], row['date'])
+            if stats is None:
+                skipped += 1
+                continue
+            if name == 'fix-total-leads-contacted':
+                changes = {'total_leads_contacted': sequence_leads_contacted(stats)}
+            else:
+                changes = map_api_response_to_campaign_reporting(
+                    stats, row['campaign_id'], row.get('campaign_name'), row['client'], row['date'])
+            if any(row.get(column) != value for column, value in changes.items()):
+                with self.state.lock:
+                    table.put(dict(row, **changes))
+                updated += 1
+            processed += 1
+        self._send_json(200, {
+            'ok': True, 'message': 'Processing completed',
+            'processed': processed, 'updated': updated, 'skipped': skipped,
+            'error_count': len(errors), 'errors': errors[:50],
+        })
+
+    # ---- PostgREST ------------------------------------------------------
+
+    def _postgrest(self, table_name: str, query: str):
+        if table_name == '' and self.command == 'GET':
+            with self.state.lock:
+                document = openapi_document(self.state.tables)
+            self._send_json(200, document)
+            return
+        filters, select, order, limit, offset, params = parse_query(query)
+        with self.state.lock:
+            table = self.state.tables.get(table_name)
+        if table is None and self.command in ('GET', 'HEAD', 'PATCH'):
+            self._send_json(404, {'code': '42P01', 'message': f'relation "public.{table_name}" does not exist'})
+            return
+        prefer = self.headers.get('Prefer') or ''
+
+        if self.command in ('GET', 'HEAD'):
+            with self.state.lock:
+                rows = [row for row in table.candidates(filters)
+                        if all(_compare(row.get(column), op, value) for column, op, value in filters)]
+            for column, descending in reversed(order):
+                rows.sort(key=lambda row: _sort_key(row.get(column)), reverse=descending)
+            total = len(rows)
+            page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            if select:
+                page = [{column: row.get(column) for column in select} for row in page]
+            headers = {}
+            if 'count=' in prefer:
+                end = offset + len(page) - 1
+                headers['Content-Range'] = f'{offset}-{end}/{total}' if page else f'*/{total}'
+            self._send_json(200, page, headers)
+            return
+
+        if self.command == 'POST':
+            body = self._read_body()
+            incoming = body if isinstance(body, list) else [body]
+            merge = 'resolution=merge-duplicates' in prefer
+            ignore = 'resolution=ignore-duplicates' in prefer
+            conflict_columns = params.get('on_conflict', '').split(',') if params.get('on_conflict') else None
+            now = datetime.now(timezone.utc).isoformat()
+            written = []
+            with self.state.lock:
+                table = self.state.table(table_name)
+                for row in incoming:
+                    existing = self._find_conflict(table, row, conflict_columns)
+                    if existing is not None and ignore:
+                        continue
+                    if existing is not None and not merge:
+                        self._send_json(409, {'code': '23505', 'message': 'duplicate key value violates unique constraint'})
+                        return
+                    if existing is not None:
+                        merged = {**existing, **row, table.pk: existing.get(table.pk), 'updated_at': now}
+                        written.append(table.put(merged))
+                    else:
+                        written.append(table.put({**row, 'created_at': now, 'updated_at': now}))
+            if 'return=representation' in prefer:
+                self._send_json(201, written)
+            else:
+                self._send_json(201, [])
+            return
+
+        if self.command == 'PATCH':
+            body = self._read_body() or {}
+            now = datetime.now(timezone.utc).isoformat()
+            with self.state.lock:
+                matched = [row for row in table.candidates(filters)
+                           if all(_compare(row.get(column), op, value) for column, op, value in filters)]
+                updated = [table.put({**row, **body, 'updated_at': now}) for row in matched]
+            self._send_json(200, updated if 'return=representation' in prefer else [])
+            return
+
+        self._send_json(405, {'message': 'Method not allowed'})
+
+    @staticmethod
+    def _find_conflict(table: Table, row: Dict, conflict_columns: Optional[List[str]]):
+        if conflict_columns:
+            filters = [(column, 'eq', str(row.get(column))) for column in conflict_columns]
+            for candidate in table.candidates(filters):
+                if all(candidate.get(column) == row.get(column) for column in conflict_columns):
+                    return candidate
+            return None
+        key = row.get(table.pk)
+        return table.rows.get(key) if key is not None else None
+
+
+class MockServer:
+    """Runs the mock on a background thread; usable as a context manager"""
+
+    def __init__(self, state: MockState, host: str = '127.0.0.1', port: int = 0):
+        self.state = state
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = state
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def env(self) -> Dict[str, str]:
+        """Environment overrides that point the scripts at this server"""
+        return {
+            'SUPABASE_URL': self.url,
+            'SUPABASE_KEY': 'mock-anon-key',
+            'BISON_API_BASE': f'{self.url}/api',
+        }
+
+    def start(self) -> 'MockServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-server', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'MockServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Latency, throttling and dataset flags shared by the server and the benchmark runner"""
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Fixed latency added to every request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random extra latency (uniform 0..N ms)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--max-body-bytes', type=int, default=0,
+                        help='Answer request bodies larger than this with 413 (0 = no limit)')
+    parser.add_argument('--function-row-limit', type=int, default=0,
+                        help='Rows an edge function call may process before answering 546 (0 = no limit)')
+    parser.add_argument('--fixtures', help='Serve a fixture directory written by rillation.synthetic instead of generating')
+    add_dataset_arguments(parser)
+
+
+def state_from_args(args: argparse.Namespace) -> MockState:
+    if args.fixtures:
+        dataset = load_fixtures(args.fixtures)
+    else:
+        dataset = dataset_from_args(args).mock_dataset()
+    return MockState(dataset, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                     throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed,
+                     function_row_limit=args.function_row_limit, max_body_bytes=args.max_body_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the Email Bison API and Supabase PostgREST')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockServer(state_from_args(args), args.host, args.port)
+    print(f"🧪 Mock server listening on {server.url}")
+    for key, value in server.env().items():
+        print(f"   export {key}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+"""
+Direct Postgres bulk loader for replies and campaign_reporting backfills.
+
+PostgREST takes JSON in batches of a few hundred rows; the database itself can
+ingest far faster. CopyWriter opens one connection (session pooler, so temp
+tables work) and for every batch of rows:
+
+  CREATE TEMP TABLE _stage_<table> (LIKE <table> INCLUDING DEFAULTS) ON COMMIT DROP
+  COPY _stage_<table> (<columns>) FROM STDIN          -- rows streamed, no JSON
+  INSERT INTO <table> (<columns>)
+       SELECT DISTINCT ON (<key>) <columns> FROM _stage_<table> ORDER BY <key>, _seq DESC
+  ON CONFLICT (<key>) DO UPDATE SET <col> = EXCLUDED.<col>, ...   -- or DO NOTHING
+  COMMIT
+
+so each batch is one round trip of COPY data plus one set-based merge. The
+last row per key wins within a batch, like BufferedWriter's coalescing, and
+rows with different column sets are staged separately (as PostgREST requires
+uniform keys). CopyWriter has the same insert/upsert/close/rows_written/errors
+(and on_failed) surface as BufferedWriter, so the sync scripts swap it in with --direct.
+
+Connection: RILLATION_DATABASE_URL, else the pooler URL the Supabase CLI keeps
+in supabase/.temp/pooler-url; the password comes from PGPASSWORD (or
+SUPABASE_DB_PASSWORD). Requires psycopg 3, which is optional:
+    pip install "psycopg[binary]"
+
+Check against a local Postgres (creates and drops a scratch schema):
+    python3 -m rillation.pgcopy --dsn postgresql://postgres@localhost/postgres --replies 200000
+"""
+
+import argparse
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from rillation.errors import ErrorSummary
+from rillation.metrics import Metrics
+
+try:
+    import psycopg
+    from psycopg import sql
+except ImportError:  # optional dependency, only needed for --direct
+    psycopg = None
+    sql = None
+
+POOLER_URL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'supabase', '.temp', 'pooler-url')
+
+# Rows staged per COPY + merge
+DEFAULT_BATCH_ROWS = 50000
+
+
+def database_url() -> str:
+    """Connection string from RILLATION_DATABASE_URL or the Supabase CLI pooler URL"""
+    url = os.environ.get('RILLATION_DATABASE_URL')
+    if url:
+        return url
+    if os.path.exists(POOLER_URL_FILE):
+        with open(POOLER_URL_FILE) as f:
+            url = f.read().strip()
+        if url:
+            return url
+    raise RuntimeError('Set RILLATION_DATABASE_URL or link the project with the Supabase CLI '
+                       '(supabase/.temp/pooler-url)')
+
+
+def connect(dsn: Optional[str] = None):
+    if psycopg is None:
+        raise RuntimeError('The direct Postgres path needs psycopg 3: pip install "psycopg[binary]"')
+    password = os.environ.get('PGPASSWORD') or os.environ.get('SUPABASE_DB_PASSWORD')
+    kwargs = {'password': password} if password else {}
+    return psycopg.connect(dsn or database_url(), application_name='rillation-copy', **kwargs)
+
+
+class CopyWriter:
+    """COPY + merge writer; see the module docstring. Not thread-safe: one producer."""
+
+    def __init__(self, metrics: Optional[Metrics] = None, dsn: Optional[str] = None,
+                 schema: str = 'public', batch_rows: int = DEFAULT_BATCH_ROWS,
+                 on_failed: Optional[Callable[[str, List[Dict], str], None]] = None):
+        self.metrics = metrics or Metrics('pgcopy')
+        self.conn = connect(dsn)
+        self.schema = schema
+        self.batch_rows = batch_rows
+        # (table, on_conflict, ignore_duplicates) -> rows waiting
+        self._buffers: Dict[Tuple[str, Tuple[str, ...], bool], List[Dict]] = {}
+        self.written: Dict[str, int] = {}
+        self.failed: Dict[str, int] = {}
+        self.errors = ErrorSummary()
+        self.on_failed = on_failed
+
+    # ---- producer API (mirrors BufferedWriter) --------------------------
+
+    def insert(self, table: str, rows: Iterable[Dict], on_conflict: Iterable[str] = (),
+               ignore_duplicates: bool = False, block: bool = True) -> bool:
+        """Insert rows; with on_conflict and ignore_duplicates, existing keys are left alone"""
+        return self._add(table, rows, tuple(on_conflict), ignore_duplicates)
+
+    def upsert(self, table: str, rows: Iterable[Dict], on_conflict: Iterable[str] = ('id',),
+               block: bool = True) -> bool:
+        """Insert rows, replacing the stored row on a key match"""
+        return self._add(table, rows, tuple(on_conflict), False)
+
+    def _add(self, table: str, rows: Iterable[Dict], conflict: Tuple[str, ...], ignore_duplicates: bool) -> bool:
+        buffer = self._buffers.setdefault((table, conflict, ignore_duplicates), [])
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= self.batch_rows:
+                self._load(table, conflict, ignore_duplicates, buffer)
+                buffer.clear()
+        return True
+
+    def flush(self):
+        for (table, conflict, ignore_duplicates), rows in self._buffers.items():
+            if rows:
+                self._load(table, conflict, ignore_duplicates, rows)
+                rows.clear()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+
+    def __enter__(self) -> 'CopyWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def pending(self) -> int:
+        return sum(len(rows) for rows in self._buffers.values())
+
+    def rows_written(self, table: str) -> int:
+        return self.written.get(table, 0)
+
+    def rows_failed(self, table: str) -> int:
+        return self.failed.get(table, 0)
+
+    # ---- loading --------------------------------------------------------
+
+    def _load(self, table: str, conflict: Tuple[str, ...], ignore_duplicates: bool, rows: List[Dict]):
+        # COPY needs one column list per statement; rows missing a column must get its default, not NULL
+        groups: Dict[Tuple[str, ...], List[Dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        for columns, group in groups.items():
+            with self.metrics.stage(f'copy_{table}') as stage:
+                try:
+                    written = self._copy_merge(table, columns, conflict, ignore_duplicates, group)
+                    stage.add_rows(len(group))
+                except psycopg.Error as e:
+                    self.conn.rollback()
+                    self.failed[table] = self.failed.get(table, 0) + len(group)
+                    message = f'{table}: COPY of {len(group)} rows failed: {str(e).strip()[:300]}'
+                    self.errors.append(message, type(e).__name__)
+                    self.metrics.inc('rillation_copy_rows_total', len(group), table=table, result='failed')
+                    if self.on_failed is not None:
+                        self.on_failed(table, group, message)
+                    continue
+            self.written[table] = self.written.get(table, 0) + written
+            self.metrics.inc('rillation_copy_rows_total', written, table=table, result='written')
+            if written < len(group):
+                self.metrics.inc('rillation_copy_rows_total', len(group) - written, table=table, result='skipped')
+
+    def _copy_merge(self, table: str, columns: Tuple[str, ...], conflict: Tuple[str, ...],
+                    ignore_duplicates: bool, rows: List[Dict]) -> int:
+        """Stage rows with COPY and merge them in one transaction; returns rows inserted or updated"""
+        target = sql.Identifier(self.schema, table)
+        stage = sql.Identifier(f'_stage_{table}')
+        column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql.SQL(
+                'CREATE TEMP TABLE {stage} (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP'
+            ).format(stage=stage, target=target))
+            cursor.execute(sql.SQL(
+                'ALTER TABLE {stage} ADD COLUMN _seq bigint GENERATED ALWAYS AS IDENTITY'
+            ).format(stage=stage))
+
+            with cursor.copy(sql.SQL('COPY {stage} ({columns}) FROM STDIN').format(
+                    stage=stage, columns=column_list)) as copy:
+                for row in rows:
+                    copy.write_row([row[column] for column in columns])
+
+            if conflict:
+                keys = sql.SQL(', ').join(map(sql.Identifier, conflict))
+                source = sql.SQL('SELECT DISTINCT ON ({keys}) {columns} FROM {stage} ORDER BY {keys}, _seq DESC').format(
+                    keys=keys, columns=column_list, stage=stage)
+                updates = [column for column in columns if column not in conflict]
+                if ignore_duplicates or not updates:
+                    action = sql.SQL('DO NOTHING')
+                else:
+                    action = sql.SQL('DO UPDATE SET {}').format(sql.SQL(', ').join(
+                        sql.SQL('{0} = EXCLUDED.{0}').format(sql.Identifier(column)) for column in updates))
+                statement = sql.SQL('INSERT INTO {target} ({columns}) {source} ON CONFLICT ({keys}) {action}').format(
+                    target=target, columns=column_list, source=source, keys=keys, action=action)
+            else:
+                statement = sql.SQL('INSERT INTO {target} ({columns}) SELECT {columns} FROM {stage}').format(
+                    target=target, columns=column_list, stage=stage)
+            cursor.execute(statement)
+            written = cursor.rowcount
+        self.conn.commit()
+        return written
+
+
+# ---- local check --------------------------------------------------------
+
+# Local stand-ins for the two production tables (column names from SUPABASE_TABLES_SUMMARY.md)
+CHECK_DDL = """
+CREATE TABLE {schema}.replies (
+    reply_id bigint PRIMARY KEY,
+    type text, lead_id bigint, subject text, category text, text_body text, quoted_body_z text,
+    campaign_id bigint, date_received date, from_email text, primary_to_email text, client text,
+    created_at timestamptz DEFAULT now(), updated_at timestamptz DEFAULT now()
+);
+CREATE TABLE {schema}.campaign_reporting (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    campaign_id bigint, campaign_name text, client text, date date,
+    emails_sent numeric, total_leads_contacted numeric, opened numeric, opened_percentage numeric,
+    unique_opens_per_contact numeric, unique_opens_per_contact_percentage numeric,
+    unique_replies_per_contact numeric, unique_replies_per_contact_percentage numeric,
+    bounced numeric, bounced_percentage numeric, unsubscribed numeric, unsubscribed_percentage numeric,
+    interested numeric, interested_percentage numeric,
+    created_at timestamptz DEFAULT now(), updated_at timestamptz DEFAULT now()
+);
+"""
+
+
+def run_check(args: argparse.Namespace) -> List[str]:
+    """Load a synthetic backfill into a scratch schema twice (insert, then upsert) and verify it"""
+    from rillation.synthetic import SyntheticDataset
+
+    dataset = SyntheticDataset(clients=args.clients, replies=args.replies, campaign_rows=args.campaign_rows,
+                               stored_fraction=1.0, seed=args.seed)
+    tables = dataset.tables()
+    replies = list(tables['replies'])
+    campaign_rows = list(tables['campaign_reporting'])
+    schema = args.schema
+    problems: List[str] = []
+
+    with connect(args.dsn) as conn:
+        conn.execute(sql.SQL('DROP SCHEMA IF EXISTS {} CASCADE').format(sql.Identifier(schema)))
+        conn.execute(sql.SQL('CREATE SCHEMA {}').format(sql.Identifier(schema)))
+        conn.execute(CHECK_DDL.format(schema=schema))
+        conn.commit()
+
+    try:
+        metrics = Metrics('pgcopy-check')
+        start = time.perf_counter()
+        with CopyWriter(metrics, args.dsn, schema=schema, batch_rows=args.batch_rows) as writer:
+            writer.insert('replies', replies, on_conflict=('reply_id',), ignore_duplicates=True)
+            writer.upsert('campaign_reporting', campaign_rows, on_conflict=('id',))
+        first = time.perf_counter() - start
+        problems.extend(writer.errors)
+        total = len(replies) + len(campaign_rows)
+        print(f"📥 Loaded {len(replies)} replies and {len(campaign_rows)} campaign rows in {first:.2f}s "
+              f"({total / first:,.0f} rows/s)")
+
+        # Second pass: recategorize every reply, bump every metric, and repeat some rows in the batch
+        for row in replies:
+            row['category'] = 'Other'
+        for row in campaign_rows:
+            row['emails_sent'] = (row.get('emails_sent') or 0) + 1
+        start = time.perf_counter()
+        with CopyWriter(metrics, args.dsn, schema=schema, batch_rows=args.batch_rows) as writer:
+            writer.upsert('replies', replies + replies[:100], on_conflict=('reply_id',))
+            writer.upsert('campaign_reporting', campaign_rows, on_conflict=('id',))
+        second = time.perf_counter() - start
+        print(f"🔁 Upserted the same rows (plus 100 repeated in-batch) in {second:.2f}s ({total / second:,.0f} rows/s)")
+        problems.extend(writer.errors)
+
+        with connect(args.dsn) as conn:
+            counts = {table: conn.execute(sql.SQL('SELECT count(*) FROM {}').format(
+                sql.Identifier(schema, table))).fetchone()[0] for table in ('replies', 'campaign_reporting')}
+            other = conn.execute(sql.SQL("SELECT count(*) FROM {} WHERE category = 'Other'").format(
+                sql.Identifier(schema, 'replies'))).fetchone()[0]
+            sent = conn.execute(sql.SQL('SELECT coalesce(sum(emails_sent), 0) FROM {}').format(
+                sql.Identifier(schema, 'campaign_reporting'))).fetchone()[0]
+        expected_sent = sum(row['emails_sent'] for row in campaign_rows)
+        if counts['replies'] != len(replies):
+            problems.append(f"replies: {counts['replies']} rows, expected {len(replies)}")
+        if counts['campaign_reporting'] != len(campaign_rows):
+            problems.append(f"campaign_reporting: {counts['campaign_reporting']} rows, expected {len(campaign_rows)}")
+        if other != len(replies):
+            problems.append(f'replies: {other} rows recategorized, expected {len(replies)}')
+        if float(sent) != float(expected_sent):
+            problems.append(f'campaign_reporting: emails_sent sums to {sent}, expected {expected_sent}')
+    finally:
+        if not args.keep:
+            with connect(args.dsn) as conn:
+                conn.execute(sql.SQL('DROP SCHEMA IF EXISTS {} CASCADE').format(sql.Identifier(schema)))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the COPY bulk-load path against a local Postgres')
+    parser.add_argument('--dsn', required=True, help='Postgres to test against, e.g. postgresql://postgres@localhost/postgres')
+    parser.add_argument('--schema', default='rillation_copy_check', help='Scratch schema (dropped and recreated)')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--replies', type=int, default=50000)
+    parser.add_argument('--campaign-rows', type=int, default=20000)
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help='Leave the scratch schema in place')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Postgres COPY Loader Check")
+    print("=" * 60)
+    problems = run_check(args)
+    print(f"\n{'✅ All rows loaded and merged correctly' if not problems else f'❌ {len(problems)} problems'}")
+    for problem in problems[:10]:
+        print(f"  - {problem}")
+    raise SystemExit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Built-in profiling mode for the sync and backfill scripts.
+
+--profile records wall-clock and CPU time per stage (from the job's Metrics
+stages), total time spent waiting on HTTP per endpoint, and the time spent in
+sleeps. Two heavier captures are opt-in:
+  --profile-cprofile      cProfile over the whole run, top functions in the report
+  --profile-tracemalloc   tracemalloc over the whole run, top allocation sites in the report
+
+--profile-sample RATE (or $RILLATION_PROFILE_SAMPLE) enables the default
+profile on only a fraction of runs, so it can stay switched on in production.
+
+The report is written next to the run's metrics as
+<job>-profile-<timestamp>.txt plus a .json twin.
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from rillation.metrics import METRICS_DIR, Metrics
+
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Add the --profile family of flags to a script's argument parser"""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', action='store_true',
+                       help='Record wall/CPU time per stage and write a profile report')
+    group.add_argument('--profile-cprofile', action='store_true',
+                       help='Also capture cProfile and list the top functions (implies --profile)')
+    group.add_argument('--profile-tracemalloc', action='store_true',
+                       help='Also capture tracemalloc and list the top allocation sites (implies --profile)')
+    group.add_argument('--profile-sample', type=float,
+                       default=float(os.environ.get('RILLATION_PROFILE_SAMPLE', 0) or 0),
+                       help='Profile this fraction of runs even without --profile (0-1)')
+
+
+class RunProfiler:
+    """Profiles one run of a job; use as a context manager around main()"""
+
+    def __init__(self, metrics: Metrics, enabled: bool = True, use_cprofile: bool = False,
+                 use_tracemalloc: bool = False, output_dir: Optional[str] = None):
+        self.metrics = metrics
+        self.enabled = enabled or use_cprofile or use_tracemalloc
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.output_dir = output_dir or METRICS_DIR
+        self.report_path: Optional[str] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._wall_start = 0.0
+        self._cpu_start = 0.0
+        self._wall = 0.0
+        self._cpu = 0.0
+        self._allocations: List[Dict] = []
+        self._peak_bytes = 0
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace, metrics: Metrics) -> 'RunProfiler':
+        sampled = args.profile_sample > 0 and random.random() < args.profile_sample
+        return cls(
+            metrics,
+            enabled=args.profile or sampled,
+            use_cprofile=args.profile_cprofile,
+            use_tracemalloc=args.profile_tracemalloc
+        )
+
+    def __enter__(self) -> 'RunProfiler':
+        if not self.enabled:
+            return self
+        if self.use_tracemalloc:
+            tracemalloc.start(10)
+        if self.use_cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.enabled:
+            return False
+        self._wall = time.perf_counter() - self._wall_start
+        self._cpu = time.process_time() - self._cpu_start
+        if self._profile:
+            self._profile.disable()
+        if self.use_tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            _, self._peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._allocations = [
+                {
+                    'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    'size_bytes': stat.size,
+                    'count': stat.count
+                }
+                for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+            ]
+        self.write_report()
+        return False
+
+    def _top_functions(self) -> List[Dict]:
+        if not self._profile:
+            return []
+        stats = pstats.Stats(self._profile, stream=io.StringIO())
+        rows = []
+        for (filename, lineno, function), (_, calls, self_time, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f"{os.path.basename(filename)}:{lineno}({function})",
+                'calls': calls,
+                'self_seconds': round(self_time, 6),
+                'cumulative_seconds': round(cumulative, 6)
+            })
+        rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+        return rows[:TOP_FUNCTIONS]
+
+    def report(self) -> Dict:
+        endpoints = self.metrics.endpoint_summary()
+        return {
+            'job': self.metrics.job,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'wall_seconds': round(self._wall, 6),
+            'cpu_seconds': round(self._cpu, 6),
+            'http_wait_seconds': round(sum(row['total_seconds'] for row in endpoints), 6),
+            'stages': self.metrics.stage_summary(),
+            'endpoints': endpoints,
+            'top_functions': self._top_functions(),
+            'top_allocations': self._allocations,
+            'peak_traced_bytes': self._peak_bytes
+        }
+
+    def write_report(self) -> str:
+        """Write the text and JSON reports; returns the text report path"""
+        report = self.report()
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        base = os.path.join(self.output_dir, f"{self.metrics.job}-profile-{stamp}")
+
+        with open(f'{base}.json', 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+        lines = [
+            f"Profile: {report['job']} ({report['timestamp']})",
+            f"Wall: {report['wall_seconds']:.3f}s  CPU: {report['cpu_seconds']:.3f}s  "
+            f"HTTP wait: {report['http_wait_seconds']:.3f}s",
+            '',
+            'Stages (may nest):',
+        ]
+        for name, values in sorted(report['stages'].items(), key=lambda item: item[1]['seconds'], reverse=True):
+            lines.append(f"  {name:<28} wall {values['seconds']:>9.3f}s  cpu {values['cpu_seconds']:>9.3f}s  "
+                         f"rows {values['rows']:>8}  {values['rows_per_second']:>10.1f}/s")
+        if report['endpoints']:
+            lines += ['', 'HTTP endpoints:']
+            for row in report['endpoints']:
+                lines.append(f"  {row['endpoint']:<60} {row['requests']:>6} req  {row['total_seconds']:>9.3f}s")
+        if report['top_functions']:
+            lines += ['', f"Top {TOP_FUNCTIONS} functions by cumulative time:"]
+            for row in report['top_functions']:
+                lines.append(f"  {row['cumulative_seconds']:>9.3f}s cum  {row['self_seconds']:>9.3f}s self  "
+                             f"{row['calls']:>8} calls  {row['function']}")
+        if report['top_allocations']:
+            lines += ['', f"Top {TOP_ALLOCATIONS} allocation sites (peak {report['peak_traced_bytes'] / 1024:.0f} KiB):"]
+            for row in report['top_allocations']:
+                lines.append(f"  {row['size_bytes'] / 1024:>9.1f} KiB  {row['count']:>8} blocks  {row['location']}")
+
+        with open(f'{base}.txt', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        self.report_path = f'{base}.txt'
+        print(f"\n🔬 Profile written to {self.report_path}")
+        return self.report_path
@@ -0,0 +1,234 @@
+"""
+Quoted-thread and signature stripping for reply bodies.
+
+Bison's text_body is the whole email as received: a one-line answer followed
+by the sender's signature and the complete quoted chain of our own sequence
+steps, often ten times the size of the reply. Storing that inflated every
+replies insert and every later scan of the table, and the categorizer matched
+keywords in our own pitch ("schedule", "would like to") instead of the lead's
+words. split_reply cuts the body at the first of:
+
+  - a quote header: "On <date>, <name> wrote:" (also wrapped over two lines)
+  - an Outlook/forward block: "-----Original Message-----", "From: ..."
+    followed by Sent:/Date:/To:/Subject:, or a line of underscores
+  - a ">" quoted line
+  - a signature: the "-- " delimiter, "Sent from my iPhone" and the like
+
+and map_bison_reply_to_supabase keeps only the part before it in text_body
+and categorizes on it. What happens to the rest is the quoted-body policy
+(RILLATION_QUOTED_BODY, or --quoted-body on the reply jobs):
+
+  drop      discarded; rows have no quoted_body_z key. The default, as it
+            needs no schema change.
+  compress  stored zlib-compressed, base64, in replies.quoted_body_z;
+            expand_quoted() gives the text back. Rows carry the new column,
+            so apply supabase/migrations/add_replies_quoted_body.sql first:
+            PostgREST rejects inserts naming a column the table lacks.
+  keep      text_body stored as received, up to the length cap below
+            (categorization still uses the stripped text)
+
+A body with nothing before its first quote marker is kept whole. New text
+longer than RILLATION_TEXT_BODY_MAX characters (default 10000) is cut there
+and the overflow goes with the quoted part; under every policy text_body is
+at most that long. BodySummary counts the bytes
+received, kept and compressed for the rows a run writes; the reply jobs print
+them and export rillation_reply_body_bytes_total{part}.
+
+Run (sizes on synthetic replies):
+    python3 -m rillation.quoting [--replies 2000]
+"""
+
+import argparse
+import base64
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Optional, Tuple
+
+from rillation.metrics import Metrics
+
+POLICIES = ('compress', 'drop', 'keep')
+
+# 'drop' needs no schema change; 'compress' only once quoted_body_z exists
+QUOTED_POLICY = os.environ.get('RILLATION_QUOTED_BODY', 'drop')
+if QUOTED_POLICY not in POLICIES:
+    QUOTED_POLICY = 'drop'
+
+MAX_TEXT_BODY = int(os.environ.get('RILLATION_TEXT_BODY_MAX', '10000'))
+
+# Lines that start quoted history or a signature; everything from the first one on is cut
+_QUOTE_HEADER = re.compile(r'^\s*(?:>\s*)*On\s.{4,300}\bwrote:\s*$', re.IGNORECASE)
+_QUOTE_HEADER_START = re.compile(r'^\s*On\s.*\d', re.IGNORECASE)
+_WROTE_END = re.compile(r'\bwrote:\s*$', re.IGNORECASE)
+_ORIGINAL_MESSAGE = re.compile(r'^\s*-{2,}\s*(?:Original|Forwarded) Message\s*-{2,}', re.IGNORECASE)
+_UNDERSCORES = re.compile(r'^\s*_{10,}\s*$')
+_FROM_HEADER = re.compile(r'^\s*\*?From:\*?\s+\S', re.IGNORECASE)
+_HEADER_FIELD = re.compile(r'^\s*\*?(?:Sent|Date|To|Cc|Subject):\*?\s', re.IGNORECASE)
+_QUOTED_LINE = re.compile(r'^\s*>')
+_SIGNATURE = re.compile(
+    r'^(?:-- ?|__)\s*$|^\s*(?:Sent from my \w+|Sent from (?:Mail|Outlook|Yahoo Mail)\b|Get Outlook for \w+)',
+    re.IGNORECASE)
+
+# Part of categorizer_version(): changing a pattern changes what gets categorized
+CUT_PATTERNS = [pattern.pattern for pattern in (_QUOTE_HEADER, _QUOTE_HEADER_START, _WROTE_END, _ORIGINAL_MESSAGE,
+                                                _UNDERSCORES, _FROM_HEADER, _HEADER_FIELD, _QUOTED_LINE, _SIGNATURE)]
+
+
+def _cut_index(lines) -> Optional[int]:
+    """Index of the first line of quoted history or signature, or None"""
+    for index, line in enumerate(lines):
+        if _QUOTED_LINE.match(line) or _SIGNATURE.match(line) or _ORIGINAL_MESSAGE.match(line) \
+                or _UNDERSCORES.match(line) or _QUOTE_HEADER.match(line):
+            return index
+        if _QUOTE_HEADER_START.match(line) and index + 1 < len(lines) and _WROTE_END.search(lines[index + 1]):
+            return index
+        if _FROM_HEADER.match(line) and any(_HEADER_FIELD.match(following) for following in lines[index + 1:index + 5]):
+            return index
+    return None
+
+
+def split_reply(text: str, max_length: Optional[int] = None) -> Tuple[str, str]:
+    """(new text, quoted history + signature) of a reply body; the parts concatenate to `text`"""
+    if not text:
+        return text or '', ''
+    max_length = MAX_TEXT_BODY if max_length is None else max_length
+    lines = text.split('\n')
+    cut = _cut_index(lines)
+    head = text
+    if cut is not None:
+        candidate = '\n'.join(lines[:cut])
+        if candidate.strip():
+            head = candidate
+    if max_length and len(head) > max_length:
+        head = head[:max_length]
+    # Trailing blank lines belong to the cut-off part
+    new_text = head.rstrip()
+    return new_text, text[len(new_text):]
+
+
+def compress_quoted(text: str) -> Optional[str]:
+    """quoted_body_z value for a stripped-off part (None when there is none)"""
+    if not text or not text.strip():
+        return None
+    return base64.b64encode(zlib.compress(text.encode('utf-8'), 9)).decode('ascii')
+
+
+def expand_quoted(value: Optional[str]) -> str:
+    """The stripped-off text back from a stored quoted_body_z"""
+    if not value:
+        return ''
+    return zlib.decompress(base64.b64decode(value)).decode('utf-8')
+
+
+def set_policy(policy: str):
+    """Override the quoted-body policy for this process (the jobs' --quoted-body flag)"""
+    global QUOTED_POLICY
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown quoted-body policy {policy!r} (expected one of {', '.join(POLICIES)})")
+    QUOTED_POLICY = policy
+
+
+def add_policy_argument(parser: argparse.ArgumentParser):
+    parser.add_argument('--quoted-body', choices=POLICIES, default=None,
+                        help='What to do with quoted history and signatures stripped from text_body: '
+                             f'compress into quoted_body_z (apply add_replies_quoted_body.sql first), '
+                             'drop, or keep the body as received '
+                             f'(default: RILLATION_QUOTED_BODY or {QUOTED_POLICY})')
+
+
+def apply_body_policy(text: str) -> Tuple[str, Dict]:
+    """
+    (text to categorize, stored columns) for a reply body under the current
+    policy: {'text_body': ...} plus 'quoted_body_z' when compressing.
+    """
+    text = text or ''
+    new_text, rest = split_reply(text)
+    if QUOTED_POLICY == 'keep':
+        columns = {'text_body': text[:MAX_TEXT_BODY] if MAX_TEXT_BODY else text}
+    elif QUOTED_POLICY == 'drop':
+        columns = {'text_body': new_text}
+    else:
+        columns = {'text_body': new_text, 'quoted_body_z': compress_quoted(rest)}
+    return new_text, columns
+
+
+class BodySummary:
+    """Reply body bytes received vs stored over one run"""
+
+    def __init__(self, metrics: Optional[Metrics] = None):
+        self.metrics = metrics
+        self.replies = 0
+        self.stripped = 0
+        self.received_bytes = 0
+        self.kept_bytes = 0
+        self.compressed_bytes = 0
+        self._lock = threading.Lock()
+
+    def record_row(self, received: str, row: Dict):
+        """Count one stored replies row against the body it was mapped from"""
+        self.record(received or '', row.get('text_body') or '', row.get('quoted_body_z'))
+
+    def record(self, received: str, kept: str, compressed: Optional[str]):
+        received_bytes = len(received.encode('utf-8'))
+        kept_bytes = len(kept.encode('utf-8'))
+        compressed_bytes = len(compressed) if compressed else 0
+        with self._lock:
+            self.replies += 1
+            self.stripped += kept_bytes < received_bytes
+            self.received_bytes += received_bytes
+            self.kept_bytes += kept_bytes
+            self.compressed_bytes += compressed_bytes
+        if self.metrics is not None:
+            self.metrics.inc('rillation_reply_body_bytes_total', received_bytes, part='received')
+            self.metrics.inc('rillation_reply_body_bytes_total', kept_bytes, part='kept')
+            if compressed_bytes:
+                self.metrics.inc('rillation_reply_body_bytes_total', compressed_bytes, part='compressed')
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.received_bytes - self.kept_bytes - self.compressed_bytes
+
+
+def print_body_summary(summary: BodySummary):
+    """One line: bodies stripped and the bytes they no longer take in text_body"""
+    if not summary.replies:
+        return
+    line = (f"Reply bodies: {summary.stripped}/{summary.replies} stripped ({QUOTED_POLICY}), "
+            f"{summary.received_bytes:,} B received -> {summary.kept_bytes:,} B text_body")
+    if summary.compressed_bytes:
+        line += f" + {summary.compressed_bytes:,} B quoted_body_z"
+    percent = 100 * summary.saved_bytes / summary.received_bytes if summary.received_bytes else 0
+    print(f"{line}; {summary.saved_bytes:,} B saved ({percent:.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure quoted-thread stripping on synthetic replies')
+    parser.add_argument('--replies', type=int, default=2000, help='Synthetic replies to split')
+    args = parser.parse_args()
+
+    from rillation.replies import categorize_reply
+    from rillation.synthetic import SyntheticDataset
+
+    dataset = SyntheticDataset(clients=1, replies=args.replies, campaign_rows=1)
+    replies = [dataset.bison_reply(0, index) for index in range(args.replies)]
+    for policy in POLICIES:
+        set_policy(policy)
+        summary = BodySummary()
+        for reply in replies:
+            _, columns = apply_body_policy(reply['text_body'])
+            summary.record_row(reply['text_body'], columns)
+        print_body_summary(summary)
+
+    # Keyword categorization against the generator's intended category
+    agree_full = agree_stripped = 0
+    for reply in replies:
+        hint = reply['category_hint']
+        agree_full += categorize_reply(reply['subject'], reply['text_body']) == hint
+        agree_stripped += categorize_reply(reply['subject'], split_reply(reply['text_body'])[0]) == hint
+    print(f"\nCategory matches the generator: {agree_full}/{len(replies)} on full bodies, "
+          f"{agree_stripped}/{len(replies)} on stripped bodies")
+
+
+if __name__ == '__main__':
+    main()
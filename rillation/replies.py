@@ -0,0 +1,163 @@
+"""
+Reply categorization and Bison -> Supabase mapping shared by the reply sync,
+the webhook receiver and the bulk re-categorization job. Categories are
+matched on the new reply text only (rillation.quoting strips quoted history).
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Optional
+
+from rillation.quoting import CUT_PATTERNS, apply_body_policy
+
+# Out of Office detection
+OOO_KEYWORDS = [
+    'out of office', 'out of the office', 'ooo', 'auto-reply', 'automatic reply',
+    'vacation', 'away from office', 'away from my desk', 'traveling',
+    'limited access to email', 'limited access to internet', 'will be checking',
+    'response will be delayed', 'currently away', 'on leave'
+]
+
+# Interested detection
+INTERESTED_KEYWORDS = [
+    'interested', 'yes', 'sounds good', 'let\'s talk', 'let\'s discuss',
+    'schedule', 'book a meeting', 'calendly', 'when can we', 'would like to',
+    'please send', 'more information', 'tell me more'
+]
+
+# Not Interested detection
+NOT_INTERESTED_KEYWORDS = [
+    'not interested', 'no thanks', 'not a good fit', 'not right now',
+    'remove me', 'unsubscribe', 'stop emailing', 'do not contact'
+]
+
+# Checked in this order; the first category with a matching keyword wins
+CATEGORY_RULES = [
+    ('Out Of Office', OOO_KEYWORDS),
+    ('Interested', INTERESTED_KEYWORDS),
+    ('Not Interested', NOT_INTERESTED_KEYWORDS),
+]
+
+
+def categorize_reply(subject: str, text_body: str) -> str:
+    """
+    Categorize a reply based on subject and body text.
+    Returns category like 'Out Of Office', 'Interested', 'Not Interested', etc.
+    """
+    if not subject:
+        subject = ''
+    if not text_body:
+        text_body = ''
+    
+    combined_text = (subject + ' ' + text_body).lower()
+    
+    for category, keywords in CATEGORY_RULES:
+        for keyword in keywords:
+            if keyword in combined_text:
+                return category
+    
+    # Default to 'Other' if no category matches
+    return 'Other'
+
+
+def categorizer_version() -> str:
+    """Short hash of the keyword rules; changes whenever a keyword list or quote-stripping rule changes"""
+    payload = json.dumps([CATEGORY_RULES, CUT_PATTERNS], separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+
+def reply_text_body(bison_reply: Dict) -> str:
+    """The reply body as Bison sent it (quoted history and signature included)"""
+    return bison_reply.get('text_body') or bison_reply.get('body') or bison_reply.get('text') or bison_reply.get('content') or ''
+
+
+def map_bison_reply_to_supabase(bison_reply: Dict, client_name: str) -> Optional[Dict]:
+    """
+    Map Email Bison API reply data to Supabase replies table format.
+    Returns None if required fields are missing.
+    Based on API documentation: id, date_received, type, subject, text_body, etc.
+    text_body keeps only the new reply text; quoted history and signatures are
+    compressed or dropped per rillation.quoting.
+    """
+    # Extract fields from Bison API response (based on API docs: id is the reply ID)
+    reply_id = bison_reply.get('id') or bison_reply.get('reply_id') or bison_reply.get('message_id')
+    
+    if not reply_id:
+        print(f"  ⚠️  Skipping reply: No reply_id found")
+        return None
+    
+    # Get date_received - API docs show it's in ISO 8601 format: "2024-09-21T02:10:42.000000Z"
+    date_received = (
+        bison_reply.get('date_received') or 
+        bison_reply.get('received_at') or 
+        bison_reply.get('created_at') or 
+        bison_reply.get('date') or
+        bison_reply.get('timestamp')
+    )
+    
+    # Convert date to YYYY-MM-DD format if it's a timestamp or different format
+    if date_received:
+        try:
+            # If it's a timestamp string (ISO 8601), parse it
+            if isinstance(date_received, str) and 'T' in date_received:
+                # Handle ISO 8601 format: "2024-09-21T02:10:42.000000Z"
+                date_received = date_received.replace('Z', '+00:00')
+                dt = datetime.fromisoformat(date_received)
+                date_received = dt.date().isoformat()
+            elif isinstance(date_received, str) and len(date_received) > 10:
+                # Try parsing as datetime string
+                dt = datetime.strptime(date_received[:10], '%Y-%m-%d')
+                date_received = dt.date().isoformat()
+            elif isinstance(date_received, str):
+                # Already in YYYY-MM-DD format
+                date_received = date_received[:10]
+        except Exception as e:
+            # If parsing fails, use today's date as fallback
+            print(f"  ⚠️  Could not parse date_received '{date_received}', using today's date")
+            date_received = datetime.now().date().isoformat()
+    else:
+        # No date provided, use today
+        date_received = datetime.now().date().isoformat()
+    
+    # Get other fields based on API documentation
+    reply_type = bison_reply.get('type') or 'Tracked Reply'  # API docs show "Untracked Reply" or "Tracked Reply"
+    lead_id = bison_reply.get('lead_id') or None
+    subject = bison_reply.get('subject') or ''
+    text_body = reply_text_body(bison_reply)
+    campaign_id = bison_reply.get('campaign_id') or None
+    from_email = bison_reply.get('from_email_address') or bison_reply.get('from_email') or bison_reply.get('from') or bison_reply.get('sender_email') or ''
+    primary_to_email = bison_reply.get('primary_to_email_address') or bison_reply.get('primary_to_email') or bison_reply.get('to') or bison_reply.get('to_email') or bison_reply.get('recipient_email') or ''
+    
+    # Split the new text from quoted history / signature; categorize on the new text only
+    new_text, body_columns = apply_body_policy(text_body)
+    
+    # Determine category based on API fields or categorize
+    category = None
+    # API has 'interested' and 'automated_reply' fields
+    if bison_reply.get('interested') is True:
+        category = 'Interested'
+    elif bison_reply.get('automated_reply') is True:
+        category = 'Out Of Office'  # Automated replies are often OOO
+    else:
+        # Use categorize_reply function as fallback
+        category = categorize_reply(subject, new_text)
+    
+    # Build Supabase record
+    supabase_reply = {
+        'reply_id': int(reply_id),
+        'type': reply_type,
+        'lead_id': int(lead_id) if lead_id else None,
+        'subject': subject,
+        'category': category,
+        'text_body': body_columns['text_body'],
+        'campaign_id': int(campaign_id) if campaign_id else None,
+        'date_received': date_received,
+        'from_email': from_email,
+        'primary_to_email': primary_to_email,
+        'client': client_name
+    }
+    if 'quoted_body_z' in body_columns:
+        supabase_reply['quoted_body_z'] = body_columns['quoted_body_z']
+    
+    return supabase_reply
@@ -0,0 +1,234 @@
+"""
+Retry policy and per-client circuit breakers for Bison and Supabase calls.
+
+RetryPolicy retries throttled (429), server-error (5xx) and connection-failed
+requests with full-jitter exponential backoff (a random delay between 0 and
+base * 2^attempt, capped), honouring Retry-After when the server sends one.
+Other 4xx responses are returned to the caller straight away.
+
+A CircuitBreaker guards one client's token. After `failure_threshold`
+consecutive requests that end in 401/403/5xx (or a connection error) it opens,
+and every later call for that client is refused locally with CircuitOpenError
+instead of burning a request, so a revoked token or a client-specific outage
+costs a handful of calls rather than one per row. With `reset_after` set (the
+daemon) the breaker lets one probe through after that many seconds and closes
+again if it succeeds; the one-shot scripts leave it open for the rest of the run.
+
+    breakers = CircuitBreakers(metrics)
+    response = request_with_retry(http, 'POST', url, breaker=breakers.get(client), json=body)
+
+print_breaker_summary() adds each breaker's state, trips and refused calls to
+the run report; the same numbers are exported as rillation_breaker_* counters.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import requests
+
+from rillation.metrics import Metrics
+
+# Worth retrying: throttling, transient server errors, 0 = connection error / timeout
+RETRY_STATUSES = frozenset({0, 429, 500, 502, 503, 504})
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+def breaker_failure(status: int) -> bool:
+    """Responses that count against a client's breaker: bad or revoked token, server errors"""
+    return status in (0, 401, 403) or status >= 500
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if value and value.replace('.', '', 1).isdigit():
+        return float(value)
+    return None
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the client's breaker is open"""
+
+    def __init__(self, breaker: 'CircuitBreaker'):
+        super().__init__(f'circuit open for {breaker.name} after HTTP {breaker.last_status or "connection error"}')
+        self.breaker = breaker
+
+
+class RetryPolicy:
+    """Attempts and backoff for retryable failures; see the module docstring"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 retry_statuses=RETRY_STATUSES, seed: Optional[int] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+        self._random = random.Random(seed)
+
+    def retryable(self, status: int) -> bool:
+        return status in self.retry_statuses
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number `attempt` (1-based)"""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one client; thread-safe"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_after: Optional[float] = None,
+                 metrics: Optional[Metrics] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.metrics = metrics
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.last_status: Optional[int] = None
+        self.opened_at: Optional[float] = None
+        self._state = CLOSED
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self.reset_after is not None \
+                and time.monotonic() - self.opened_at >= self.reset_after:
+            self._state = HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """True when a request may be sent; counts the refusal otherwise"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED or (state == HALF_OPEN and not self._probing):
+                self._probing = state == HALF_OPEN
+                return True
+            self.rejected += 1
+        if self.metrics:
+            self.metrics.inc('rillation_breaker_rejected_total', breaker=self.name)
+        return False
+
+    def release(self):
+        """End a request that produced no status (it raised); a half-open breaker may probe again"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, status: int):
+        """Feed the final status of a request (0 for a connection error)"""
+        tripped = False
+        with self._lock:
+            self._probing = False
+            if not breaker_failure(status):
+                self.failures = 0
+                self._state = CLOSED
+                return
+            self.failures += 1
+            self.last_status = status
+            if self._state == HALF_OPEN or (self._state == CLOSED and self.failures >= self.failure_threshold):
+                tripped = True
+                self.trips += 1
+                self._state = OPEN
+                self.opened_at = time.monotonic()
+        if tripped and self.metrics:
+            self.metrics.inc('rillation_breaker_trips_total', breaker=self.name, status=status)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {'breaker': self.name, 'state': self._current_state(), 'trips': self.trips,
+                    'rejected': self.rejected, 'last_status': self.last_status}
+
+
+class CircuitBreakers:
+    """Breakers keyed by client (or token), created on first use with shared settings"""
+
+    def __init__(self, metrics: Optional[Metrics] = None, failure_threshold: int = 3,
+                 reset_after: Optional[float] = None):
+        self.metrics = metrics
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, self.failure_threshold, self.reset_after, self.metrics)
+            return self._breakers[name]
+
+    def __iter__(self) -> Iterator[CircuitBreaker]:
+        with self._lock:
+            return iter(list(self._breakers.values()))
+
+    def summary(self) -> List[Dict]:
+        """Breakers that tripped or refused calls, worst first"""
+        rows = [breaker.summary() for breaker in self]
+        rows = [row for row in rows if row['trips'] or row['state'] != CLOSED]
+        rows.sort(key=lambda row: (row['rejected'], row['trips']), reverse=True)
+        return rows
+
+
+def request_with_retry(http: requests.Session, method: str, url: str, policy: RetryPolicy = DEFAULT_POLICY,
+                       breaker: Optional[CircuitBreaker] = None,
+                       before_retry: Optional[Callable[[], bool]] = None, **kwargs) -> requests.Response:
+    """
+    Send a request, retrying per `policy`. Returns the final response, whatever
+    its status; raises CircuitOpenError when `breaker` is open and the last
+    RequestException when every attempt failed to connect. `before_retry` is
+    called after the backoff, before each resend (the daemon takes a request
+    budget token there); when it returns False the last outcome is final.
+    """
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(breaker)
+
+    metrics = getattr(http, 'metrics', None)
+    recorded = False
+    try:
+        for attempt in range(1, policy.max_attempts + 1):
+            try:
+                response = http.request(method, url, **kwargs)
+                status, error, delay = response.status_code, None, _retry_after(response)
+            except requests.exceptions.RequestException as e:
+                response, status, error, delay = None, 0, e, None
+
+            if attempt == policy.max_attempts or not policy.retryable(status):
+                break
+            if metrics is not None:
+                metrics.record_retry(method, url)
+            time.sleep(policy.backoff(attempt, delay))
+            if before_retry is not None and not before_retry():
+                break
+
+        if breaker is not None:
+            breaker.record(status)
+            recorded = True
+    finally:
+        # Anything else raised (a codec error, KeyboardInterrupt): don't leave a half-open probe claimed
+        if breaker is not None and not recorded:
+            breaker.release()
+    if error is not None:
+        raise error
+    return response
+
+
+def print_breaker_summary(breakers: CircuitBreakers):
+    """Report breakers that tripped during the run"""
+    rows = breakers.summary()
+    if not rows:
+        return
+    print("\nCircuit breakers:")
+    for row in rows:
+        print(f"  {row['breaker']}: {row['state']}, tripped {row['trips']}x "
+              f"(last HTTP {row['last_status'] or 'connection error'}), {row['rejected']} calls skipped")
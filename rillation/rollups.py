@@ -0,0 +1,294 @@
+"""
+Incremental client rollups for the dashboards.
+
+The dashboards re-sum raw campaign_reporting and replies rows in the browser on
+every load. This job maintains client_rollups instead: one row per client,
+grain (day, week starting Monday, month) and period with
+
+  emails_sent, total_leads_contacted, bounced, interested   from campaign_reporting
+  replies, real_replies (not Out Of Office), replies_by_category   from replies
+
+Each run:
+
+  1. reads the watermark of each source table from rollup_watermarks (the
+     latest updated_at already rolled up)
+  2. lists the (client, day) pairs of source rows updated after it
+  3. re-sums only the day, week and month buckets those days fall in, reading
+     the source rows of just those periods
+  4. upserts the buckets, then advances the watermarks
+
+Buckets are recomputed from the source rather than incremented, so rows the
+stats sync rewrites many times a day and overlapping runs are idempotent. The
+scan starts WATERMARK_OVERLAP before the watermark to catch rows committed
+late with an earlier updated_at. Deleted source rows leave no updated_at
+behind; --full rebuilds every bucket.
+
+Tables: supabase/migrations/create_client_rollups.sql
+
+Run:
+    python3 -m rillation.rollups
+    python3 -m rillation.rollups --full
+"""
+
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import requests
+
+from rillation.config import SUPABASE_HEADERS, SUPABASE_URL
+from rillation.errors import ErrorSummary, print_error_summary
+from rillation.metrics import Metrics, instrumented_session, print_endpoint_summary
+from rillation.rows import stream_rows
+from rillation.writer import BufferedWriter
+
+ROLLUP_TABLE = 'client_rollups'
+WATERMARK_TABLE = 'rollup_watermarks'
+
+GRAINS = ('day', 'week', 'month')
+
+# Summed straight from campaign_reporting
+CAMPAIGN_COLUMNS = ('emails_sent', 'total_leads_contacted', 'bounced', 'interested')
+
+# Source table -> (column holding the row's day, primary key)
+SOURCES = {
+    'campaign_reporting': ('date', 'id'),
+    'replies': ('date_received', 'reply_id'),
+}
+
+# Replies in this category don't count as real replies (same rule as the dashboards)
+NOT_REAL_CATEGORY = 'Out Of Office'
+
+# Rescan this far behind the watermark for rows committed after a later one
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+Bucket = Tuple[str, date]
+
+
+def parse_timestamp(value: str) -> datetime:
+    """PostgREST timestamptz (any fraction length, Z or offset) as an aware datetime"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def bucket_start(day: date, grain: str) -> date:
+    if grain == 'week':
+        return day - timedelta(days=day.weekday())
+    if grain == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bucket_end(start: date, grain: str) -> date:
+    """Last day (inclusive) of the bucket starting at `start`"""
+    if grain == 'week':
+        return start + timedelta(days=6)
+    if grain == 'month':
+        next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return next_month - timedelta(days=1)
+    return start
+
+
+def touched_buckets(days: Iterable[date]) -> Set[Bucket]:
+    return {(grain, bucket_start(day, grain)) for day in days for grain in GRAINS}
+
+
+def read_spans(buckets: Iterable[Bucket]) -> List[Tuple[date, date]]:
+    """Merged (first, last) day ranges covering every bucket, so each source row is read once"""
+    spans = sorted((start, bucket_end(start, grain)) for grain, start in buckets)
+    merged: List[List[date]] = []
+    for first, last in spans:
+        if merged and first <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [(first, last) for first, last in merged]
+
+
+class RollupJob:
+    """One incremental (or --full) pass over the source tables"""
+
+    def __init__(self, http: requests.Session, metrics: Metrics, full: bool = False):
+        self.http = http
+        self.metrics = metrics
+        self.full = full
+        self.watermarks: Dict[str, Optional[datetime]] = {}
+        self.new_watermarks: Dict[str, Optional[datetime]] = {}
+        self.stats = {'changed_rows': 0, 'clients': 0, 'buckets': 0, 'source_rows_read': 0,
+                      'errors': ErrorSummary(metrics)}
+
+    # ---- watermarks ---------------------------------------------------------
+
+    def load_watermarks(self):
+        self.watermarks = {source: None for source in SOURCES}
+        if self.full:
+            return
+        url = f'{SUPABASE_URL}/rest/v1/{WATERMARK_TABLE}?select=source,watermark'
+        response = self.http.get(url, headers=SUPABASE_HEADERS, timeout=30)
+        if response.status_code == 404:
+            raise Exception(f'{WATERMARK_TABLE} is missing; apply supabase/migrations/create_client_rollups.sql')
+        if not response.ok:
+            raise Exception(f'{WATERMARK_TABLE}: HTTP {response.status_code} - {response.text[:200]}')
+        for row in response.json():
+            if row.get('source') in SOURCES and row.get('watermark'):
+                self.watermarks[row['source']] = parse_timestamp(row['watermark'])
+
+    def save_watermarks(self, writer: BufferedWriter):
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [{'source': source, 'watermark': mark.isoformat(), 'updated_at': now}
+                for source, mark in self.new_watermarks.items() if mark is not None]
+        writer.upsert(WATERMARK_TABLE, rows, on_conflict=('source',))
+
+    # ---- change scan ----------------------------------------------------------
+
+    def changed_days(self) -> Dict[str, Set[date]]:
+        """client -> days with a source row updated since the watermarks"""
+        days: Dict[str, Set[date]] = {}
+        for source, (day_column, key) in SOURCES.items():
+            mark = self.watermarks[source]
+            latest = mark
+            query = f'select=client,{day_column},updated_at&order=updated_at.asc,{key}.asc'
+            if mark is not None:
+                query += f'&updated_at=gt.{quote((mark - WATERMARK_OVERLAP).isoformat())}'
+            for row in stream_rows(self.http, source, query):
+                self.stats['changed_rows'] += 1
+                if row.get('updated_at'):
+                    stamp = parse_timestamp(row['updated_at'])
+                    latest = stamp if latest is None else max(latest, stamp)
+                day = row.get(day_column)
+                if day and row.get('client'):
+                    days.setdefault(row['client'], set()).add(date.fromisoformat(day[:10]))
+            self.new_watermarks[source] = latest
+        return days
+
+    # ---- recompute ------------------------------------------------------------
+
+    def recompute(self, client: str, days: Set[date]) -> List[Dict]:
+        """Fresh totals for every bucket the changed days fall in"""
+        buckets = touched_buckets(days)
+        totals: Dict[Bucket, Dict] = {bucket: self._empty(client, *bucket) for bucket in buckets}
+        name = quote(client)
+        for first, last in read_spans(buckets):
+            campaign_query = (f"select=date,{','.join(CAMPAIGN_COLUMNS)}&client=eq.{name}"
+                              f'&date=gte.{first}&date=lte.{last}&order=date.asc,id.asc')
+            for row in stream_rows(self.http, 'campaign_reporting', campaign_query):
+                self.stats['source_rows_read'] += 1
+                for total in self._totals_for(totals, row.get('date')):
+                    for column in CAMPAIGN_COLUMNS:
+                        total[column] += int(float(row.get(column) or 0))
+
+            # date_received may carry a time of day, so bound it by the next day
+            reply_query = (f'select=date_received,category&client=eq.{name}'
+                           f'&date_received=gte.{first}&date_received=lt.{last + timedelta(days=1)}'
+                           f'&order=date_received.asc,reply_id.asc')
+            for row in stream_rows(self.http, 'replies', reply_query):
+                self.stats['source_rows_read'] += 1
+                category = row.get('category') or 'Uncategorized'
+                for total in self._totals_for(totals, row.get('date_received')):
+                    total['replies'] += 1
+                    if category != NOT_REAL_CATEGORY:
+                        total['real_replies'] += 1
+                    total['replies_by_category'][category] = total['replies_by_category'].get(category, 0) + 1
+        return list(totals.values())
+
+    @staticmethod
+    def _empty(client: str, grain: str, start: date) -> Dict:
+        row = {'client': client, 'grain': grain, 'period_start': start.isoformat(),
+               'period_end': bucket_end(start, grain).isoformat()}
+        row.update({column: 0 for column in CAMPAIGN_COLUMNS})
+        row.update({'replies': 0, 'real_replies': 0, 'replies_by_category': {}})
+        return row
+
+    @staticmethod
+    def _totals_for(totals: Dict[Bucket, Dict], day: Optional[str]) -> Iterator[Dict]:
+        if not day:
+            return
+        parsed = date.fromisoformat(day[:10])
+        for grain in GRAINS:
+            total = totals.get((grain, bucket_start(parsed, grain)))
+            if total is not None:
+                yield total
+
+    # ---- run ------------------------------------------------------------------
+
+    def run(self) -> Dict:
+        with self.metrics.stage('load_watermarks'):
+            self.load_watermarks()
+
+        with self.metrics.stage('scan_changes') as stage:
+            changed = self.changed_days()
+            stage.add_rows(self.stats['changed_rows'])
+        print(f"🔎 {self.stats['changed_rows']} source rows changed since the watermarks, "
+              f"{sum(len(days) for days in changed.values())} client-days in {len(changed)} clients")
+
+        now = datetime.now(timezone.utc).isoformat()
+        writer = BufferedWriter(self.http, self.metrics)
+        for client, days in sorted(changed.items()):
+            try:
+                with self.metrics.stage('recompute') as stage:
+                    rows = self.recompute(client, days)
+                    stage.add_rows(len(rows))
+            except Exception as e:
+                error_msg = f'Error recomputing {client}: {e}'
+                print(f'  ❌ {error_msg}')
+                self.stats['errors'].append(error_msg)
+                continue
+            for row in rows:
+                row['updated_at'] = now
+                self.metrics.inc('rillation_rollup_buckets_total', grain=row['grain'])
+            with self.metrics.stage('write_rollups') as stage:
+                writer.upsert(ROLLUP_TABLE, rows, on_conflict=('client', 'grain', 'period_start'))
+                stage.add_rows(len(rows))
+            self.stats['clients'] += 1
+            self.stats['buckets'] += len(rows)
+            print(f'  ✅ {client}: {len(days)} days -> {len(rows)} buckets')
+
+        with self.metrics.stage('flush_writes'):
+            writer.flush()
+
+        # Only move the watermarks once every bucket they cover is stored
+        if self.stats['errors'] or writer.errors:
+            print('⚠️  Watermarks left unchanged; the next run retries these changes')
+        else:
+            self.save_watermarks(writer)
+        writer.close()
+        self.stats['errors'].extend(writer.errors)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update client day/week/month rollups from changed source rows')
+    parser.add_argument('--full', action='store_true',
+                        help='Ignore the watermarks and rebuild every bucket (e.g. after deleting source rows)')
+    args = parser.parse_args()
+
+    metrics = Metrics('rollups')
+    http = instrumented_session(metrics)
+
+    print("=" * 60)
+    print("Client Rollups" + (" (full rebuild)" if args.full else ""))
+    print("=" * 60)
+    job = RollupJob(http, metrics, full=args.full)
+    stats = job.run()
+
+    print("\n" + "=" * 60)
+    print("ROLLUP SUMMARY")
+    print("=" * 60)
+    print(f"Changed source rows: {stats['changed_rows']}")
+    print(f"Clients updated: {stats['clients']}")
+    print(f"Buckets written: {stats['buckets']}")
+    print(f"Source rows re-read: {stats['source_rows_read']}")
+    for source, mark in job.new_watermarks.items():
+        print(f"Watermark {source}: {mark.isoformat() if mark else 'none'}")
+    print(f"Errors: {len(stats['errors'])}")
+    print_error_summary(stats['errors'])
+    print_endpoint_summary(metrics)
+
+    prom_path, jsonl_path = metrics.export()
+    print(f"\n📈 Metrics written to {prom_path} and {jsonl_path}")
+    print("\n✅ Rollups completed!")
+
+
+if __name__ == '__main__':
+    main()
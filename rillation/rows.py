@@ -0,0 +1,65 @@
+"""
+Streaming PostgREST row sources.
+
+Jobs used to read a whole table into a list, and often copy it again into a
+dict of lists, before doing any work. stream_rows yields rows a page at a time
+and group_rows turns a stream ordered by a column into lazy (value, rows)
+groups, so processing starts on the first page and memory is bounded by the
+page size instead of the table.
+
+Pages are read with limit/offset, so the query's order must end in a unique
+column (usually the primary key) for pages not to overlap or skip rows.
+"""
+
+import itertools
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+
+from rillation.config import SUPABASE_HEADERS, SUPABASE_URL
+from rillation.metrics import Metrics
+
+PAGE_SIZE = 1000
+
+
+def stream_rows(http: requests.Session, table: str, query: str, page_size: int = PAGE_SIZE,
+                metrics: Optional[Metrics] = None, stage: str = 'load_rows') -> Iterator[Dict]:
+    """
+    Every row of a PostgREST query (select, filters and order, without
+    limit/offset), fetched one page at a time as the caller consumes them.
+    Page fetches are timed under `stage` when metrics are given.
+    """
+    offset = 0
+    while True:
+        url = f'{SUPABASE_URL}/rest/v1/{table}?{query}&limit={page_size}&offset={offset}'
+        if metrics is not None:
+            with metrics.stage(stage) as timer:
+                rows = _fetch_page(http, table, url)
+                timer.add_rows(len(rows))
+        else:
+            rows = _fetch_page(http, table, url)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def _fetch_page(http: requests.Session, table: str, url: str):
+    response = http.get(url, headers=SUPABASE_HEADERS, timeout=60)
+    if not response.ok:
+        raise Exception(f'{table}: HTTP {response.status_code} - {response.text[:200]}')
+    return response.json()
+
+
+def group_rows(rows: Iterator[Dict], key: Callable[[Dict], Any]) -> Iterator[Tuple[Any, Iterator[Dict]]]:
+    """
+    Consecutive rows with the same key, like itertools.groupby. The stream must
+    be ordered by the key: a key that comes back after its group ended raises
+    ValueError instead of silently splitting the group.
+    """
+    finished = set()
+    for value, group in itertools.groupby(rows, key=key):
+        if value in finished:
+            raise ValueError(f'Rows are not ordered by the group key: {value!r} appeared again')
+        finished.add(value)
+        yield value, group
@@ -0,0 +1,342 @@
+"""
+Precomputed dashboard snapshots.
+
+Quick View issues several Supabase queries per load and sums raw rows in the
+browser. For the date presets the dashboard offers (today, this/last week,
+this/last month) every number it shows is already in client_rollups (see
+rillation.rollups), so this job reads those few rows plus meeting counts and
+writes static JSON next to the dashboard:
+
+  snapshots/v1/index.json            version, as-of date, preset ranges, file hashes
+  snapshots/v1/overview.json         per-client totals for each preset
+  snapshots/v1/clients/<slug>.json   one client's preset totals and daily series
+
+js/analytics-core.js loads them (getSnapshotTotals / getClientSnapshot) and
+js/quick-view.js falls back to live queries when a snapshot is missing, stale,
+from another schema version, or the range isn't exactly a preset.
+
+Rebuilds are incremental: client files are only rewritten for clients whose
+client_rollups rows changed since the watermark in index.json, or whose
+meeting counts changed (meetings_booked has no updated_at, so its ~2 month
+window is re-read every run). A new day, a new SNAPSHOT_VERSION or --full
+rebuilds everything. Files are written atomically and only when their content
+changed; the index carries each file's hash for cache busting.
+
+Run (after rillation.rollups):
+    python3 -m rillation.snapshots
+    python3 -m rillation.snapshots --as-of 2025-11-13 --full
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import requests
+
+from rillation.errors import ErrorSummary, print_error_summary
+from rillation.metrics import Metrics, instrumented_session, print_endpoint_summary
+from rillation.rollups import ROLLUP_TABLE, bucket_end, bucket_start, parse_timestamp
+from rillation.rows import stream_rows
+
+# Bump when the file layout changes; the frontend ignores other versions
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_DIR = os.environ.get('RILLATION_SNAPSHOT_DIR', 'snapshots')
+
+# Dashboard preset -> (rollup grain, periods back from the current one); same ranges as the preset buttons
+PRESETS = {
+    'today': ('day', 0),
+    'this_week': ('week', 0),
+    'last_week': ('week', 1),
+    'this_month': ('month', 0),
+    'last_month': ('month', 1),
+}
+
+# client_rollups column -> snapshot key (the names Quick View uses)
+TOTAL_COLUMNS = {
+    'emails_sent': 'emailsSent',
+    'total_leads_contacted': 'prospects',
+    'bounced': 'bounces',
+    'interested': 'interested',
+    'real_replies': 'replies',
+    'replies': 'totalReplies',
+}
+
+ROLLUP_SELECT = 'client,grain,period_start,' + ','.join(TOTAL_COLUMNS) + ',replies_by_category'
+
+
+def preset_ranges(as_of: date) -> Dict[str, Tuple[date, date]]:
+    """Preset -> (first day, last day), matching the dashboard's preset buttons"""
+    ranges = {}
+    for preset, (grain, back) in PRESETS.items():
+        start = bucket_start(as_of, grain)
+        for _ in range(back):
+            start = bucket_start(start - timedelta(days=1), grain)
+        ranges[preset] = (start, bucket_end(start, grain))
+    return ranges
+
+
+def client_slug(name: str) -> str:
+    """File-safe name; the hash suffix keeps names that differ only in punctuation apart"""
+    slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'client'
+    return f"{slug}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:6]}"
+
+
+def encode(payload: Dict) -> bytes:
+    return json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def empty_totals() -> Dict:
+    totals = {key: 0 for key in TOTAL_COLUMNS.values()}
+    totals['meetings'] = 0
+    return totals
+
+
+class SnapshotBuilder:
+    """Builds and writes one set of snapshot files"""
+
+    def __init__(self, http: requests.Session, metrics: Metrics, as_of: date,
+                 output_dir: str = SNAPSHOT_DIR, full: bool = False):
+        self.http = http
+        self.metrics = metrics
+        self.as_of = as_of
+        self.root = os.path.join(output_dir, f'v{SNAPSHOT_VERSION}')
+        self.full = full
+        self.meetings_available = True
+        self.ranges = preset_ranges(as_of)
+        self.daily_start = min(start for start, _ in self.ranges.values())
+        self.daily_end = max(end for _, end in self.ranges.values())
+        self.stats = {'clients': 0, 'clients_rebuilt': 0, 'files_written': 0, 'files_unchanged': 0,
+                      'bytes_written': 0, 'errors': ErrorSummary(metrics)}
+
+    # ---- reads --------------------------------------------------------------
+
+    def load_index(self) -> Optional[Dict]:
+        path = os.path.join(self.root, 'index.json')
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def changed_clients(self, watermark: Optional[str]) -> Tuple[Set[str], Optional[str]]:
+        """Clients with client_rollups rows updated after the watermark, and the new watermark"""
+        query = 'select=client,updated_at&order=updated_at.asc,id.asc'
+        if watermark:
+            query += f'&updated_at=gt.{quote(watermark)}'
+        clients, latest = set(), parse_timestamp(watermark) if watermark else None
+        for row in stream_rows(self.http, ROLLUP_TABLE, query):
+            clients.add(row['client'])
+            if row.get('updated_at'):
+                stamp = parse_timestamp(row['updated_at'])
+                latest = stamp if latest is None else max(latest, stamp)
+        return clients, latest.isoformat() if latest else watermark
+
+    def preset_rows(self) -> Dict[str, Dict[str, Dict]]:
+        """preset -> client -> rollup row, one query per grain"""
+        periods: Dict[str, Dict[str, str]] = {}
+        for preset, (start, _) in self.ranges.items():
+            periods.setdefault(PRESETS[preset][0], {})[start.isoformat()] = preset
+        rows: Dict[str, Dict[str, Dict]] = {preset: {} for preset in PRESETS}
+        for grain, starts in periods.items():
+            query = (f"select={ROLLUP_SELECT}&grain=eq.{grain}&period_start=in.({','.join(starts)})"
+                     f'&order=client.asc,period_start.asc')
+            for row in stream_rows(self.http, ROLLUP_TABLE, query):
+                preset = starts.get(row['period_start'][:10])
+                if preset:
+                    rows[preset][row['client']] = row
+        return rows
+
+    def daily_rows(self, client: str) -> List[Dict]:
+        query = (f'select={ROLLUP_SELECT}&client=eq.{quote(client)}&grain=eq.day'
+                 f'&period_start=gte.{self.daily_start}&period_start=lte.{self.daily_end}&order=period_start.asc')
+        return list(stream_rows(self.http, ROLLUP_TABLE, query))
+
+    def meetings_by_day(self) -> Dict[str, Dict[str, int]]:
+        """client -> day -> meetings booked in the snapshot window"""
+        query = (f'select=client,created_time&created_time=gte.{self.daily_start}'
+                 f'&created_time=lt.{self.daily_end + timedelta(days=1)}&order=created_time.asc,email.asc')
+        meetings: Dict[str, Dict[str, int]] = {}
+        self.meetings_available = True
+        try:
+            for row in stream_rows(self.http, 'meetings_booked', query):
+                if row.get('client') and row.get('created_time'):
+                    days = meetings.setdefault(row['client'], {})
+                    day = row['created_time'][:10]
+                    days[day] = days.get(day, 0) + 1
+        except Exception as e:
+            print(f'⚠️  Meetings unavailable ({e}); meeting counts will be 0 and the frontend will not use this snapshot')
+            self.meetings_available = False
+        return meetings
+
+    # ---- payloads -------------------------------------------------------------
+
+    def _totals(self, row: Optional[Dict], meetings: Dict[str, int], preset: str) -> Dict:
+        totals = empty_totals()
+        if row:
+            for column, key in TOTAL_COLUMNS.items():
+                totals[key] = row.get(column) or 0
+        start, end = self.ranges[preset]
+        totals['meetings'] = sum(count for day, count in meetings.items() if start.isoformat() <= day <= end.isoformat())
+        return totals
+
+    def overview(self, preset_rows: Dict[str, Dict[str, Dict]], meetings: Dict[str, Dict[str, int]]) -> Dict:
+        presets = {}
+        for preset in PRESETS:
+            clients = set(preset_rows[preset])
+            start, end = self.ranges[preset]
+            clients.update(client for client, days in meetings.items()
+                           if any(start.isoformat() <= day <= end.isoformat() for day in days))
+            presets[preset] = {client: self._totals(preset_rows[preset].get(client), meetings.get(client, {}), preset)
+                               for client in sorted(clients)}
+        return {'version': SNAPSHOT_VERSION, 'asOf': self.as_of.isoformat(), 'presets': presets}
+
+    def client_payload(self, client: str, preset_rows: Dict[str, Dict[str, Dict]],
+                       meetings: Dict[str, int]) -> Dict:
+        presets = {}
+        for preset in PRESETS:
+            row = preset_rows[preset].get(client)
+            totals = self._totals(row, meetings, preset)
+            totals['repliesByCategory'] = (row or {}).get('replies_by_category') or {}
+            presets[preset] = totals
+
+        # Columnar daily series: one entry per day of the window, zeros on quiet days
+        by_day = {row['period_start'][:10]: row for row in self.daily_rows(client)}
+        days = [(self.daily_start + timedelta(days=offset)).isoformat()
+                for offset in range((self.daily_end - self.daily_start).days + 1)]
+        daily = {'dates': days, 'meetings': [meetings.get(day, 0) for day in days]}
+        for column, key in TOTAL_COLUMNS.items():
+            daily[key] = [(by_day.get(day) or {}).get(column) or 0 for day in days]
+        return {'version': SNAPSHOT_VERSION, 'client': client, 'asOf': self.as_of.isoformat(),
+                'presets': presets, 'daily': daily}
+
+    # ---- writes ---------------------------------------------------------------
+
+    def write(self, relative_path: str, payload: Dict) -> str:
+        """Write the file if its content changed; returns the content hash"""
+        data = encode(payload)
+        digest = content_hash(data)
+        path = os.path.join(self.root, relative_path)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if content_hash(f.read()) == digest:
+                    self.stats['files_unchanged'] += 1
+                    return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self.stats['files_written'] += 1
+        self.stats['bytes_written'] += len(data)
+        self.metrics.inc('rillation_snapshot_bytes_written_total', len(data))
+        return digest
+
+    # ---- run ------------------------------------------------------------------
+
+    def run(self) -> Dict:
+        previous = self.load_index()
+        reuse = (previous is not None and not self.full and previous.get('version') == SNAPSHOT_VERSION
+                 and previous.get('asOf') == self.as_of.isoformat())
+        previous_clients = previous.get('clients', {}) if reuse else {}
+
+        with self.metrics.stage('scan_changes'):
+            changed, watermark = self.changed_clients(previous.get('rollupsWatermark') if reuse else None)
+        with self.metrics.stage('load_rollups') as stage:
+            rows = self.preset_rows()
+            meetings = self.meetings_by_day()
+            stage.add_rows(sum(len(clients) for clients in rows.values()))
+
+        clients = sorted(set(changed).union(*(set(clients) for clients in rows.values()), meetings,
+                                            previous_clients))
+        self.stats['clients'] = len(clients)
+
+        with self.metrics.stage('write_snapshots') as stage:
+            entries = {}
+            for client in clients:
+                client_meetings = meetings.get(client, {})
+                meetings_digest = content_hash(encode(client_meetings))
+                entry = previous_clients.get(client)
+                if (entry and client not in changed and entry.get('meetingsDigest') == meetings_digest
+                        and os.path.exists(os.path.join(self.root, entry['file']))):
+                    entries[client] = entry
+                    continue
+                relative_path = f'clients/{client_slug(client)}.json'
+                try:
+                    digest = self.write(relative_path, self.client_payload(client, rows, client_meetings))
+                except Exception as e:
+                    error_msg = f'Error building snapshot for {client}: {e}'
+                    print(f'  ❌ {error_msg}')
+                    self.stats['errors'].append(error_msg)
+                    # Keep the old entry; the watermark below is held back so the next run retries
+                    watermark = previous.get('rollupsWatermark') if reuse else None
+                    if entry:
+                        entries[client] = entry
+                    continue
+                entries[client] = {'file': relative_path, 'hash': digest, 'meetingsDigest': meetings_digest}
+                self.stats['clients_rebuilt'] += 1
+                stage.add_rows()
+
+            overview_hash = self.write('overview.json', self.overview(rows, meetings))
+            index = {
+                'version': SNAPSHOT_VERSION,
+                'generatedAt': datetime.now(timezone.utc).isoformat(),
+                'asOf': self.as_of.isoformat(),
+                'rollupsWatermark': watermark,
+                'meetingsAvailable': self.meetings_available,
+                'presets': {preset: {'start': start.isoformat(), 'end': end.isoformat()}
+                            for preset, (start, end) in self.ranges.items()},
+                'overview': {'file': 'overview.json', 'hash': overview_hash},
+                'clients': entries,
+            }
+            # The index changes every run (generatedAt), so it is always rewritten
+            self.write('index.json', index)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the dashboard snapshot files from client_rollups')
+    parser.add_argument('--as-of', help='Day the presets are relative to (YYYY-MM-DD, default: today)')
+    parser.add_argument('--output-dir', default=SNAPSHOT_DIR, help=f'Snapshot root (default: {SNAPSHOT_DIR})')
+    parser.add_argument('--full', action='store_true', help='Rebuild every client file')
+    args = parser.parse_args()
+
+    metrics = Metrics('snapshots')
+    http = instrumented_session(metrics)
+    as_of = date.fromisoformat(args.as_of) if args.as_of else date.today()
+
+    print("=" * 60)
+    print(f"Dashboard Snapshots (as of {as_of})")
+    print("=" * 60)
+    builder = SnapshotBuilder(http, metrics, as_of, output_dir=args.output_dir, full=args.full)
+    stats = builder.run()
+
+    print("\n" + "=" * 60)
+    print("SNAPSHOT SUMMARY")
+    print("=" * 60)
+    print(f"Clients: {stats['clients']} ({stats['clients_rebuilt']} rebuilt)")
+    print(f"Files written: {stats['files_written']} ({stats['bytes_written']:,} bytes), "
+          f"unchanged: {stats['files_unchanged']}")
+    print(f"Output: {builder.root}")
+    print(f"Errors: {len(stats['errors'])}")
+    print_error_summary(stats['errors'])
+    print_endpoint_summary(metrics)
+
+    prom_path, jsonl_path = metrics.export()
+    print(f"\n📈 Metrics written to {prom_path} and {jsonl_path}")
+    print("\n✅ Snapshots completed!")
+
+
+if __name__ == '__main__':
+    main()
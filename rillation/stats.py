@@ -0,0 +1,146 @@
+"""
+campaign_reporting mapping shared by the stats sync and the sync daemon.
+"""
+
+import hashlib
+import json
+from typing import Dict, Optional
+
+# Metric columns compared when deciding whether a row needs to be written.
+# Identity columns (campaign_id, client, date) and bookkeeping columns
+# (id, created_at, updated_at) are deliberately left out.
+METRIC_COLUMNS = [
+    'campaign_name',
+    'emails_sent',
+    'total_leads_contacted',
+    'opened',
+    'opened_percentage',
+    'unique_opens_per_contact',
+    'unique_opens_per_contact_percentage',
+    'unique_replies_per_contact',
+    'unique_replies_per_contact_percentage',
+    'bounced',
+    'bounced_percentage',
+    'unsubscribed',
+    'unsubscribed_percentage',
+    'interested',
+    'interested_percentage'
+]
+
+
+def map_api_response_to_campaign_reporting(
+    api_data: Dict, 
+    campaign_id: int, 
+    campaign_name: str, 
+    client: str, 
+    date: str,
+    row_id: Optional[str] = None
+) -> Dict:
+    """Map API response data to campaign_reporting table format"""
+    
+    # Helper function to safely get numeric value
+    def get_numeric_value(value, default=0):
+        if value is None:
+            return default
+        try:
+            # Handle string numbers like "10"
+            if isinstance(value, str):
+                return float(value) if '.' in value else int(value)
+            return float(value) if isinstance(value, (int, float)) else default
+        except (ValueError, TypeError):
+            return default
+    
+    # Extract data from API response
+    # API response structure based on documentation:
+    # data.emails_sent, data.total_leads_contacted, etc.
+    data = api_data.get('data', api_data) if isinstance(api_data, dict) else api_data
+    
+    campaign_row = {
+        'campaign_id': campaign_id,
+        'campaign_name': campaign_name,
+        'client': client,
+        'date': date,
+        'emails_sent': get_numeric_value(data.get('emails_sent')),
+        'total_leads_contacted': get_numeric_value(data.get('total_leads_contacted')),
+        'opened': get_numeric_value(data.get('opened')),
+        'opened_percentage': get_numeric_value(data.get('opened_percentage')),
+        'unique_opens_per_contact': get_numeric_value(data.get('unique_opens_per_contact')),
+        'unique_opens_per_contact_percentage': get_numeric_value(data.get('unique_opens_per_contact_percentage')),
+        'unique_replies_per_contact': get_numeric_value(data.get('unique_replies_per_contact')),
+        'unique_replies_per_contact_percentage': get_numeric_value(data.get('unique_replies_per_contact_percentage')),
+        'bounced': get_numeric_value(data.get('bounced')),
+        'bounced_percentage': get_numeric_value(data.get('bounced_percentage')),
+        'unsubscribed': get_numeric_value(data.get('unsubscribed')),
+        'unsubscribed_percentage': get_numeric_value(data.get('unsubscribed_percentage')),
+        'interested': get_numeric_value(data.get('interested')),
+        'interested_percentage': get_numeric_value(data.get('interested_percentage'))
+    }
+    
+    # Include id if provided (for updating existing rows)
+    if row_id:
+        campaign_row['id'] = row_id
+    
+    return campaign_row
+
+
+def sequence_leads_contacted(stats_data: Dict) -> int:
+    """
+    New leads contacted, from sequence_step_stats: the sum of `sent` over steps
+    whose subject is not a follow-up ("Re:"). fix-total-leads-contacted and
+    recompute-campaign-metrics store this instead of the API's own count.
+    """
+    sequence_steps = stats_data.get('sequence_step_stats', [])
+    
+    if not isinstance(sequence_steps, list) or len(sequence_steps) == 0:
+        return 0
+    
+    # Filter out follow-up emails (those with "Re:" in subject)
+    new_lead_steps = []
+    for step in sequence_steps:
+        email_subject = (step.get('email_subject') or '').lower()
+        if 're:' not in email_subject:
+            new_lead_steps.append(step)
+    
+    if len(new_lead_steps) == 0:
+        return 0
+    
+    # Sum the 'sent' values from new lead steps
+    total = 0
+    for step in new_lead_steps:
+        sent = step.get('sent', 0)
+        
+        # Handle string numbers like "1" or numeric values
+        if isinstance(sent, str):
+            try:
+                sent_value = int(sent)
+            except (ValueError, TypeError):
+                sent_value = 0
+        elif isinstance(sent, (int, float)):
+            sent_value = int(sent)
+        else:
+            sent_value = 0
+        
+        total += sent_value
+    
+    return total
+
+
+def row_fingerprint(row: Dict) -> str:
+    """
+    Fingerprint the metric columns of a campaign_reporting row.
+    Numbers are normalized so that 10, 10.0 and "10" produce the same fingerprint.
+    """
+    values = []
+    for column in METRIC_COLUMNS:
+        value = row.get(column)
+        if isinstance(value, str) and column != 'campaign_name':
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = repr(round(float(value), 6))
+        values.append(value)
+    
+    payload = json.dumps(values, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
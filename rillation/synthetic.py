@@ -0,0 +1,599 @@
+"""
+Deterministic synthetic dataset for load testing the sync and correction scripts.
+
+Everything is derived from (seed, parameters), so the same arguments always
+produce the same clients, Bison reply pages, stats payloads and table rows,
+and any single reply or stats payload can be generated on its own without
+materializing the rest (which is what keeps 1M-reply datasets usable).
+
+Produces:
+  - Clients rows with a Bison token each
+  - Bison /replies items per client, newest first: an Out Of Office /
+    Interested / Not Interested / Other mix with long quoted threads and signatures
+  - the same replies as Bison webhook events (for replaying against rillation.webhook)
+  - /campaigns/{id}/stats payloads with sequence_step_stats, and a /campaigns
+    list per client with each campaign's status and created_at (completed
+    campaigns stopped sending some days before end_date; campaigns without a
+    sequence are drafts)
+  - replies rows for the share of replies already synced
+  - campaign_reporting rows matching the stats payloads, a share of them all-zero
+    (dormant campaign days, like the sample row in supabase-tables-inventory.json)
+
+Client sizes follow a Zipf-like skew so a few large clients dominate, as in
+production. The first client is always "Rillation Revenue" and every campaign's
+last day is end_date, so the scripts with hard-coded targets find rows.
+
+Write fixtures for the mock server:
+    python3 -m rillation.synthetic --clients 200 --replies 1000000 --campaign-rows 500000 --out fixtures/scale
+    python3 -m rillation.mock_server --fixtures fixtures/scale
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+MANIFEST_FILE = 'manifest.json'
+
+# Share of replies per intended category
+CATEGORY_MIX = (
+    ('Out Of Office', 0.35),
+    ('Interested', 0.10),
+    ('Not Interested', 0.15),
+    ('Other', 0.40),
+)
+
+FIRST_NAMES = ['John', 'Maria', 'Wei', 'Priya', 'James', 'Fatima', 'Carlos', 'Anna', 'David', 'Keiko',
+               'Michael', 'Sofia', 'Ahmed', 'Laura', 'Daniel', 'Olga', 'Robert', 'Grace', 'Luca', 'Nina']
+LAST_NAMES = ['Fischer', 'Garcia', 'Chen', 'Patel', 'Smith', 'Khan', 'Lopez', 'Novak', 'Brown', 'Tanaka',
+              'Miller', 'Rossi', 'Haddad', 'Martin', 'Kim', 'Ivanova', 'Wilson', 'Okafor', 'Bianchi', 'Berg']
+TITLES = ['Partner', 'VP Operations', 'Head of Procurement', 'Founder & CEO', 'Plant Manager',
+          'Director of Engineering', 'COO', 'Purchasing Lead']
+COMPANY_WORDS = ['Laser', 'Studios', 'Logistics', 'Health', 'Manufacturing', 'Capital', 'Labs',
+                 'Systems', 'Partners', 'Dynamics', 'Foods', 'Robotics']
+
+NEW_TEXT = {
+    'Out Of Office': [
+        'Thank you for your email. I am currently out of the office with limited access to email and will return on {return_date}.',
+        'I am traveling with very limited access to internet. I will be checking my email, but please be patient and understand that my response will be delayed.',
+        'Automatic reply: I am on leave until {return_date}. For urgent matters please contact {colleague}.',
+        'I am away from my desk this week. Your message has been received and I will reply when I am back on {return_date}.',
+    ],
+    'Interested': [
+        'Sounds good. Can you send more information on pricing and timelines?',
+        "This is timely - let's talk next week. Here is my calendly link, pick any slot that works.",
+        'Would like to learn more. When can we schedule a short call?',
+        'Tell me more about how this worked for similar companies.',
+    ],
+    'Not Interested': [
+        'Not interested, thanks.',
+        'Please remove me from your list.',
+        'No thanks - we already have a provider for this.',
+        'Not a good fit for us at the moment. Do not contact me again.',
+    ],
+    'Other': [
+        'Who is this?',
+        'Forwarding to {colleague}, who handles this area.',
+        'I left the company last month. Please update your records.',
+        'Can you clarify what you mean by the second point?',
+    ],
+}
+
+PITCH_PARAGRAPHS = [
+    'I noticed {company} has been expanding its operations this year and wanted to reach out with a quick idea.',
+    'We help teams like yours cut lead times on custom parts by running a dedicated outbound program that books qualified meetings every week without adding headcount.',
+    'Over the last quarter we worked with three companies in your space and added an average of eleven new conversations per month to their pipeline, most of them with decision makers.',
+    'The setup takes about two weeks: we build the target list together, write the sequence, warm up dedicated inboxes, and report every Friday on sends, replies and meetings.',
+    'If it makes sense, I would be happy to share the playbook we used and walk you through the numbers in fifteen minutes.',
+    'Either way, thanks for reading - and if someone else on your team owns this, I would appreciate a pointer.',
+]
+
+
+def _seeded(*parts) -> random.Random:
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _allocate(total: int, buckets: int, skew: float) -> List[int]:
+    """Split total across buckets with Zipf-like weights (skew=0 is uniform), summing exactly"""
+    if buckets <= 0:
+        return []
+    weights = [1.0 / ((index + 1) ** skew) for index in range(buckets)]
+    scale = total / sum(weights)
+    shares = [weight * scale for weight in weights]
+    counts = [int(share) for share in shares]
+    remainder = total - sum(counts)
+    by_fraction = sorted(range(buckets), key=lambda index: shares[index] - counts[index], reverse=True)
+    for index in by_fraction[:remainder]:
+        counts[index] += 1
+    return counts
+
+
+def _pick_category(rng: random.Random) -> str:
+    roll = rng.random()
+    cumulative = 0.0
+    for category, share in CATEGORY_MIX:
+        cumulative += share
+        if roll < cumulative:
+            return category
+    return CATEGORY_MIX[-1][0]
+
+
+class LazyReplies(Sequence):
+    """Read-only sequence of one client's Bison replies, generated on access"""
+
+    def __init__(self, dataset: 'SyntheticDataset', client_index: int):
+        self.dataset = dataset
+        self.client_index = client_index
+
+    def __len__(self) -> int:
+        return self.dataset.reply_counts[self.client_index]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.dataset.bison_reply(self.client_index, index)
+                    for index in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self.dataset.bison_reply(self.client_index, item)
+
+
+class SyntheticDataset:
+    """Deterministic generator; see the module docstring for what it produces"""
+
+    def __init__(self, clients: int = 3, replies: int = 180, campaign_rows: int = 27,
+                 campaigns_per_client: int = 3, max_days: int = 180, stored_fraction: float = 0.34,
+                 dormant_fraction: float = 0.3, skew: float = 0.8, end_date: str = '2025-11-13', seed: int = 1):
+        self.params = {
+            'clients': clients,
+            'replies': replies,
+            'campaign_rows': campaign_rows,
+            'campaigns_per_client': campaigns_per_client,
+            'max_days': max_days,
+            'stored_fraction': stored_fraction,
+            'dormant_fraction': dormant_fraction,
+            'skew': skew,
+            'end_date': end_date,
+            'seed': seed,
+        }
+        self.seed = seed
+        self.end = date.fromisoformat(end_date)
+        self.stored_fraction = stored_fraction
+        self.dormant_fraction = dormant_fraction
+        self.campaigns_per_client = campaigns_per_client
+        self.max_days = max_days
+        self.client_names = [
+            'Rillation Revenue' if index == 0 else
+            f"{_seeded(seed, 'company', index).choice(LAST_NAMES)} {_seeded(seed, 'word', index).choice(COMPANY_WORDS)} {index:03d}"
+            for index in range(clients)
+        ]
+        self.tokens = [f'synthetic-token-{index:04d}' for index in range(clients)]
+        self.reply_counts = _allocate(replies, clients, skew)
+        self.row_counts = _allocate(campaign_rows, clients, skew)
+        self._reply_offsets = []
+        offset = 100000
+        for count in self.reply_counts:
+            self._reply_offsets.append(offset)
+            offset += count
+        self._token_index = {token: index for index, token in enumerate(self.tokens)}
+
+    @classmethod
+    def from_manifest(cls, directory: str) -> 'SyntheticDataset':
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            return cls(**json.load(f)['params'])
+
+    # ---- clients and campaigns ------------------------------------------
+
+    def client_rows(self) -> List[Dict]:
+        return [{'Business': name, 'Api Key - Bison': token}
+                for name, token in zip(self.client_names, self.tokens)]
+
+    def campaign_ids(self, client_index: int) -> List[int]:
+        """Large clients get more campaigns so no campaign history runs past max_days"""
+        count = max(self.campaigns_per_client, -(-self.row_counts[client_index] // self.max_days))
+        return [client_index * 100000 + number + 1 for number in range(count)]
+
+    def campaign_days(self, client_index: int) -> Dict[int, List[str]]:
+        """Days each campaign has a campaign_reporting row for, newest first"""
+        campaigns = self.campaign_ids(client_index)
+        per_campaign = _allocate(self.row_counts[client_index], len(campaigns), 0.0)
+        return {
+            campaign_id: [(self.end - timedelta(days=offset)).isoformat() for offset in range(count)]
+            for campaign_id, count in zip(campaigns, per_campaign)
+        }
+
+    def campaign_status(self, campaign_id: int) -> str:
+        if campaign_id % 17 == 0:
+            return 'draft'
+        return 'completed' if campaign_id % 3 == 0 else 'active'
+
+    def stopped_on(self, campaign_id: int) -> Optional[str]:
+        """Last day a completed campaign could send; None while it is still running"""
+        if self.campaign_status(campaign_id) != 'completed':
+            return None
+        offset = _seeded(self.seed, 'stopped', campaign_id).randint(1, max(1, self.max_days // 6))
+        return (self.end - timedelta(days=offset)).isoformat()
+
+    def is_dormant(self, campaign_id: int, day: str) -> bool:
+        stopped = self.stopped_on(campaign_id)
+        if stopped is not None and day > stopped:
+            return True
+        return _seeded(self.seed, 'dormant', campaign_id, day).random() < self.dormant_fraction
+
+    # ---- Bison payloads -------------------------------------------------
+
+    def stats(self, campaign_id: int, day: str) -> Optional[Dict]:
+        """Stats payload for a (campaign, day); None for campaigns without a sequence"""
+        if campaign_id % 17 == 0:
+            return None
+        dormant = self.is_dormant(campaign_id, day)
+        rng = _seeded(self.seed, 'stats', campaign_id, day)
+        steps = []
+        for step_number in range(1, rng.randint(2, 5) + 1):
+            subject = 'Quick question for {first_name}' if step_number == 1 else 'Re: Quick question for {first_name}'
+            sent = 0 if dormant else rng.randint(0, 80)
+            steps.append({
+                'sequence_step_id': campaign_id * 10 + step_number,
+                'email_subject': subject,
+                'order': step_number,
+                'sent': sent,
+                'leads_contacted': sent,
+                'opened': 0 if dormant else rng.randint(0, sent),
+                'unique_replies': 0 if dormant else rng.randint(0, max(0, sent // 25)),
+                'bounced': 0 if dormant else rng.randint(0, max(0, sent // 40)),
+                'unsubscribed': 0,
+                'interested': 0 if dormant else rng.randint(0, 1)
+            })
+        emails_sent = sum(step['sent'] for step in steps)
+        contacted = sum(step['sent'] for step in steps if 're:' not in step['email_subject'].lower())
+        opened = sum(step['opened'] for step in steps)
+        replies = sum(step['unique_replies'] for step in steps)
+        bounced = sum(step['bounced'] for step in steps)
+        interested = min(replies, sum(step['interested'] for step in steps))
+
+        def pct(part):
+            return round(part * 100.0 / contacted, 2) if contacted else 0
+
+        return {
+            'emails_sent': emails_sent,
+            'total_leads_contacted': contacted,
+            'opened': opened,
+            'opened_percentage': pct(opened),
+            'unique_opens_per_contact': opened,
+            'unique_opens_per_contact_percentage': pct(opened),
+            'unique_replies_per_contact': replies,
+            'unique_replies_per_contact_percentage': pct(replies),
+            'bounced': bounced,
+            'bounced_percentage': pct(bounced),
+            'unsubscribed': 0,
+            'unsubscribed_percentage': 0,
+            'interested': interested,
+            'interested_percentage': pct(interested),
+            'sequence_step_stats': steps
+        }
+
+    def stats_for_token(self, token: str, campaign_id: int, start_date: str, end_date: str) -> Optional[Dict]:
+        """Stats lookup as the mock server calls it; other clients' campaigns are treated as missing"""
+        client_index = self._token_index.get(token)
+        if client_index is None or campaign_id not in self.campaign_ids(client_index):
+            return None
+        return self.stats(campaign_id, start_date)
+
+    def campaigns_for_token(self, token: str) -> Optional[List[Dict]]:
+        """The /campaigns list as the mock server calls it; None for unknown tokens"""
+        client_index = self._token_index.get(token)
+        if client_index is None:
+            return None
+        name = self.client_names[client_index]
+        # Created on the campaign's first reporting day
+        days = self.campaign_days(client_index)
+        return [{'id': campaign_id, 'name': f'{name} - sequence {campaign_id % 100000}',
+                 'status': self.campaign_status(campaign_id),
+                 'created_at': f'{days[campaign_id][-1]}T09:00:00.000000Z' if days[campaign_id] else None}
+                for campaign_id in self.campaign_ids(client_index)]
+
+    def bison_reply(self, client_index: int, index: int) -> Dict:
+        """Reply number `index` (0 = newest) of a client, in Bison API format"""
+        rng = _seeded(self.seed, 'reply', client_index, index)
+        count = self.reply_counts[client_index]
+        reply_id = self._reply_offsets[client_index] + (count - index)
+        category = _pick_category(rng)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        company = f'{last} {rng.choice(COMPANY_WORDS)}'
+        domain = company.lower().replace(' ', '-') + '.com'
+        sender_first = rng.choice(FIRST_NAMES)
+        client_domain = self.client_names[client_index].lower().replace(' ', '') + '.com'
+        # Newest first, spread across the campaign window
+        received = datetime.combine(self.end, datetime.min.time()) + timedelta(hours=23) \
+            - timedelta(minutes=index * 11 + rng.randint(0, 10))
+
+        new_text = rng.choice(NEW_TEXT[category]).format(
+            return_date=(received + timedelta(days=rng.randint(2, 14))).strftime('%B %d'),
+            colleague=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        )
+        signature = f"\n\n-- \n\n*{first} {last}*\n{rng.choice(TITLES)}\n\n{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}\n{first.lower()}@{domain}"
+        sent_at = received - timedelta(days=rng.randint(1, 6), minutes=rng.randint(0, 600))
+        pitch = '\n\n'.join(paragraph.format(company=company) for paragraph in
+                            PITCH_PARAGRAPHS[:rng.randint(3, len(PITCH_PARAGRAPHS))])
+        quoted = '\n'.join('> ' + line if line else '>' for line in pitch.split('\n'))
+        thread = f"\n\nOn {sent_at.strftime('%a, %b %d, %Y at %I:%M %p')} {sender_first} <{sender_first.lower()}@{client_domain}> wrote:\n{quoted}"
+        if rng.random() < 0.4:
+            # Follow-up step quoted inside the first one
+            earlier = sent_at - timedelta(days=rng.randint(2, 5))
+            nested = '\n'.join('> > ' + line if line else '> >' for line in pitch.split('\n'))
+            thread += f"\n>\n> On {earlier.strftime('%a, %b %d, %Y at %I:%M %p')} {sender_first} wrote:\n{nested}"
+
+        subject_base = f'Quick question for {first}'
+        if category == 'Out Of Office' and rng.random() < 0.5:
+            subject = f'Automatic reply: {subject_base}'
+        else:
+            subject = f'Re: {subject_base}'
+
+        return {
+            'id': reply_id,
+            'uuid': str(uuid.UUID(int=rng.getrandbits(128))),
+            'folder': 'Inbox',
+            'type': 'Tracked Reply' if rng.random() < 0.92 else 'Untracked Reply',
+            'lead_id': rng.randint(1, 2_000_000),
+            'campaign_id': rng.choice(self.campaign_ids(client_index)),
+            'sender_email_id': rng.randint(1, 5000),
+            'subject': subject,
+            'text_body': new_text + signature + thread,
+            'date_received': received.strftime('%Y-%m-%dT%H:%M:%S.000000Z'),
+            'from_name': f'{first} {last}',
+            'from_email_address': f'{first.lower()}.{last.lower()}@{domain}',
+            'primary_to_email_address': f'{sender_first.lower()}@{client_domain}',
+            'interested': category == 'Interested' and rng.random() < 0.6,
+            'automated_reply': category == 'Out Of Office' and rng.random() < 0.7,
+            'read': rng.random() < 0.5,
+            'category_hint': category
+        }
+
+    def bison_replies(self, client_index: int) -> LazyReplies:
+        return LazyReplies(self, client_index)
+
+    def webhook_event(self, client_index: int, index: int) -> Dict:
+        """Reply `index` of a client wrapped in a Bison webhook envelope"""
+        reply = {key: value for key, value in self.bison_reply(client_index, index).items() if key != 'category_hint'}
+        interested = reply.pop('interested')
+        lead_id, campaign_id = reply.pop('lead_id'), reply.pop('campaign_id')
+        kind = 'LEAD_INTERESTED' if interested else (
+            'LEAD_REPLIED' if reply['type'] == 'Tracked Reply' else 'UNTRACKED_REPLY_RECEIVED')
+        return {
+            'event': {
+                'type': kind,
+                'workspace_id': client_index + 1,
+                'workspace_name': self.client_names[client_index],
+                'instance_url': 'https://send.rillationrevenue.com'
+            },
+            'data': {
+                'reply': {**reply, 'interested': interested},
+                'lead': {'id': lead_id, 'email': reply['from_email_address']},
+                'campaign': {'id': campaign_id}
+            }
+        }
+
+    def webhook_events(self) -> Iterator[Tuple[str, Dict]]:
+        """(client, event) for every reply, oldest first and interleaved across clients like live traffic"""
+        remaining = list(self.reply_counts)
+        while any(remaining):
+            for client_index, count in enumerate(remaining):
+                if count:
+                    remaining[client_index] -= 1
+                    yield self.client_names[client_index], self.webhook_event(client_index, count - 1)
+
+    # ---- Supabase table contents ----------------------------------------
+
+    def stored_reply_rows(self, client_index: int) -> Iterator[Dict]:
+        """replies rows for the older share of a client's replies (already synced)"""
+        count = self.reply_counts[client_index]
+        first_stored = count - int(round(count * self.stored_fraction))
+        for index in range(first_stored, count):
+            reply = self.bison_reply(client_index, index)
+            yield {
+                'reply_id': reply['id'],
+                'type': reply['type'],
+                'lead_id': reply['lead_id'],
+                'subject': reply['subject'],
+                'category': reply['category_hint'],
+                'text_body': reply['text_body'],
+                'campaign_id': reply['campaign_id'],
+                'date_received': reply['date_received'][:10],
+                'from_email': reply['from_email_address'],
+                'primary_to_email': reply['primary_to_email_address'],
+                'client': self.client_names[client_index],
+                'created_at': reply['date_received'],
+                'updated_at': reply['date_received']
+            }
+
+    def meetings_booked_rows(self, client_index: int) -> Iterator[Dict]:
+        """meetings_booked rows: about a third of a client's stored Interested replies, booked 1-5 days later"""
+        name = self.client_names[client_index]
+        for reply in self.stored_reply_rows(client_index):
+            rng = _seeded(self.seed, 'meeting', reply['reply_id'])
+            if reply['category'] != 'Interested' or rng.random() >= 0.35:
+                continue
+            local, domain = reply['from_email'].split('@', 1)
+            first, last = (part.capitalize() for part in (local.split('.', 1) + [''])[:2])
+            booked = datetime.fromisoformat(reply['date_received']) + timedelta(days=rng.randint(1, 5),
+                                                                                 hours=rng.randint(8, 17))
+            yield {
+                'first_name': first,
+                'last_name': last,
+                'full_name': f'{first} {last}',
+                'title': rng.choice(TITLES),
+                'company': domain.split('.')[0].replace('-', ' ').title(),
+                'company_linkedin': f"https://www.linkedin.com/company/{domain.split('.')[0]}",
+                'company_domain': domain,
+                'campaign_name': f'{name} - sequence {reply["campaign_id"] % 100000}',
+                'profile_url': f'https://www.linkedin.com/in/{local.replace(".", "-")}',
+                'client': name,
+                'created_time': booked.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+                'campaign_id': reply['campaign_id'],
+                'email': reply['from_email'],
+            }
+
+    def campaign_reporting_rows(self, client_index: int) -> Iterator[Dict]:
+        """campaign_reporting rows for a client, metrics taken from the stats payloads"""
+        name = self.client_names[client_index]
+        for campaign_id, days in self.campaign_days(client_index).items():
+            for day in days:
+                payload = self.stats(campaign_id, day) or {}
+                row = {
+                    'id': str(uuid.UUID(int=_seeded(self.seed, 'row', campaign_id, day).getrandbits(128))),
+                    'campaign_id': campaign_id,
+                    'campaign_name': f'{name} - sequence {campaign_id % 100000}',
+                    'client': name,
+                    'date': day,
+                }
+                for key, value in payload.items():
+                    if key != 'sequence_step_stats':
+                        row[key] = value
+                row.setdefault('emails_sent', 0)
+                row.setdefault('total_leads_contacted', 0)
+                stamp = f'{day}T00:00:03.309191+00:00'
+                row['created_at'] = stamp
+                row['updated_at'] = stamp
+                yield row
+
+    def tables(self) -> Dict[str, Iterator[Dict]]:
+        """Generators for every table, keyed by table name"""
+        clients = range(len(self.client_names))
+        return {
+            'Clients': iter(self.client_rows()),
+            'replies': (row for index in clients for row in self.stored_reply_rows(index)),
+            'campaign_reporting': (row for index in clients for row in self.campaign_reporting_rows(index)),
+            'meetings_booked': (row for index in clients for row in self.meetings_booked_rows(index)),
+            # Derived tables start empty, as after applying their migrations
+            'client_rollups': iter(()),
+            'rollup_watermarks': iter(()),
+        }
+
+    def mock_dataset(self) -> Dict:
+        """Dataset in the shape rillation.mock_server.MockState expects"""
+        return {
+            'tables': {name: list(rows) for name, rows in self.tables().items()},
+            'bison_replies': {token: self.bison_replies(index) for index, token in enumerate(self.tokens)},
+            'stats_provider': self.stats_for_token,
+            'campaigns_provider': self.campaigns_for_token,
+        }
+
+    # ---- fixtures -------------------------------------------------------
+
+    def write_fixtures(self, directory: str, include_bison: bool = True) -> Dict[str, int]:
+        """
+        Write <table>.jsonl for every table, bison/<token>.jsonl reply pages (newest
+        first) and a manifest. Stats payloads are not written: the mock regenerates
+        them from the manifest parameters. Returns row counts per file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        counts = {}
+        for name, rows in self.tables().items():
+            counts[name] = _write_jsonl(os.path.join(directory, f'{name}.jsonl'), rows)
+        if include_bison:
+            bison_dir = os.path.join(directory, 'bison')
+            os.makedirs(bison_dir, exist_ok=True)
+            for index, token in enumerate(self.tokens):
+                counts[f'bison/{token}'] = _write_jsonl(os.path.join(bison_dir, f'{token}.jsonl'),
+                                                        iter(self.bison_replies(index)))
+        with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+            json.dump({'params': self.params, 'counts': counts}, f, indent=2)
+        return counts
+
+
+def _write_jsonl(path: str, rows) -> int:
+    count = 0
+    with open(path, 'w') as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(',', ':')) + '\n')
+            count += 1
+    return count
+
+
+def _read_jsonl(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_fixtures(directory: str) -> Dict:
+    """
+    Load a fixture directory written by write_fixtures() into the shape
+    rillation.mock_server.MockState expects. Replies missing from bison/ are
+    regenerated from the manifest.
+    """
+    dataset = SyntheticDataset.from_manifest(directory)
+    tables = {}
+    for name in os.listdir(directory):
+        if name.endswith('.jsonl'):
+            tables[name[:-len('.jsonl')]] = _read_jsonl(os.path.join(directory, name))
+    bison_replies = {}
+    for index, token in enumerate(dataset.tokens):
+        path = os.path.join(directory, 'bison', f'{token}.jsonl')
+        bison_replies[token] = _read_jsonl(path) if os.path.exists(path) else dataset.bison_replies(index)
+    return {
+        'tables': tables,
+        'bison_replies': bison_replies,
+        'stats_provider': dataset.stats_for_token,
+        'campaigns_provider': dataset.campaigns_for_token,
+    }
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser):
+    """Dataset-shape flags shared by the generator, the mock server and the benchmark runner"""
+    parser.add_argument('--clients', type=int, default=3, help='Number of clients')
+    parser.add_argument('--replies', type=int, default=180, help='Total Bison replies across all clients')
+    parser.add_argument('--campaign-rows', type=int, default=27, help='Total campaign_reporting rows')
+    parser.add_argument('--campaigns-per-client', type=int, default=3, help='Minimum campaigns per client')
+    parser.add_argument('--max-days', type=int, default=180, help='Longest campaign history in days')
+    parser.add_argument('--stored-fraction', type=float, default=0.34,
+                        help='Share of each client\'s replies already in the replies table')
+    parser.add_argument('--dormant-fraction', type=float, default=0.3,
+                        help='Share of campaign days with no sends (all-zero rows)')
+    parser.add_argument('--skew', type=float, default=0.8, help='Zipf skew of client sizes (0 = uniform)')
+    parser.add_argument('--end-date', default='2025-11-13')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def dataset_from_args(args: argparse.Namespace) -> SyntheticDataset:
+    return SyntheticDataset(
+        clients=args.clients,
+        replies=args.replies,
+        campaign_rows=args.campaign_rows,
+        campaigns_per_client=args.campaigns_per_client,
+        max_days=args.max_days,
+        stored_fraction=args.stored_fraction,
+        dormant_fraction=args.dormant_fraction,
+        skew=args.skew,
+        end_date=args.end_date,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic dataset as fixture files')
+    add_dataset_arguments(parser)
+    parser.add_argument('--out', required=True, help='Fixture directory to write')
+    parser.add_argument('--no-bison', action='store_true',
+                        help='Skip bison/<token>.jsonl (the mock regenerates replies from the manifest)')
+    args = parser.parse_args()
+
+    dataset = dataset_from_args(args)
+    print(f"🧬 Generating {args.clients} clients, {args.replies} replies, {args.campaign_rows} campaign rows into {args.out}...")
+    counts = dataset.write_fixtures(args.out, include_bison=not args.no_bison)
+    for name, count in counts.items():
+        if not name.startswith('bison/'):
+            print(f"  {name}: {count} rows")
+    bison_total = sum(count for name, count in counts.items() if name.startswith('bison/'))
+    if bison_total:
+        print(f"  bison replies: {bison_total} across {args.clients} clients")
+    print("✅ Done")
+
+
+if __name__ == '__main__':
+    main()
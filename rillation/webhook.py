@@ -0,0 +1,387 @@
+"""
+Receiver for Email Bison reply webhooks.
+
+Bison pushes an event for every reply; the receiver validates it, maps the reply
+with map_bison_reply_to_supabase (the same mapping the polling sync uses),
+acknowledges with 202 straight away and hands the row to a BufferedWriter
+(rillation.writer) that upserts micro-batches into the replies table. With the receiver running,
+sync-bison-replies.py only needs to run occasionally with a small --pages value
+to reconcile anything a webhook missed.
+
+Endpoints:
+  POST /webhooks/bison/<client>   one event or a JSON array of events; <client> is
+                                  the Business name in Clients (URL-encoded).
+                                  Without it the event's workspace_name is used.
+                                  Events for a name not in Clients get 404.
+  GET  /healthz                   queue depth and counters
+
+Accepted event types: lead_replied, lead_interested, untracked_reply_received
+(any case). Other event types are acknowledged and ignored so Bison doesn't retry
+them. The X-Bison-Signature header must be the hex HMAC-SHA256 of the raw body
+with BISON_WEBHOOK_SECRET (optionally prefixed with 'sha256='); without a secret
+the receiver refuses to start unless --insecure is given. It listens on
+127.0.0.1 unless --host says otherwise, e.g. behind a TLS proxy.
+
+Writes use Prefer: resolution=merge-duplicates on reply_id, so redelivered events
+and rows the polling sync already inserted are harmless. When the queue is full
+the receiver answers 503 with Retry-After and Bison redelivers later.
+
+Run:
+    python3 -m rillation.webhook --port 8788
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlsplit
+
+import requests
+
+from rillation import codec
+from rillation.clients import CLIENT_CACHE_SECONDS, client_name as registry_name, fetch_client_rows
+from rillation.config import SUPABASE_HEADERS, SUPABASE_URL
+from rillation.errors import ErrorSummary
+from rillation.metrics import Metrics, instrumented_session, print_endpoint_summary
+from rillation.quoting import BodySummary, add_policy_argument, print_body_summary, set_policy
+from rillation.replies import map_bison_reply_to_supabase, reply_text_body
+from rillation.writer import BufferedWriter
+
+WEBHOOK_SECRET = os.environ.get('BISON_WEBHOOK_SECRET', '')
+WEBHOOK_PATH = '/webhooks/bison'
+
+REPLY_EVENTS = {'lead_replied', 'lead_interested', 'untracked_reply_received'}
+
+# Larger bodies are rejected outright (a reply with a long quoted thread is ~20 KB)
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+# A name missing from the registry re-reads Clients at most this often (a client added since the last read)
+UNKNOWN_CLIENT_REFRESH_SECONDS = 30.0
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """True when no secret is configured or the header matches HMAC-SHA256(secret, body)"""
+    if not secret:
+        return True
+    if not signature:
+        return False
+    if signature.startswith('sha256='):
+        signature = signature[len('sha256='):]
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def event_type(event: Dict) -> str:
+    meta = event.get('event')
+    name = (meta.get('type') if isinstance(meta, dict) else meta) or event.get('type') or ''
+    return str(name).strip().lower()
+
+
+def extract_reply(event: Dict, client_name: Optional[str]) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Pull (client, bison_reply) out of a webhook event.
+    Returns (None, None) for event types we don't ingest; raises ValueError when a
+    reply event is malformed.
+    """
+    if not isinstance(event, dict):
+        raise ValueError('event is not a JSON object')
+    kind = event_type(event)
+    if kind not in REPLY_EVENTS:
+        return None, None
+
+    data = event.get('data') if isinstance(event.get('data'), dict) else event
+    reply = data.get('reply')
+    if not isinstance(reply, dict):
+        raise ValueError(f'{kind} event has no reply object')
+    reply = dict(reply)
+
+    # Fill ids that Bison sends alongside the reply rather than inside it
+    for key, source in (('campaign_id', 'campaign'), ('lead_id', 'lead')):
+        if not reply.get(key) and isinstance(data.get(source), dict):
+            reply[key] = data[source].get('id')
+    if kind == 'lead_interested':
+        reply['interested'] = True
+
+    meta = event.get('event') if isinstance(event.get('event'), dict) else {}
+    client = client_name or meta.get('workspace_name') or data.get('workspace_name')
+    if not client:
+        raise ValueError('no client in the webhook URL or the event')
+    return client, reply
+
+
+class ClientNames:
+    """
+    Business names in Clients, re-read every `max_age` seconds and, for a name
+    not in them, at most every UNKNOWN_CLIENT_REFRESH_SECONDS. A failed re-read
+    keeps the names already loaded; a failed first read raises.
+    """
+
+    def __init__(self, http: requests.Session, supabase_url: str = SUPABASE_URL, headers: Optional[Dict] = None,
+                 max_age: float = CLIENT_CACHE_SECONDS):
+        self.http = http
+        self.supabase_url = supabase_url
+        self.headers = headers
+        self.max_age = max_age
+        self.names: Optional[Set[str]] = None
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            rows = fetch_client_rows(self.http, self.supabase_url, self.headers)
+        except Exception:
+            if self.names is None:
+                raise
+        else:
+            self.names = {name for name in map(registry_name, rows) if name}
+        self.loaded_at = time.monotonic()
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            age = time.monotonic() - self.loaded_at
+            if self.names is None or age >= self.max_age or (
+                    name not in self.names and age >= UNKNOWN_CLIENT_REFRESH_SECONDS):
+                self._load()
+            return name in self.names
+
+
+class ReplyBatcher:
+    """
+    Hands mapped reply rows to a BufferedWriter that upserts them on reply_id,
+    flushing every max_rows rows or when the oldest row has waited max_wait
+    seconds. Never blocks the request thread: when max_pending rows are already
+    waiting, submit() refuses the rows and the receiver answers 503.
+    """
+
+    def __init__(self, metrics: Metrics, http: Optional[requests.Session] = None,
+                 supabase_url: str = SUPABASE_URL, headers: Optional[Dict] = None,
+                 max_rows: int = 100, max_wait: float = 2.0, max_pending: int = 10000):
+        self.metrics = metrics
+        self.supabase_url = supabase_url
+        self.headers = headers
+        self.writer = BufferedWriter(http or instrumented_session(metrics), metrics, supabase_url, headers,
+                                     max_rows=max_rows, max_wait=max_wait, max_pending=max_pending,
+                                     adaptive=False)
+        # Reply body sizes before and after quoted-thread stripping
+        self.bodies = BodySummary(metrics)
+
+    @property
+    def errors(self) -> ErrorSummary:
+        return self.writer.errors
+
+    @property
+    def pending(self) -> int:
+        return self.writer.pending
+
+    def submit(self, rows: List[Dict]) -> bool:
+        """Buffer rows for writing; False (nothing buffered) when the writer is full"""
+        return self.writer.upsert('replies', rows, on_conflict=('reply_id',), block=False)
+
+    def stop(self):
+        """Write everything still buffered"""
+        self.writer.close()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    # Keep-alive so Bison (and the replay harness) reuse connections; without
+    # TCP_NODELAY the split header/body writes stall ~40 ms on delayed ACKs
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload, headers: Optional[Dict] = None):
+        body = codec.dumps(payload)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reject(self, status: int, outcome: str, message: str, headers: Optional[Dict] = None):
+        self.server.metrics.inc('rillation_webhook_events_total', outcome=outcome)
+        self._send_json(status, {'message': message}, headers)
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/healthz':
+            self._send_json(404, {'message': 'Not found'})
+            return
+        metrics = self.server.metrics
+        self._send_json(200, {
+            'queued': self.server.batcher.pending,
+            'accepted': metrics.counter_value('rillation_webhook_events_total', outcome='accepted'),
+            'rows_written': self.server.batcher.writer.rows_written('replies'),
+            'errors': len(self.server.batcher.errors)
+        })
+
+    def do_POST(self):
+        path = unquote(urlsplit(self.path).path).rstrip('/')
+        if path != WEBHOOK_PATH and not path.startswith(WEBHOOK_PATH + '/'):
+            self._send_json(404, {'message': 'Not found'})
+            return
+        client_name = path[len(WEBHOOK_PATH) + 1:] or None
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._reject(400, 'bad_length', 'Invalid Content-Length')
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._reject(413, 'too_large', f'Body over {MAX_BODY_BYTES} bytes')
+            return
+        body = self.rfile.read(length)
+        if not verify_signature(self.server.secret, body, self.headers.get('X-Bison-Signature')):
+            self._reject(401, 'bad_signature', 'Invalid signature')
+            return
+        try:
+            payload = codec.loads(body)
+        except ValueError:
+            self._reject(400, 'invalid_json', 'Body is not valid JSON')
+            return
+
+        events = payload if isinstance(payload, list) else [payload]
+        rows, bodies, ignored = [], [], 0
+        try:
+            for event in events:
+                client, reply = extract_reply(event, client_name)
+                if reply is None:
+                    ignored += 1
+                    continue
+                row = map_bison_reply_to_supabase(reply, client)
+                if row is None:
+                    raise ValueError('reply has no id')
+                rows.append(row)
+                bodies.append(reply_text_body(reply))
+        except (ValueError, TypeError) as e:
+            self._reject(400, 'invalid_event', str(e))
+            return
+
+        try:
+            unknown = sorted({row['client'] for row in rows if row['client'] not in self.server.clients})
+        except Exception:
+            self._reject(503, 'registry_unavailable', 'Client registry unavailable', {'Retry-After': '30'})
+            return
+        if unknown:
+            self._reject(404, 'unknown_client', f"Unknown client: {', '.join(unknown)}")
+            return
+
+        if not self.server.batcher.submit(rows):
+            self._reject(503, 'backpressure', 'Write queue is full', {'Retry-After': '5'})
+            return
+        for row, body in zip(rows, bodies):
+            self.server.batcher.bodies.record_row(body, row)
+        self.server.metrics.inc('rillation_webhook_events_total', len(rows), outcome='accepted')
+        if ignored:
+            self.server.metrics.inc('rillation_webhook_events_total', ignored, outcome='ignored')
+        self._send_json(202, {'accepted': len(rows), 'ignored': ignored})
+
+
+class WebhookReceiver:
+    """Runs the receiver and its batcher on background threads; usable as a context manager"""
+
+    def __init__(self, batcher: ReplyBatcher, host: str = '127.0.0.1', port: int = 0,
+                 secret: str = WEBHOOK_SECRET, insecure: bool = False, clients: Optional[ClientNames] = None):
+        if not secret and not insecure:
+            raise ValueError('BISON_WEBHOOK_SECRET is not set; pass insecure=True to accept unsigned events')
+        self.batcher = batcher
+        self.metrics = batcher.metrics
+        self.httpd = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.batcher = batcher
+        self.httpd.metrics = batcher.metrics
+        self.httpd.secret = secret
+        self.httpd.clients = clients or ClientNames(batcher.writer.http, batcher.supabase_url, batcher.headers)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}{WEBHOOK_PATH}'
+
+    def start(self) -> 'WebhookReceiver':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='webhook-receiver', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop accepting events, then flush what is queued"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.batcher.stop()
+
+    def __enter__(self) -> 'WebhookReceiver':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def add_batcher_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--batch-rows', type=int, default=100, help='Flush when this many rows are queued')
+    parser.add_argument('--max-wait', type=float, default=2.0, help='Flush when the oldest row has waited this long (s)')
+    parser.add_argument('--max-pending', type=int, default=10000, help='Queue size before answering 503')
+
+
+def print_receiver_summary(receiver: WebhookReceiver):
+    metrics = receiver.metrics
+    print("\n" + "=" * 60)
+    print("WEBHOOK RECEIVER SUMMARY")
+    print("=" * 60)
+    for outcome in ('accepted', 'ignored', 'invalid_event', 'invalid_json', 'bad_signature', 'bad_length', 'too_large',
+                    'unknown_client', 'registry_unavailable', 'backpressure'):
+        count = metrics.counter_value('rillation_webhook_events_total', outcome=outcome)
+        if count:
+            print(f"Events {outcome}: {int(count)}")
+    print(f"Rows written: {receiver.batcher.writer.rows_written('replies')}")
+    print(f"Batches flushed: {int(metrics.counter_value('rillation_write_flushes_total'))}")
+    print(f"Write errors: {len(receiver.batcher.errors)}")
+    print_body_summary(receiver.batcher.bodies)
+    print_endpoint_summary(metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Receive Email Bison reply webhooks and write them to Supabase')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (0.0.0.0 for all)')
+    parser.add_argument('--port', type=int, default=8788)
+    parser.add_argument('--insecure', action='store_true',
+                        help='Accept unsigned events when BISON_WEBHOOK_SECRET is not set')
+    add_batcher_arguments(parser)
+    add_policy_argument(parser)
+    args = parser.parse_args()
+    if not WEBHOOK_SECRET and not args.insecure:
+        parser.error('BISON_WEBHOOK_SECRET is not set; set it or pass --insecure to accept unsigned events')
+    if args.quoted_body:
+        set_policy(args.quoted_body)
+
+    metrics = Metrics('bison-webhook-receiver')
+    batcher = ReplyBatcher(metrics, max_rows=args.batch_rows, max_wait=args.max_wait, max_pending=args.max_pending)
+    receiver = WebhookReceiver(batcher, args.host, args.port, insecure=args.insecure)
+    print(f"📬 Webhook receiver listening on {receiver.url}/<client>")
+    if not WEBHOOK_SECRET:
+        print("⚠️  --insecure: BISON_WEBHOOK_SECRET is not set, signatures are not checked")
+    try:
+        receiver.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.httpd.server_close()
+        batcher.stop()
+        print_receiver_summary(receiver)
+        prom_path, jsonl_path = metrics.export()
+        print(f"\n📈 Metrics written to {prom_path} and {jsonl_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,456 @@
+"""
+Coalescing write buffer for PostgREST inserts, upserts and updates.
+
+Producers hand rows to a BufferedWriter instead of posting their own fixed-size
+slices. Rows are buffered per write target (table + operation + conflict
+columns), coalesced by key while they wait, and flushed as one request when a
+buffer reaches max_rows, max_bytes of serialized JSON, or its oldest row has
+waited max_wait seconds. Flushes run on a small thread pool, so several
+producers (or several tables) share requests and keep the database busy.
+
+Ordering: rows are keyed by their conflict columns (upserts/inserts) or key
+column (updates). A key that is part of a batch still in flight is held back
+until that batch finishes, so two writes to the same key always reach the
+database in the order they were added. Writes to different keys can overlap.
+
+Coalescing while buffered:
+  upsert   the later row replaces the earlier one
+  insert   the first row is kept (later duplicates are dropped)
+  update   the later values are merged over the earlier ones
+
+Updates are sent as PATCH <table>?<key>=in.(...) with one request per distinct
+set of new values, so rows that end up with the same value share a request.
+The key list goes in the URL, so it is cut at MAX_KEY_LIST_BYTES (proxies
+reject long request lines with 414), and a chunk answered with 414, 413, 504
+or a timeout is halved and resent like an oversized insert batch.
+
+Batch sizes adapt per table (rillation.batching.BatchTuner): insert/upsert
+batches grow while requests come back fast, shrink when they are slow, and are
+split and halved on 413s and timeouts. max_rows / max_bytes are the starting
+sizes for tables without a size saved by an earlier run; adaptive=False keeps
+them fixed.
+
+Backpressure: once max_pending rows are buffered or in flight, add() blocks
+until flushes catch up (or returns False when called with block=False).
+
+Failed batches are retried on 429/5xx/connection errors with the shared
+RetryPolicy (rillation.retry); batches rejected with
+another 4xx are split in half until the offending rows are isolated, and only
+those rows are reported as failed. Errors are counted by class
+(rillation.errors.ErrorSummary); pass on_failed to receive the failed rows
+themselves, e.g. to dead-letter them (rillation.deadletter).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from rillation import codec
+from rillation.batching import BatchTuner
+from rillation.config import SUPABASE_HEADERS, SUPABASE_URL
+from rillation.errors import ErrorSummary
+from rillation.metrics import Metrics
+from rillation.retry import RetryPolicy
+
+MODES = ('insert', 'upsert', 'update')
+
+# Longest in.(...) key list put in one PATCH URL; nginx's default header buffer is 8 KB
+MAX_KEY_LIST_BYTES = 6000
+
+# PATCH answers meaning the chunk of keys was too big (0 = client-side timeout)
+UPDATE_TOO_LARGE_STATUSES = frozenset({0, 413, 414, 504})
+
+
+def _in_value(value) -> str:
+    """Quote a value for a PostgREST in.(...) list when it contains reserved characters"""
+    text = str(value)
+    if any(char in text for char in ',()" '):
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return text
+
+
+def _key_chunks(keys: List[str], max_keys: int, max_bytes: int) -> Iterable[List[str]]:
+    """Consecutive slices of quoted keys with at most max_keys keys and max_bytes of encoded key list"""
+    chunk: List[str] = []
+    size = 0
+    for key in keys:
+        length = len(requests.utils.requote_uri(key)) + 1  # as sent, plus the comma
+        if chunk and (len(chunk) >= max_keys or size + length > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(key)
+        size += length
+    if chunk:
+        yield chunk
+
+
+class _Buffer:
+    """Rows waiting for one write target, keyed for coalescing"""
+
+    def __init__(self, table: str, mode: str, conflict: Tuple[str, ...], ignore_duplicates: bool):
+        self.table = table
+        self.mode = mode
+        self.conflict = conflict
+        self.ignore_duplicates = ignore_duplicates
+        self.rows: Dict = {}            # key -> (row, added_at, encoded row)
+        self.bytes = 0
+        self.in_flight: set = set()
+        self._sequence = 0
+
+    def key(self, row: Dict):
+        if self.conflict:
+            key = tuple(row.get(column) for column in self.conflict)
+            if None not in key:
+                return key
+        # No conflict target (or no key yet, e.g. a new row): every row is distinct
+        self._sequence += 1
+        return ('#', self._sequence)
+
+    def add(self, row: Dict, encoded: bytes, now: float) -> int:
+        """Buffer a row; returns the change in buffered row count (0 when coalesced)"""
+        key = self.key(row)
+        existing = self.rows.get(key)
+        if existing is None:
+            self.rows[key] = (row, now, encoded)
+            self.bytes += len(encoded)
+            return 1
+        old_row, added_at, old_encoded = existing
+        if self.mode == 'insert':
+            return 0
+        if self.mode == 'update':
+            row = {**old_row, **row}
+            encoded = codec.dumps(row)
+        # Re-inserting moves the key to the end, behind rows added before this write
+        del self.rows[key]
+        self.rows[key] = (row, added_at, encoded)
+        self.bytes += len(encoded) - len(old_encoded)
+        return 0
+
+    def oldest(self) -> Optional[float]:
+        return min((added_at for _, added_at, _ in self.rows.values()), default=None)
+
+    def take(self, max_rows: int, max_bytes: int) -> List[Tuple]:
+        """Remove up to max_rows / max_bytes of rows whose key isn't in flight"""
+        batch, size = [], 0
+        for key, (row, added_at, encoded) in list(self.rows.items()):
+            if len(batch) >= max_rows or (batch and size + len(encoded) > max_bytes):
+                break
+            if key in self.in_flight:
+                continue
+            batch.append((key, row, added_at, encoded))
+            size += len(encoded)
+            del self.rows[key]
+            self.bytes -= len(encoded)
+            self.in_flight.add(key)
+        return batch
+
+
+class BufferedWriter:
+    """Shared buffered writer; see the module docstring"""
+
+    def __init__(self, http: requests.Session, metrics: Metrics, supabase_url: str = SUPABASE_URL,
+                 headers: Optional[Dict] = None, max_rows: int = 500, max_bytes: int = 1_000_000,
+                 max_wait: float = 1.0, max_in_flight: int = 4, max_pending: int = 20000,
+                 max_attempts: int = 4, on_failed: Optional[Callable[[str, List[Dict], str], None]] = None,
+                 adaptive: bool = True, tuner: Optional[BatchTuner] = None):
+        self.http = http
+        self.metrics = metrics
+        self.base_url = f'{supabase_url}/rest/v1'
+        self.headers = dict(headers or SUPABASE_HEADERS)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.retry = RetryPolicy(max_attempts=max_attempts)
+        if tuner is None and adaptive:
+            tuner = BatchTuner(metrics, default_rows=max_rows, default_bytes=max_bytes)
+        self.tuner = tuner
+        self.errors = ErrorSummary()
+        # Called as on_failed(table, rows, message) from the flush threads
+        self.on_failed = on_failed
+        self.written: Dict[str, int] = {}
+        self.failed: Dict[str, int] = {}
+        self._buffers: Dict[Tuple, _Buffer] = {}
+        self._pending = 0
+        self._lock = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix='writer')
+        self._closed = False
+        self._timer: Optional[threading.Thread] = None
+
+    # ---- producer API -----------------------------------------------------
+
+    def insert(self, table: str, rows: Iterable[Dict], on_conflict: Iterable[str] = (),
+               ignore_duplicates: bool = False, block: bool = True) -> bool:
+        return self.add(table, 'insert', rows, on_conflict, ignore_duplicates, block)
+
+    def upsert(self, table: str, rows: Iterable[Dict], on_conflict: Iterable[str] = ('id',),
+               block: bool = True) -> bool:
+        return self.add(table, 'upsert', rows, on_conflict, False, block)
+
+    def update(self, table: str, key: str, rows: Iterable[Dict], block: bool = True) -> bool:
+        """Each row holds the key column plus the columns to set"""
+        return self.add(table, 'update', rows, (key,), False, block)
+
+    def add(self, table: str, mode: str, rows: Iterable[Dict], on_conflict: Iterable[str] = (),
+            ignore_duplicates: bool = False, block: bool = True) -> bool:
+        """
+        Buffer rows for a target. Blocks while the writer is over max_pending
+        (returns False without buffering anything if block=False).
+        """
+        if mode not in MODES:
+            raise ValueError(f'Unknown write mode: {mode}')
+        rows = list(rows)
+        if not rows:
+            return True
+        conflict = tuple(on_conflict)
+        # Each row is serialized once; batches are these bytes joined
+        encoded = [(row, codec.dumps(row)) for row in rows]
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('BufferedWriter is closed')
+            if self._pending + len(rows) > self.max_pending and self._pending > 0:
+                if not block:
+                    return False
+                waited = time.perf_counter()
+                while self._pending + len(rows) > self.max_pending and self._pending > 0:
+                    self._lock.wait()
+                self.metrics.inc('rillation_write_backpressure_seconds_total',
+                                 time.perf_counter() - waited, table=table)
+
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._watch, name='writer-timer', daemon=True)
+                self._timer.start()
+            buffer = self._buffers.get((table, mode, conflict))
+            if buffer is None:
+                buffer = self._buffers[(table, mode, conflict)] = _Buffer(table, mode, conflict, ignore_duplicates)
+            now = time.monotonic()
+            for row, row_bytes in encoded:
+                self._pending += buffer.add(row, row_bytes, now)
+
+            max_rows, max_bytes = self._limits(buffer)
+            if len(buffer.rows) >= max_rows:
+                self._dispatch(buffer, 'rows')
+            elif buffer.bytes >= max_bytes:
+                self._dispatch(buffer, 'bytes')
+        return True
+
+    def flush(self):
+        """Send everything buffered and wait until it has been written"""
+        with self._lock:
+            while self._pending:
+                for buffer in self._buffers.values():
+                    if buffer.rows:
+                        self._dispatch(buffer, 'flush')
+                self._lock.wait(0.05)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        self._pool.shutdown(wait=True)
+        if self.tuner is not None:
+            self.tuner.save()
+
+    def __enter__(self) -> 'BufferedWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def pending(self) -> int:
+        """Rows buffered or in flight"""
+        with self._lock:
+            return self._pending
+
+    def rows_written(self, table: str) -> int:
+        with self._lock:
+            return self.written.get(table, 0)
+
+    def rows_failed(self, table: str) -> int:
+        with self._lock:
+            return self.failed.get(table, 0)
+
+    # ---- dispatching ----------------------------------------------------
+
+    def _limits(self, buffer: _Buffer) -> Tuple[int, int]:
+        """(max_rows, max_bytes) for the buffer's next batch"""
+        if self.tuner is not None and buffer.mode != 'update':
+            return self.tuner.limit(buffer.table)
+        return self.max_rows, self.max_bytes
+
+    def _dispatch(self, buffer: _Buffer, reason: str):
+        """Cut batches from a buffer and hand them to the pool (caller holds the lock)"""
+        while buffer.rows:
+            max_rows, max_bytes = self._limits(buffer)
+            batch = buffer.take(max_rows, max_bytes)
+            if not batch:
+                return  # everything left is waiting on an in-flight key
+            self.metrics.inc('rillation_write_flushes_total', table=buffer.table, reason=reason)
+            self._pool.submit(self._send_batch, buffer, batch)
+            if reason in ('rows', 'bytes') and len(buffer.rows) < max_rows and buffer.bytes < max_bytes:
+                return
+
+    def _watch(self):
+        """Time-based flushes"""
+        interval = max(0.01, min(0.25, self.max_wait / 4))
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                for buffer in self._buffers.values():
+                    oldest = buffer.oldest()
+                    if oldest is not None and now - oldest >= self.max_wait:
+                        self._dispatch(buffer, 'time')
+
+    def _send_batch(self, buffer: _Buffer, batch: List[Tuple]):
+        rows = [row for _, row, _, _ in batch]
+        try:
+            with self.metrics.stage(f'write_{buffer.table}') as stage:
+                if buffer.mode == 'update':
+                    written = self._send_updates(buffer, rows)
+                else:
+                    written = self._send_rows(buffer, [(row, encoded) for _, row, _, encoded in batch])
+                stage.add_rows(written)
+        except Exception as e:
+            written = 0
+            self._record_errors(buffer.table, [f'Error writing {len(rows)} rows to {buffer.table}: {e}'], rows)
+
+        now = time.monotonic()
+        for _, _, added_at, _ in batch:
+            self.metrics.observe('rillation_write_buffer_wait_seconds', now - added_at, table=buffer.table)
+        self.metrics.inc('rillation_write_rows_total', written, table=buffer.table, result='written')
+        if len(rows) > written:
+            self.metrics.inc('rillation_write_rows_total', len(rows) - written, table=buffer.table, result='failed')
+
+        with self._lock:
+            self.written[buffer.table] = self.written.get(buffer.table, 0) + written
+            self.failed[buffer.table] = self.failed.get(buffer.table, 0) + len(rows) - written
+            for key, _, _, _ in batch:
+                buffer.in_flight.discard(key)
+            self._pending -= len(batch)
+            # Rows held back behind this batch can go now if they were already due
+            max_rows, max_bytes = self._limits(buffer)
+            if buffer.rows and (len(buffer.rows) >= max_rows or buffer.bytes >= max_bytes):
+                self._dispatch(buffer, 'rows')
+            self._lock.notify_all()
+
+    # ---- requests -------------------------------------------------------
+
+    def _request(self, method: str, url: str, body: bytes, headers: Dict, table: Optional[str] = None,
+                 rows: int = 0, too_large_statuses: Optional[frozenset] = None) -> Tuple[bool, int, str, bool]:
+        """
+        One write with retries on throttling and server errors; returns (ok,
+        status, text, too_large). With `table` given, each attempt is reported
+        to the batch tuner, and a batch of several rows that was too big (413,
+        504, timeout) is returned at once for the caller to split. Without a
+        tuner, `too_large_statuses` decides the same (0 = timeout).
+        """
+        for attempt in range(1, self.retry.max_attempts + 1):
+            started = time.perf_counter()
+            timed_out = False
+            try:
+                response = self.http.request(method, url, data=body, headers=headers, timeout=60)
+                ok, status = response.ok, response.status_code
+                text = '' if ok else response.text[:200]
+                retry_after = response.headers.get('Retry-After')
+                delay = float(retry_after) if retry_after and retry_after.replace('.', '', 1).isdigit() else None
+            except requests.exceptions.RequestException as e:
+                ok, status, text, delay = False, 0, str(e), None
+                timed_out = isinstance(e, requests.exceptions.Timeout)
+            too_large = False
+            # A refused connection says nothing about the batch size
+            if table and self.tuner is not None and (status or timed_out):
+                too_large = self.tuner.record(table, rows, len(body), time.perf_counter() - started, status, ok)
+            elif too_large_statuses is not None and not ok and (status or timed_out):
+                too_large = status in too_large_statuses
+            if ok:
+                return True, status, '', False
+            if too_large and rows > 1:
+                return False, status, text, True
+            if attempt == self.retry.max_attempts or not self.retry.retryable(status):
+                break
+            self.metrics.record_retry(method, url)
+            time.sleep(self.retry.backoff(attempt, delay))
+        return False, status, text, False
+
+    def _send_rows(self, buffer: _Buffer, rows: List[Tuple[Dict, bytes]]) -> int:
+        """POST rows (insert or upsert); splits rejected batches to isolate bad rows"""
+        url = f'{self.base_url}/{buffer.table}'
+        if buffer.conflict and (buffer.mode == 'upsert' or buffer.ignore_duplicates):
+            url += f"?on_conflict={','.join(buffer.conflict)}"
+        prefer = ['return=minimal']
+        if buffer.mode == 'upsert':
+            prefer.insert(0, 'resolution=merge-duplicates')
+        elif buffer.ignore_duplicates:
+            prefer.insert(0, 'resolution=ignore-duplicates')
+        headers = {**self.headers, 'Prefer': ','.join(prefer)}
+
+        def send(chunk: List[Tuple[Dict, bytes]]) -> int:
+            body = codec.join_array(encoded for _, encoded in chunk)
+            ok, status, text, too_large = self._request('POST', url, body, headers, table=buffer.table, rows=len(chunk))
+            if ok:
+                return len(chunk)
+            if len(chunk) > 1 and (too_large or (status and status < 500 and status != 429)):
+                middle = len(chunk) // 2
+                return send(chunk[:middle]) + send(chunk[middle:])
+            self._record_errors(buffer.table, [
+                f"Failed to write {self._describe(buffer, row)} to {buffer.table}: HTTP {status} - {text}"
+                for row, _ in chunk
+            ], [row for row, _ in chunk])
+            return 0
+
+        return send(rows)
+
+    def _send_updates(self, buffer: _Buffer, rows: List[Dict]) -> int:
+        """PATCH rows grouped by identical new values: one request per distinct body"""
+        key_column = buffer.conflict[0]
+        groups: Dict[bytes, List[str]] = {}
+        by_key = {}
+        for row in rows:
+            values = {column: value for column, value in row.items() if column != key_column}
+            key = _in_value(row[key_column])
+            groups.setdefault(codec.dumps(values, sort_keys=True), []).append(key)
+            by_key[key] = row
+
+        headers = {**self.headers, 'Prefer': 'return=minimal'}
+
+        def send(body: bytes, chunk: List[str]) -> int:
+            url = f"{self.base_url}/{buffer.table}?{key_column}=in.({','.join(chunk)})"
+            ok, status, text, too_large = self._request('PATCH', url, body, headers, rows=len(chunk),
+                                                        too_large_statuses=UPDATE_TOO_LARGE_STATUSES)
+            if ok:
+                return len(chunk)
+            if too_large and len(chunk) > 1:
+                middle = len(chunk) // 2
+                return send(body, chunk[:middle]) + send(body, chunk[middle:])
+            self._record_errors(buffer.table, [
+                f"Failed to update {key_column} {chunk[0]}{f' (+{len(chunk) - 1} more)' if len(chunk) > 1 else ''} "
+                f"in {buffer.table}: HTTP {status} - {text}"
+            ], [by_key[key] for key in chunk])
+            return 0
+
+        written = 0
+        for body, keys in groups.items():
+            for chunk in _key_chunks(keys, self.max_rows, MAX_KEY_LIST_BYTES):
+                written += send(body, chunk)
+        return written
+
+    @staticmethod
+    def _describe(buffer: _Buffer, row: Dict) -> str:
+        columns = buffer.conflict or tuple(column for column in ('id', 'reply_id', 'campaign_id') if column in row)[:1]
+        return ', '.join(f'{column} {row.get(column)}' for column in columns) or 'row'
+
+    def _record_errors(self, table: str, messages: List[str], rows: List[Dict]):
+        with self._lock:
+            self.errors.extend(messages)
+        if self.on_failed is not None:
+            self.on_failed(table, rows, messages[0])
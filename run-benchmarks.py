@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+End-to-end Benchmarks Against the Local Mock Server
+Starts rillation.mock_server, runs each sync script against it as a subprocess,
+and reports wall time, throughput and bytes transferred compared with the
+stored baselines in benchmarks/baselines.json (keyed by dataset and
+fault-injection settings).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from rillation.mock_server import MockServer, add_server_arguments, state_from_args
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_FILE = os.path.join(REPO_DIR, 'benchmarks', 'baselines.json')
+
+# Script -> metrics stage whose row count is used as the throughput numerator
+BENCHMARKS = {
+    'sync-bison-replies': 'map_replies',
+    'sync-campaign-stats': 'fetch_stats',
+    'fix-total-leads-contacted': 'fetch_stats',
+    'update-unique-contacts-rr': 'fetch_stats',
+}
+
+# Flag a regression when wall time or bytes transferred grow by more than this fraction over baseline
+REGRESSION_THRESHOLD = 0.15
+
+
+def dataset_key(args: argparse.Namespace) -> str:
+    """Baselines are only comparable for the same dataset and fault-injection settings"""
+    if args.fixtures:
+        source = f"fixtures={os.path.basename(os.path.normpath(args.fixtures))}"
+    else:
+        source = f"clients={args.clients},replies={args.replies},campaign_rows={args.campaign_rows},seed={args.seed}"
+    return f"{source},latency_ms={args.latency_ms:g},throttle_rate={args.throttle_rate:g}"
+
+
+def load_baselines() -> Dict:
+    if not os.path.exists(BASELINES_FILE):
+        return {}
+    with open(BASELINES_FILE) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines: Dict):
+    os.makedirs(os.path.dirname(BASELINES_FILE), exist_ok=True)
+    with open(BASELINES_FILE, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def last_snapshot(metrics_dir: str, job: str) -> Dict:
+    """Last JSON-lines snapshot a job wrote, or {} if it wrote none"""
+    path = os.path.join(metrics_dir, f'{job}.jsonl')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else {}
+
+
+def run_benchmark(script: str, stage: str, server: MockServer, metrics_dir: str, timeout: float) -> Dict:
+    """Run one script against the mock and collect wall time, rows and request counts"""
+    env = {**os.environ, **server.env(), 'RILLATION_METRICS_DIR': metrics_dir}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, f'{script}.py')],
+        cwd=metrics_dir,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        timeout=timeout
+    )
+    wall = time.perf_counter() - start
+
+    snapshot = last_snapshot(metrics_dir, script)
+    rows = snapshot.get('stages', {}).get(stage, {}).get('rows', 0)
+    counters = snapshot.get('counters', {})
+    requests_made = sum(series['value'] for series in counters.get('rillation_http_requests_total', []))
+    bytes_out = sum(series['value'] for series in counters.get('rillation_http_request_bytes_total', []))
+    bytes_in = sum(series['value'] for series in counters.get('rillation_http_response_wire_bytes_total', []))
+    return {
+        'script': script,
+        'exit_code': result.returncode,
+        'wall_seconds': round(wall, 3),
+        'rows': rows,
+        'rows_per_second': round(rows / wall, 2) if wall > 0 else 0.0,
+        'http_requests': int(requests_made),
+        'bytes_transferred': int(bytes_out + bytes_in),
+        'output_tail': result.stdout[-2000:] if result.returncode else ''
+    }
+
+
+def regressions(result: Dict, baseline: Optional[Dict]) -> List[str]:
+    """Measures (wall time, bytes) that grew past the threshold"""
+    if not baseline:
+        return []
+    grown = []
+    for key, label in (('wall_seconds', 'wall'), ('bytes_transferred', 'bytes')):
+        if baseline.get(key) and (result[key] - baseline[key]) / baseline[key] > REGRESSION_THRESHOLD:
+            grown.append(label)
+    return grown
+
+
+def compare(result: Dict, baseline: Optional[Dict]) -> str:
+    if not baseline:
+        return 'no baseline'
+    change = (result['wall_seconds'] - baseline['wall_seconds']) / baseline['wall_seconds']
+    grown = regressions(result, baseline)
+    verdict = (f"❌ REGRESSION ({', '.join(grown)})" if grown else
+               ('✅ faster' if change < -REGRESSION_THRESHOLD else '✓ same'))
+    line = f"{verdict} ({change * 100:+.1f}% wall vs {baseline['wall_seconds']}s"
+    if baseline.get('bytes_transferred'):
+        bytes_change = (result['bytes_transferred'] - baseline['bytes_transferred']) / baseline['bytes_transferred']
+        line += f", {bytes_change * 100:+.1f}% bytes vs {baseline['bytes_transferred']}"
+    return line + ')'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the sync scripts against the local mock server')
+    parser.add_argument('scripts', nargs='*', help=f"Scripts to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--update-baselines', action='store_true', help='Store these results as the new baselines')
+    parser.add_argument('--timeout', type=float, default=900.0, help='Per-script timeout in seconds')
+    parser.add_argument('--json', dest='json_output', help='Also write the results to this JSON file')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    scripts = args.scripts or list(BENCHMARKS)
+    unknown = [script for script in scripts if script not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    print("=" * 60)
+    print("Sync Script Benchmarks (mock server)")
+    print("=" * 60)
+    if args.fixtures:
+        print(f"Dataset: fixtures in {args.fixtures}")
+    else:
+        print(f"Dataset: {args.clients} clients, {args.replies} replies, {args.campaign_rows} campaign rows "
+              f"(seed {args.seed})")
+    print(f"Latency: {args.latency_ms} ms (+{args.jitter_ms} ms jitter), 429 rate: {args.throttle_rate}")
+    print()
+
+    all_baselines = load_baselines()
+    baselines = all_baselines.setdefault(dataset_key(args), {})
+    results: List[Dict] = []
+
+    for script in scripts:
+        # Fresh server per script so writes from one run don't change the next one's input
+        with MockServer(state_from_args(args)) as server, tempfile.TemporaryDirectory() as metrics_dir:
+            print(f"⏱️  {script}...")
+            result = run_benchmark(script, BENCHMARKS[script], server, metrics_dir, args.timeout)
+            result['mock_requests'] = server.state.request_count
+            result['mock_throttled'] = server.state.throttled_count
+        results.append(result)
+
+        if result['exit_code'] != 0:
+            print(f"  ❌ exited with {result['exit_code']}")
+            print(result['output_tail'])
+            continue
+        print(f"  wall {result['wall_seconds']}s, {result['rows']} rows ({result['rows_per_second']}/s), "
+              f"{result['http_requests']} requests, {result['bytes_transferred']} B - "
+              f"{compare(result, baselines.get(script))}")
+
+    if args.update_baselines:
+        for result in results:
+            if result['exit_code'] == 0:
+                baselines[result['script']] = {
+                    key: result[key] for key in ('wall_seconds', 'rows', 'rows_per_second', 'http_requests', 'bytes_transferred')
+                }
+        save_baselines(all_baselines)
+        print(f"\n💾 Baselines updated in {BASELINES_FILE}")
+
+    if args.json_output:
+        with open(args.json_output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failed = [result for result in results if result['exit_code'] != 0]
+    regressed = [
+        result for result in results
+        if result['exit_code'] == 0 and not args.update_baselines
+        and regressions(result, baselines.get(result['script']))
+    ]
+    print("\n✅ Benchmarks completed!" if not failed and not regressed else
+          f"\n⚠️  {len(failed)} failed, {len(regressed)} regressed")
+    sys.exit(1 if failed or regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,39 @@ const supabase = createClient(Deno.env.get("SUPABASE_URL") || "", Deno.env.get("
 
 // --------------------------------------------------
 
-async function getAllCampaignRows() {
+// Optional request body limiting one invocation to part of the table, so a
+// driver (rillation/fanout.py) can fan the work out in chunks that finish
+// within the function time limit. An empty body processes every row.
+type Chunk = {
+  client?: string;
+  start_date?: string;
+  end_date?: string;
+  campaign_ids?: number[];
+};
+
+async function readChunk(req: Request): Promise<Chunk> {
   try {
-    const result = await supabase
+    const body = await req.json();
+    return body && typeof body === "object" ? body : {};
+  } catch (_err) {
+    return {};
+  }
+}
+
+// --------------------------------------------------
+
+async function getAllCampaignRows(chunk: Chunk) {
+  try {
+    let query = supabase
       .from("campaign_reporting")
-      .select("id, campaign_id, campaign_name, client, date, total_leads_contacted")
+      .select("id, campaign_id, campaign_name, client, date, total_leads_contacted");
+
+    if (chunk.client) query = query.eq("client", chunk.client);
+    if (chunk.start_date) query = query.gte("date", chunk.start_date);
+    if (chunk.end_date) query = query.lte("date", chunk.end_date);
+    if (chunk.campaign_ids && chunk.campaign_ids.length > 0) query = query.in("campaign_id", chunk.campaign_ids);
+
+    const result = await query
       .order("client", { ascending: true })
       .order("date", { ascending: false })
       .order("campaign_id", { ascending: true });
@@ -160,7 +188,7 @@ async function updateTotalLeadsContacted(rowId: string, newValue: number) {
 
 // --------------------------------------------------
 
-async function processCampaigns() {
+async function processCampaigns(chunk: Chunk) {
   try {
     console.log("Starting fix-total-leads-contacted process...");
 
@@ -173,12 +201,12 @@ async function processCampaigns() {
     }
 
     console.log("Fetching all campaign rows...");
-    const allRows = await getAllCampaignRows();
+    const allRows = await getAllCampaignRows(chunk);
     console.log(`Found ${allRows.length} campaign rows`);
 
     if (allRows.length === 0) {
       console.log("No campaign rows found");
-      return { processed: 0, updated: 0, skipped: 0, errors: [] };
+      return { processed: 0, updated: 0, skipped: 0, error_count: 0, errors: [] };
     }
 
     // Group rows by client for efficient API token caching
@@ -297,6 +325,7 @@ async function processCampaigns() {
       processed,
       updated,
       skipped,
+      error_count: errors.length,
       errors: errors.slice(0, 50), // Return first 50 errors
       results: results.slice(0, 20) // Return first 20 results as sample
     };
@@ -309,9 +338,9 @@ async function processCampaigns() {
 
 // --------------------------------------------------
 
-Deno.serve(async () => {
+Deno.serve(async (req) => {
   try {
-    const result = await processCampaigns();
+    const result = await processCampaigns(await readChunk(req));
     
     return new Response(JSON.stringify({
       ok: true,
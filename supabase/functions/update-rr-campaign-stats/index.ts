@@ -4,12 +4,39 @@ const supabase = createClient(Deno.env.get("SUPABASE_URL") || "", Deno.env.get("
 
 // --------------------------------------------------
 
-async function getAllRRCampaignRows() {
+// Optional request body limiting one invocation to a date range and/or a set
+// of campaigns, so a driver (rillation/fanout.py) can fan the work out in
+// chunks that finish within the function time limit. An empty body processes
+// every Rillation Revenue row.
+type Chunk = {
+  start_date?: string;
+  end_date?: string;
+  campaign_ids?: number[];
+};
+
+async function readChunk(req: Request): Promise<Chunk> {
   try {
-    const result = await supabase
+    const body = await req.json();
+    return body && typeof body === "object" ? body : {};
+  } catch (_err) {
+    return {};
+  }
+}
+
+// --------------------------------------------------
+
+async function getAllRRCampaignRows(chunk: Chunk) {
+  try {
+    let query = supabase
       .from("campaign_reporting")
       .select("id, campaign_id, campaign_name, client, date, emails_sent, total_leads_contacted")
-      .eq("client", "Rillation Revenue")
+      .eq("client", "Rillation Revenue");
+
+    if (chunk.start_date) query = query.gte("date", chunk.start_date);
+    if (chunk.end_date) query = query.lte("date", chunk.end_date);
+    if (chunk.campaign_ids && chunk.campaign_ids.length > 0) query = query.in("campaign_id", chunk.campaign_ids);
+
+    const result = await query
       .order("date", { ascending: false })
       .order("campaign_id", { ascending: true });
 
@@ -188,7 +215,7 @@ async function storeSummary(c: any, data: any, date: string) {
 
 // --------------------------------------------------
 
-async function processCampaigns() {
+async function processCampaigns(chunk: Chunk) {
   try {
     console.log("Starting Rillation Revenue campaign-stats update...");
 
@@ -201,12 +228,12 @@ async function processCampaigns() {
     }
 
     console.log(`Fetching all Rillation Revenue campaign rows...`);
-    const campaignRows = await getAllRRCampaignRows();
+    const campaignRows = await getAllRRCampaignRows(chunk);
     console.log(`Found ${campaignRows.length} campaign rows`);
 
     if (campaignRows.length === 0) {
       console.log("No campaign rows found for Rillation Revenue");
-      return { processed: 0, updated: 0, skipped: 0, errors: [] };
+      return { processed: 0, updated: 0, skipped: 0, error_count: 0, errors: [] };
     }
 
     const apiKey = await getApiKey("Rillation Revenue");
@@ -294,6 +321,7 @@ async function processCampaigns() {
       processed,
       updated,
       skipped,
+      error_count: errors.length,
       errors,
       results: results.slice(0, 10) // Return first 10 results as sample
     };
@@ -306,9 +334,9 @@ async function processCampaigns() {
 
 // --------------------------------------------------
 
-Deno.serve(async () => {
+Deno.serve(async (req) => {
   // Start processing in background and return immediately
-  const result = await processCampaigns().catch(err => {
+  const result = await processCampaigns(await readChunk(req)).catch(err => {
     console.error("Background processing error:", err);
     return { error: err.message };
   });
@@ -0,0 +1,3 @@
+-- Quoted history and signatures stripped from replies.text_body by rillation/quoting.py
+-- (zlib-compressed, base64); NULL when the reply had none or was stored before stripping
+ALTER TABLE replies ADD COLUMN IF NOT EXISTS quoted_body_z TEXT;
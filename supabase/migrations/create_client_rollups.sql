@@ -0,0 +1,42 @@
+-- Pre-summed client metrics for the dashboards, maintained by rillation/rollups.py
+-- One row per client, grain (day, week, month) and period start; weeks start on Monday
+CREATE TABLE IF NOT EXISTS client_rollups (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    client TEXT NOT NULL,
+    grain TEXT NOT NULL CHECK (grain IN ('day', 'week', 'month')),
+    period_start DATE NOT NULL,
+    period_end DATE NOT NULL,
+    emails_sent BIGINT DEFAULT 0,
+    total_leads_contacted BIGINT DEFAULT 0,
+    bounced BIGINT DEFAULT 0,
+    interested BIGINT DEFAULT 0,
+    replies BIGINT DEFAULT 0,
+    real_replies BIGINT DEFAULT 0,
+    replies_by_category JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (client, grain, period_start)
+);
+
+-- Dashboard reads: one grain over a date range, for one client or all of them
+CREATE INDEX IF NOT EXISTS client_rollups_grain_period_idx ON client_rollups (grain, period_start);
+
+-- Latest source updated_at already folded into client_rollups, per source table
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    source TEXT PRIMARY KEY,
+    watermark TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- The rollup job finds changed rows by updated_at
+CREATE INDEX IF NOT EXISTS campaign_reporting_updated_at_idx ON campaign_reporting (updated_at);
+CREATE INDEX IF NOT EXISTS replies_updated_at_idx ON replies (updated_at);
+
+-- Enable RLS (Row Level Security) - allow all operations for now
+ALTER TABLE client_rollups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE rollup_watermarks ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow all operations on client_rollups" ON client_rollups
+    FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow all operations on rollup_watermarks" ON rollup_watermarks
+    FOR ALL USING (true) WITH CHECK (true);